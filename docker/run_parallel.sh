@@ -20,6 +20,9 @@ GCLOUD_CONFIG="$HOME/.config/gcloud"
 # Configuration
 TARGET_SKILLS="${SKILLS:-}"
 TARGET_STORIES="${STORIES:-stories/optimization/*.story.md}"
+# Gemini quota shared by all containers (0 = unlimited)
+SHARED_RPM="${RPM:-0}"
+SHARED_TPM="${TPM:-0}"
 
 echo "Starting parallel optimization runs..."
 echo "Target Stories: $TARGET_STORIES"
@@ -58,7 +61,9 @@ for skill_dir in skills/*; do
             --trainset "$TARGET_STORIES" \
             --skill "$skill_name" \
             --gemini-binary "/usr/bin/gemini" \
-            --max-rollouts 5
+            --max-rollouts 5 \
+            --rpm "$SHARED_RPM" \
+            --tpm "$SHARED_TPM"
             
         echo "Started container: $container_name"
     fi
@@ -0,0 +1,259 @@
+"""
+AffectedTestSelector: Run Only the Tests a Patch Can Affect
+
+Both `_run_tests` and `execute_in_sandbox` ran the whole suite for every
+rollout. The selector maps the files changed by a `code_patch` to the test
+files that (transitively) import them and appends those to the test
+command, e.g. `npm test -- --silent <tests>`.
+
+Modes:
+  - graph: a relative-import graph of the project's JS/TS sources, built
+           from the committed content of HEAD (`git cat-file --batch`, never
+           the working tree, which may hold another candidate's patch) once
+           per HEAD tree and cached on disk
+           (.dspy_cache/import_graph/<tree>.<version>.json). Files touched by the
+           patch are re-parsed from disk on top of it.
+  - jest:  delegates to Jest with `--findRelatedTests <changed files>`.
+
+Whenever the impact is unclear — a changed file outside the graph
+(package.json, configs, assets), a patch that is not a diff, or no test
+reached — the full suite runs, so selection can never turn a failing
+candidate into a passing one by running zero tests. Set `enabled = False`
+to force the full suite, e.g. to validate the final candidate.
+"""
+
+import json
+import posixpath
+import re
+import subprocess
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+try:
+    from .static_check import touched_files
+    from .suite_cache import tree_hash
+except ImportError:
+    from static_check import touched_files
+    from suite_cache import tree_hash
+
+
+SOURCE_EXTENSIONS = (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts")
+# Import targets that are not sources themselves but still belong to the graph
+RESOLVE_EXTENSIONS = SOURCE_EXTENSIONS + (".json",)
+
+# import x from '…' / export … from '…' / import '…' / import('…') / require('…')
+_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\s*\(\s*)['"]([^'"\n]+)['"]""")
+# Bumped when cached graphs may be wrong; v1 graphs were read from the working tree
+GRAPH_VERSION = "v2"
+
+_TEST_FILE = re.compile(r'(^|/)(__tests__|tests?)/|\.(test|spec)\.[cm]?[jt]sx?$')
+
+
+def is_test_file(path: str) -> bool:
+    return path.endswith(SOURCE_EXTENSIONS) and bool(_TEST_FILE.search(path))
+
+
+class ImportGraph:
+    """file -> files it imports, for relative imports between project files."""
+
+    def __init__(self, edges: Dict[str, List[str]]):
+        self.edges = edges
+
+    @classmethod
+    def build(cls, sources: Dict[str, str]) -> "ImportGraph":
+        """Graph of `sources` (path -> content); non-source paths only resolve imports."""
+        known = set(sources)
+        edges = {}
+        for path, source in sources.items():
+            if path.endswith(SOURCE_EXTENSIONS):
+                edges[path] = imports_in(source, path, known)
+        return cls(edges)
+
+    @classmethod
+    def from_head(cls, project_dir: Path) -> "ImportGraph":
+        """Graph of the files committed at HEAD, whatever the working tree contains."""
+        listing = subprocess.run(
+            ['git', 'ls-tree', '-r', '-z', '--name-only', 'HEAD'],
+            cwd=project_dir, capture_output=True, text=True, check=False
+        ).stdout
+        files = [p for p in listing.split("\0") if p.endswith(RESOLVE_EXTENSIONS) and "\n" not in p]
+        return cls.build(read_committed(project_dir, files))
+
+    def overlay(self, project_dir: Path, paths: Sequence[str]) -> "ImportGraph":
+        """Copy of the graph with `paths` re-parsed from their current content."""
+        known = set(self.edges) | set(paths)
+        edges = dict(self.edges)
+        for path in paths:
+            if path.endswith(SOURCE_EXTENSIONS) and (project_dir / path).is_file():
+                edges[path] = parse_imports(project_dir, path, known)
+        return ImportGraph(edges)
+
+    def dependents(self, changed: Sequence[str]) -> Set[str]:
+        """Every file that imports one of `changed`, directly or transitively (inclusive)."""
+        reverse: Dict[str, List[str]] = {}
+        for importer, targets in self.edges.items():
+            for target in targets:
+                reverse.setdefault(target, []).append(importer)
+        seen = set(changed)
+        queue = deque(changed)
+        while queue:
+            for importer in reverse.get(queue.popleft(), ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    queue.append(importer)
+        return seen
+
+
+def read_committed(project_dir: Path, files: Sequence[str]) -> Dict[str, str]:
+    """Content of `files` at HEAD, in one `git cat-file --batch` call."""
+    if not files:
+        return {}
+    result = subprocess.run(
+        ['git', 'cat-file', '--batch'],
+        input="".join(f"HEAD:{path}\n" for path in files).encode('utf-8'),
+        cwd=project_dir, capture_output=True, check=False
+    )
+    out = result.stdout
+    sources = {}
+    pos = 0
+    for path in files:
+        end = out.find(b"\n", pos)
+        if end == -1:
+            break
+        header = out[pos:end].split()
+        pos = end + 1
+        if len(header) != 3:
+            continue  # "<name> missing"
+        size = int(header[2])
+        sources[path] = out[pos:pos + size].decode('utf-8', errors='replace')
+        pos += size + 1
+    return sources
+
+
+def parse_imports(project_dir: Path, path: str, known: Set[str]) -> List[str]:
+    try:
+        source = (project_dir / path).read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return []
+    return imports_in(source, path, known)
+
+
+def imports_in(source: str, path: str, known: Set[str]) -> List[str]:
+    targets = []
+    for spec in _IMPORT.findall(source):
+        resolved = _resolve(posixpath.dirname(path), spec, known)
+        if resolved is not None and resolved not in targets:
+            targets.append(resolved)
+    return targets
+
+
+def _resolve(base_dir: str, spec: str, known: Set[str]) -> Optional[str]:
+    if not spec.startswith("."):
+        return None  # Package import
+    stem = posixpath.normpath(posixpath.join(base_dir, spec))
+    candidates = [stem]
+    # TypeScript sources are imported with the extension they compile to
+    if stem.endswith((".js", ".jsx", ".mjs", ".cjs")):
+        root = stem.rsplit(".", 1)[0]
+        candidates += [root + ext for ext in (".ts", ".tsx", ".mts", ".cts")]
+    candidates += [stem + ext for ext in RESOLVE_EXTENSIONS]
+    candidates += [f"{stem}/index{ext}" for ext in RESOLVE_EXTENSIONS]
+    for candidate in candidates:
+        if candidate in known:
+            return candidate
+    return None
+
+
+class AffectedTestSelector:
+    """
+    Chooses the test-runner arguments for one patch evaluation.
+
+    Usage:
+        selector = AffectedTestSelector(mode="graph", cache_dir=repo_root / ".dspy_cache" / "import_graph")
+        command = ['npm', 'test', '--', '--silent'] + selector.runner_args(sandbox_dir, code_patch)
+    """
+
+    def __init__(self, mode: str = "graph", cache_dir: Optional[Path] = None, max_graphs: int = 8):
+        if mode not in ("graph", "jest"):
+            raise ValueError(f"mode must be 'graph' or 'jest', got {mode!r}")
+        self.mode = mode
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_graphs = max_graphs
+        self.enabled = True
+        self.selected_runs = 0
+        self.full_runs = 0
+        self.tests_selected = 0
+
+        self._lock = threading.Lock()
+        self._graphs: "OrderedDict[str, ImportGraph]" = OrderedDict()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def runner_args(self, project_dir: Path, code_patch: str) -> List[str]:
+        """Extra test-runner arguments; [] means the full suite."""
+        changed = touched_files(code_patch) if self.enabled else []
+        selection = self.select(project_dir, changed) if changed else None
+        if selection is None:
+            self.full_runs += 1
+            return []
+        self.selected_runs += 1
+        self.tests_selected += len(selection)
+        if self.mode == "jest":
+            return ['--findRelatedTests', *selection]
+        return selection
+
+    def select(self, project_dir: Path, changed: Sequence[str]) -> Optional[List[str]]:
+        """Tests affected by `changed` (jest mode: the changed sources), or None for the full suite."""
+        if not all(path.endswith(SOURCE_EXTENSIONS) for path in changed):
+            return None
+        if self.mode == "jest":
+            return list(changed)
+        graph = self.graph(project_dir)
+        if graph is None:
+            return None
+        graph = graph.overlay(project_dir, changed)
+        tests = sorted(p for p in graph.dependents(changed) if is_test_file(p) and (project_dir / p).is_file())
+        return tests or None
+
+    def graph(self, project_dir: Path) -> Optional[ImportGraph]:
+        """Import graph of the tracked sources at HEAD, from memory, disk or a fresh scan."""
+        tree = tree_hash(project_dir)
+        if tree is None:
+            return None
+        with self._lock:
+            graph = self._graphs.get(tree)
+            if graph is not None:
+                self._graphs.move_to_end(tree)
+                return graph
+
+        cache_file = self.cache_dir / f"{tree}.{GRAPH_VERSION}.json" if self.cache_dir else None
+        graph = None
+        if cache_file is not None and cache_file.exists():
+            try:
+                graph = ImportGraph(json.loads(cache_file.read_text(encoding='utf-8')))
+            except (json.JSONDecodeError, OSError):
+                graph = None
+        if graph is None:
+            graph = ImportGraph.from_head(project_dir)
+            if cache_file is not None:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                temp = cache_file.with_suffix('.tmp')
+                temp.write_text(json.dumps(graph.edges), encoding='utf-8')
+                temp.replace(cache_file)
+
+        with self._lock:
+            self._graphs[tree] = graph
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode if self.enabled else 'off',
+            'selected_runs': self.selected_runs,
+            'full_runs': self.full_runs,
+            'tests_selected': self.tests_selected
+        }
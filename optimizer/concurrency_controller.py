@@ -0,0 +1,126 @@
+"""
+AIMDController: Adaptive Concurrency for In-Flight Gemini Rollouts
+
+Additive-increase / multiplicative-decrease window, in the spirit of TCP
+congestion control. Every successful Gemini call grows the window by
+1/window (about +1 per window's worth of successes); a transient error
+(429, RESOURCE_EXHAUSTED) or a timeout cuts it by `decrease_factor`, at
+most once per window of completions: the rollouts already in flight when
+the window was cut report the same congestion episode and are ignored.
+Optionally, calls slower than `latency_target` stop the window growing.
+RolloutExecutor reads `limit` to decide how many rollouts may run at once.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class AIMDController:
+    """
+    Thread-safe AIMD concurrency window with metrics history.
+
+    Usage:
+        controller = AIMDController(min_window=1, max_window=8)
+        controller.on_success(latency_seconds)
+        controller.on_congestion("rate_limit")
+        controller.limit  # -> int number of rollouts allowed in flight
+    """
+
+    def __init__(
+        self,
+        min_window: int = 1,
+        max_window: int = 8,
+        initial_window: Optional[float] = None,
+        additive_increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_target: Optional[float] = None,
+        history_size: int = 1000
+    ):
+        if not 1 <= min_window <= max_window:
+            raise ValueError(f"Expected 1 <= min_window <= max_window, got {min_window}, {max_window}")
+        if not 0 < decrease_factor < 1:
+            raise ValueError(f"decrease_factor must be in (0, 1), got {decrease_factor}")
+        self.min_window = min_window
+        self.max_window = max_window
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+
+        self._lock = threading.Lock()
+        self._window = float(initial_window if initial_window is not None else min_window)
+        self._window = min(max(self._window, min_window), max_window)
+        self._successes = 0
+        self._congestion_events = 0
+        self._suppressed_events = 0
+        # Completion count and window size at the last cut
+        self._completions = 0
+        self._last_cut: Optional[int] = None
+        self._cut_window = 0
+        self._ewma_latency: Optional[float] = None
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._record("init")
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def window(self) -> float:
+        return self._window
+
+    @property
+    def limit(self) -> int:
+        """Integer number of rollouts currently allowed in flight."""
+        return max(self.min_window, int(self._window))
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            self._completions += 1
+            self._successes += 1
+            self._ewma_latency = latency if self._ewma_latency is None else 0.8 * self._ewma_latency + 0.2 * latency
+            if self.latency_target is not None and latency > self.latency_target:
+                self._record("slow", latency)
+                return
+            self._window = min(self.max_window, self._window + self.additive_increase / self._window)
+            self._record("success", latency)
+
+    def on_congestion(self, reason: str = "rate_limit", latency: Optional[float] = None) -> None:
+        with self._lock:
+            self._completions += 1
+            self._congestion_events += 1
+            if self._last_cut is not None and self._completions - self._last_cut < self._cut_window:
+                self._suppressed_events += 1
+                self._record(f"{reason}_suppressed", latency)
+                return
+            self._last_cut = self._completions
+            self._cut_window = int(self._window)
+            self._window = max(float(self.min_window), self._window * self.decrease_factor)
+            self._record(reason, latency)
+
+    def history(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'window': round(self._window, 3),
+                'limit': self.limit,
+                'min_window': self.min_window,
+                'max_window': self.max_window,
+                'successes': self._successes,
+                'congestion_events': self._congestion_events,
+                'suppressed_congestion_events': self._suppressed_events,
+                'latency_target': self.latency_target,
+                'ewma_latency': self._ewma_latency,
+                'history': list(self._history)
+            }
+
+    def _record(self, event: str, latency: Optional[float] = None) -> None:
+        self._history.append({
+            'time': time.time(),
+            'event': event,
+            'window': round(self._window, 3),
+            'latency': latency
+        })
@@ -0,0 +1,131 @@
+"""
+ContextStore: Content-Addressed GEMINI.md Directories for Rollouts
+
+Each candidate instruction is materialized exactly once into an immutable
+directory named after its content hash (<root>/<sha256[:16]>/GEMINI.md).
+Rollouts lease a directory, point GEMINI_CONTEXT_PATH at it, and release
+it when done, so concurrent candidates never overwrite each other's
+instructions. Unreferenced directories are evicted in LRU order once the
+store grows past `max_entries`.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+
+CONTEXT_FILENAME = "GEMINI.md"
+
+
+class ContextStore:
+    """
+    Reference-counted, LRU-evicted store of content-addressed context dirs.
+
+    Usage:
+        store = ContextStore(Path(".dspy_cache/contexts/architect"))
+        with store.lease(instruction) as context_dir:
+            env["GEMINI_CONTEXT_PATH"] = str(context_dir)
+    """
+
+    def __init__(self, root: Path, max_entries: int = 64):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # digest -> active lease count; ordering is least-recently-used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._adopt_existing()
+
+    def __deepcopy__(self, memo):
+        # Shared across optimizer program copies: refcounts must be global.
+        return self
+
+    @staticmethod
+    def digest(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    def path_for(self, content: str) -> Path:
+        return self.root / self.digest(content)
+
+    def acquire(self, content: str) -> Path:
+        """Materialize `content` (if needed) and take a lease on its directory."""
+        digest = self.digest(content)
+        with self._lock:
+            context_dir = self.root / digest
+            if not (context_dir / CONTEXT_FILENAME).exists():
+                self._materialize(context_dir, content)
+            self._entries[digest] = self._entries.get(digest, 0) + 1
+            self._entries.move_to_end(digest)
+        return context_dir
+
+    def release(self, context_dir: Path) -> None:
+        """Drop a lease; unreferenced directories become eligible for eviction."""
+        digest = Path(context_dir).name
+        with self._lock:
+            if digest not in self._entries:
+                return
+            self._entries[digest] = max(0, self._entries[digest] - 1)
+            self._evict()
+
+    @contextmanager
+    def lease(self, content: str):
+        context_dir = self.acquire(content)
+        try:
+            yield context_dir
+        finally:
+            self.release(context_dir)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'leased': sum(1 for refs in self._entries.values() if refs > 0)
+            }
+
+    def _materialize(self, context_dir: Path, content: str) -> None:
+        # Build in a private temp dir, then rename into place so readers
+        # never observe a partially written context.
+        temp_dir = self.root / f".tmp-{context_dir.name}-{uuid.uuid4().hex[:8]}"
+        try:
+            temp_dir.mkdir()
+            context_file = temp_dir / CONTEXT_FILENAME
+            context_file.write_text(content, encoding='utf-8')
+            context_file.chmod(0o444)
+            try:
+                os.rename(temp_dir, context_dir)
+            except OSError:
+                # Another process materialized the same content first.
+                if not (context_dir / CONTEXT_FILENAME).exists():
+                    raise
+        except Exception as e:
+            raise IOError(f"Context materialization failed for {context_dir.name}: {e}")
+        finally:
+            if temp_dir.exists():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _evict(self) -> None:
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        for digest in [d for d, refs in self._entries.items() if refs == 0][:excess]:
+            del self._entries[digest]
+            shutil.rmtree(self.root / digest, ignore_errors=True)
+
+    def _adopt_existing(self) -> None:
+        """Register directories left by earlier runs, oldest first."""
+        existing = [
+            p for p in self.root.iterdir()
+            if p.is_dir() and not p.name.startswith('.tmp-') and (p / CONTEXT_FILENAME).exists()
+        ]
+        for p in sorted(existing, key=lambda p: p.stat().st_mtime):
+            self._entries[p.name] = 0
+        for p in self.root.glob('.tmp-*'):
+            shutil.rmtree(p, ignore_errors=True)
+        self._evict()
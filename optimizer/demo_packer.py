@@ -0,0 +1,143 @@
+"""
+DemoPacker: Token-Budgeted Demonstrations for Rollout Prompts
+
+`_prepare_prompt` used to include the first three demos whatever their
+size, so one large golden example could dominate the prompt while three
+tiny ones wasted it. The packer instead fills a token budget:
+
+  - demos are taken in the order given (the semantic matcher already
+    sorts them by relevance), skipping ones that no longer fit,
+  - a long solution is elided in the middle (head and tail kept) down to
+    `max_solution_tokens`, or to whatever budget is left,
+  - the rendered section is cached per (demo set, budget) hash, since the
+    same demos are packed for every rollout of a candidate.
+
+Token counts use the same ~4 characters/token estimate as the rate limiter.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .rate_limiter import estimate_tokens
+except ImportError:
+    from rate_limiter import estimate_tokens
+
+
+# Smallest useful solution excerpt; below this a demo is skipped, not elided
+MIN_SOLUTION_TOKENS = 64
+
+
+class DemoPacker:
+    """
+    Renders the demonstrations section of a prompt within a token budget.
+
+    Usage:
+        packer = DemoPacker(token_budget=4000, max_solution_tokens=1500)
+        section = packer.pack(demos)   # "" when nothing fits
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 4000,
+        max_solution_tokens: Optional[int] = 1500,
+        max_cached: int = 128
+    ):
+        if token_budget < 0:
+            raise ValueError(f"token_budget must be >= 0, got {token_budget}")
+        self.token_budget = token_budget
+        self.max_solution_tokens = max_solution_tokens
+        self.max_cached = max_cached
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def pack(self, demos: Sequence[Any]) -> str:
+        """Return the rendered demo blocks (without header) that fit the budget."""
+        if not demos or self.token_budget == 0:
+            return ""
+        pairs = [self._demo_fields(d) for d in demos]
+        key = self._cache_key(pairs)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        section = self._render(pairs)
+        with self._lock:
+            self._cache[key] = section
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return section
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'token_budget': self.token_budget,
+                'cache_hits': self.hits,
+                'cache_misses': self.misses,
+                'cached_sets': len(self._cache)
+            }
+
+    def _render(self, pairs: List[Tuple[str, str]]) -> str:
+        blocks = []
+        used = 0
+        for problem, solution in pairs:
+            # Separator plus "### Example N / **Problem:** / **Solution:**" scaffolding
+            overhead = estimate_tokens(problem) + 16
+            remaining = self.token_budget - used - overhead
+            if remaining < min(MIN_SOLUTION_TOKENS, estimate_tokens(solution)):
+                continue
+            limit = remaining if self.max_solution_tokens is None else min(remaining, self.max_solution_tokens)
+            solution = elide(solution, limit)
+            block = (
+                f"### Example {len(blocks) + 1}\n**Problem:**\n{problem}\n\n"
+                f"**Solution:**\n{solution}"
+            )
+            blocks.append(block)
+            used += estimate_tokens(block) + 4
+        return "\n\n---\n\n".join(blocks)
+
+    def _cache_key(self, pairs: List[Tuple[str, str]]) -> str:
+        payload = json.dumps([self.token_budget, self.max_solution_tokens, pairs], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _demo_fields(demo: Any) -> Tuple[str, str]:
+        problem = getattr(demo, 'story_context', str(demo))
+        solution = getattr(demo, 'code_patch', '')
+        return str(problem), str(solution or '')
+
+
+def elide(text: str, max_tokens: int) -> str:
+    """
+    Shorten `text` to about `max_tokens`, keeping its head and tail.
+
+    Cuts on line boundaries where possible and states how much was dropped.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4 - 48)
+    head = text[:max_chars * 2 // 3]
+    tail = text[len(text) - max_chars // 3:] if max_chars >= 3 else ""
+    if "\n" in head:
+        head = head[:head.rfind("\n") + 1]
+    if "\n" in tail:
+        tail = tail[tail.find("\n") + 1:]
+    omitted = text[len(head):len(text) - len(tail)]
+    lines = omitted.count("\n") + 1
+    parts = [head.rstrip("\n"), f"... [{lines} lines / {len(omitted)} chars elided] ..."]
+    if tail:
+        parts.append(tail)
+    return "\n".join(parts)
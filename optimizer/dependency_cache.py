@@ -0,0 +1,200 @@
+"""
+DependencyCache: Shared node_modules for Sandboxes
+
+A fresh worktree has no `node_modules`, so every sandboxed `npm test`
+either failed outright or paid a full install. The cache installs each
+distinct dependency manifest once, under .dspy_cache/deps/<hash>/, and
+exposes the result to sandboxes:
+
+  - `symlink` (default): node_modules -> the shared tree, constant time;
+  - `hardlink`: a tree of hardlinks to the shared files, for tools that
+    resolve symlinks badly (falls back to copying across filesystems).
+
+The hash covers package.json, the lockfile and .npmrc as they exist in
+the sandbox, so a new HEAD with different dependencies gets its own tree.
+A patch that edits one of those files gets a real `npm install` inside its
+sandbox instead, since its dependencies are not known in advance and must
+not leak into the shared tree.
+
+Builds are serialized per hash with an fcntl lock, so concurrent
+sandboxes (and optimizer processes) wait for one install rather than
+racing.
+"""
+
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Files whose content decides what `npm install` produces
+MANIFEST_FILES = (
+    "package.json",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    ".npmrc",
+)
+
+_PATCH_PATH = re.compile(r'^(?:\+\+\+|---) (?:[ab]/)?(\S+)', re.MULTILINE)
+
+
+def patch_touches_manifest(patch: str) -> bool:
+    """True if a unified diff modifies a root-level dependency manifest."""
+    return any(path in MANIFEST_FILES for path in _PATCH_PATH.findall(patch or ""))
+
+
+class DependencyCache:
+    """
+    One installed node_modules per manifest hash, linked into sandboxes.
+
+    Usage:
+        deps = DependencyCache(repo_root / ".dspy_cache" / "deps")
+        deps.prepare(sandbox_dir, code_patch)   # after applying the patch
+    """
+
+    MARKER = ".ouroboros-deps"
+
+    def __init__(
+        self,
+        root: Path,
+        mode: str = "symlink",
+        install_command: Optional[Sequence[str]] = None,
+        install_timeout: float = 600.0
+    ):
+        if mode not in ("symlink", "hardlink"):
+            raise ValueError(f"mode must be 'symlink' or 'hardlink', got {mode!r}")
+        self.root = Path(root)
+        self.mode = mode
+        # None = `npm ci` when a lockfile exists, `npm install` otherwise
+        self.install_command = list(install_command) if install_command else None
+        self.install_timeout = install_timeout
+        self.builds = 0
+        self.reuses = 0
+        self.sandbox_installs = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def manifest_hash(self, project_dir: Path) -> Optional[str]:
+        """Digest of the dependency manifests in `project_dir`; None without package.json."""
+        if not (project_dir / "package.json").exists():
+            return None
+        digest = hashlib.sha256()
+        for name in MANIFEST_FILES:
+            path = project_dir / name
+            if path.exists():
+                digest.update(name.encode('utf-8') + b"\0" + path.read_bytes() + b"\0")
+        return digest.hexdigest()[:24]
+
+    def prepare(self, sandbox: Path, code_patch: str = "") -> str:
+        """
+        Give `sandbox` a node_modules matching its manifests.
+
+        Returns 'linked', 'installed' (patch changed the manifests) or
+        'none' (not a Node project).
+        """
+        link = sandbox / "node_modules"
+        if patch_touches_manifest(code_patch):
+            self._remove(link)
+            self._install(sandbox)
+            self.sandbox_installs += 1
+            return "installed"
+
+        modules = self.ensure(sandbox)
+        if modules is None:
+            return "none"
+        if not self._is_linked(link, modules):
+            self._remove(link)
+            self._link(modules, link)
+        return "linked"
+
+    def ensure(self, project_dir: Path) -> Optional[Path]:
+        """Return the shared node_modules for `project_dir`'s manifests, installing it once."""
+        key = self.manifest_hash(project_dir)
+        if key is None:
+            return None
+        target = self.root / key
+        modules = target / "node_modules"
+        if (target / self.MARKER).exists():
+            self.reuses += 1
+            return modules
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / f"{key}.lock", 'a+') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if (target / self.MARKER).exists():
+                    # Built by another sandbox while we waited
+                    self.reuses += 1
+                    return modules
+                staging = self.root / f"{key}.staging-{os.getpid()}"
+                shutil.rmtree(staging, ignore_errors=True)
+                staging.mkdir()
+                for name in MANIFEST_FILES:
+                    if (project_dir / name).exists():
+                        shutil.copy2(project_dir / name, staging / name)
+                self._install(staging)
+                (staging / "node_modules").mkdir(exist_ok=True)
+                (staging / self.MARKER).write_text(key, encoding='utf-8')
+                shutil.rmtree(target, ignore_errors=True)
+                staging.rename(target)
+                self.builds += 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return modules
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'builds': self.builds,
+            'reuses': self.reuses,
+            'sandbox_installs': self.sandbox_installs
+        }
+
+    def _install(self, project_dir: Path) -> None:
+        command = self.install_command or self._default_install(project_dir)
+        result = subprocess.run(
+            command,
+            cwd=project_dir,
+            capture_output=True,
+            text=True,
+            timeout=self.install_timeout
+        )
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(
+                result.returncode, command, result.stdout, result.stderr
+            )
+
+    @staticmethod
+    def _default_install(project_dir: Path) -> List[str]:
+        locked = (project_dir / "package-lock.json").exists() or (project_dir / "npm-shrinkwrap.json").exists()
+        return ['npm', 'ci' if locked else 'install', '--no-audit', '--no-fund']
+
+    def _is_linked(self, link: Path, modules: Path) -> bool:
+        if self.mode == "symlink":
+            return link.is_symlink() and os.readlink(link) == str(modules)
+        marker = link / self.MARKER
+        return not link.is_symlink() and marker.exists() and marker.read_text(encoding='utf-8') == modules.parent.name
+
+    def _link(self, modules: Path, link: Path) -> None:
+        if self.mode == "symlink":
+            link.symlink_to(modules, target_is_directory=True)
+            return
+        try:
+            shutil.copytree(modules, link, symlinks=True, copy_function=os.link)
+        except (shutil.Error, OSError):
+            # Different filesystem (e.g. tmpfs sandboxes): hardlinks are impossible
+            shutil.rmtree(link, ignore_errors=True)
+            shutil.copytree(modules, link, symlinks=True)
+        (link / self.MARKER).write_text(modules.parent.name, encoding='utf-8')
+
+    @staticmethod
+    def _remove(link: Path) -> None:
+        if link.is_symlink() or link.is_file():
+            link.unlink()
+        elif link.exists():
+            shutil.rmtree(link)
@@ -0,0 +1,111 @@
+"""
+FeedbackSummarizer: Bounded, Deduplicated Metric Feedback
+
+Metric feedback goes straight into GEPA's reflection prompts. A suite
+where twenty tests fail on the same assertion used to repeat that failure
+(and its stack trace) twenty times. The summarizer:
+
+  - groups messages by a normalized signature: paths (with :line:col),
+    numbers and whitespace runs are replaced, so the same failure at a
+    different line or with a different value lands in one group,
+  - renders each group once, with its count, largest groups first,
+  - collapses repeated lines in raw log tails the same way,
+  - enforces a hard budget per feedback string (characters, and tokens
+    estimated like the rate limiter does), cutting from the end, where the
+    least important sections are.
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .rate_limiter import estimate_tokens
+except ImportError:
+    from rate_limiter import estimate_tokens
+
+# Starts only where a run of path characters starts, so a long run without a
+# separator is rejected once instead of once per position
+_PATH = re.compile(r'(?<![\w.@~/\\:-])(?:[A-Za-z]:)?[\w.@~-]*[/\\][\w.@~/\\-]*(?::\d+)*')
+_NUMBER = re.compile(r'\b(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?)\b')
+_SPACE = re.compile(r'\s+')
+
+TRUNCATION_NOTE = "\n... [feedback truncated]"
+
+
+def error_signature(message: str) -> str:
+    """Normalized form of an error message used to group duplicates."""
+    signature = _PATH.sub("<path>", message)
+    signature = _NUMBER.sub("<n>", signature)
+    return _SPACE.sub(" ", signature).strip()
+
+
+class FeedbackSummarizer:
+    """
+    Deduplicates and bounds feedback strings.
+
+    Usage:
+        summarizer = FeedbackSummarizer(max_chars=2000)
+        lines = summarizer.summarize(type_errors, limit=3)   # ["x is undefined (x12)", ...]
+        feedback = summarizer.fit(feedback)
+    """
+
+    def __init__(self, max_chars: int = 2000, max_tokens: Optional[int] = None, max_item_chars: int = 300):
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        # A single representative longer than this is cut (e.g. a whole stack trace)
+        self.max_item_chars = max_item_chars
+        self.truncated = 0
+
+    def group(
+        self,
+        items: Iterable[Any],
+        key: Callable[[Any], str] = error_signature
+    ) -> List[Tuple[Any, int]]:
+        """(first item, count) per signature, most frequent first, then first seen."""
+        groups: Dict[str, List[Any]] = {}
+        for item in items:
+            signature = key(item)
+            if signature in groups:
+                groups[signature][1] += 1
+            else:
+                groups[signature] = [item, 1]
+        return sorted(((item, count) for item, count in groups.values()), key=lambda g: -g[1])
+
+    def summarize(self, messages: Iterable[str], limit: Optional[int] = None) -> List[str]:
+        """One line per distinct message, with its count when repeated."""
+        groups = self.group(messages)
+        shown = groups if limit is None else groups[:limit]
+        lines = [self._clip(message) + (f" (x{count})" if count > 1 else "") for message, count in shown]
+        if len(groups) > len(shown):
+            lines.append(f"... and {len(groups) - len(shown)} more distinct")
+        return lines
+
+    def condense_log(self, log: str) -> str:
+        """Keep lines in order, but each distinct line (by signature) only once, with its count."""
+        lines = log.splitlines()
+        signatures = [error_signature(line) for line in lines]
+        counts: Dict[str, int] = {}
+        for signature in signatures:
+            counts[signature] = counts.get(signature, 0) + 1
+        condensed = []
+        for line, signature in zip(lines, signatures):
+            count = counts.pop(signature, None)
+            if count is not None:
+                condensed.append(line + (f"  [x{count}]" if count > 1 else ""))
+        return "\n".join(condensed)
+
+    def fit(self, feedback: str) -> str:
+        """Cut `feedback` to the character/token budget."""
+        budget = self.max_chars
+        if self.max_tokens is not None:
+            # Inverse of estimate_tokens
+            budget = min(budget, self.max_tokens * 4)
+        if len(feedback) <= budget and (self.max_tokens is None or estimate_tokens(feedback) <= self.max_tokens):
+            return feedback
+        self.truncated += 1
+        return feedback[:max(0, budget - len(TRUNCATION_NOTE))] + TRUNCATION_NOTE
+
+    def _clip(self, message: str) -> str:
+        if len(message) <= self.max_item_chars:
+            return message
+        return message[:self.max_item_chars] + "..."
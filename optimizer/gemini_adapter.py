@@ -7,14 +7,53 @@ to natively refine the prompt text.
 """
 
 import dspy
+import asyncio
 import subprocess
 import os
 import json
 import hashlib
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
+# Binaries already validated in this process; avoids paying a Node.js cold
+# start for `--version` every time an adapter is constructed.
+_VALIDATED_BINARIES = set()
+
+try:
+    from .rollout_executor import RolloutExecutor
+    from .context_store import ContextStore
+    from .response_cache import CacheMissError, ResponseCache
+    from .worker_pool import WorkerPool
+    from .rate_limiter import SharedRateLimiter, estimate_tokens, is_transient_error
+    from .concurrency_controller import AIMDController
+    from .stream_reader import StreamMonitor
+    from .output_parser import ParsedResponse, parse_cli_output
+    from .trace_store import TraceStore
+    from .demo_packer import DemoPacker
+    from .suite_cache import SuiteCache, tree_hash
+    from .affected_tests import AffectedTestSelector
+    from .shard_runner import ShardedTestRunner
+    from .runner_daemon import RunnerDaemonError, RunnerDaemonPool
+    from .resource_governor import ResourceGovernor
+except ImportError:
+    from rollout_executor import RolloutExecutor
+    from context_store import ContextStore
+    from response_cache import CacheMissError, ResponseCache
+    from worker_pool import WorkerPool
+    from rate_limiter import SharedRateLimiter, estimate_tokens, is_transient_error
+    from concurrency_controller import AIMDController
+    from stream_reader import StreamMonitor
+    from output_parser import ParsedResponse, parse_cli_output
+    from trace_store import TraceStore
+    from demo_packer import DemoPacker
+    from suite_cache import SuiteCache, tree_hash
+    from affected_tests import AffectedTestSelector
+    from shard_runner import ShardedTestRunner
+    from runner_daemon import RunnerDaemonError, RunnerDaemonPool
+    from resource_governor import ResourceGovernor
+
 
 class GeminiSignature(dspy.Signature):
     """
@@ -45,7 +84,25 @@ class GeminiSkillAdapter(dspy.Module):
         context_dir: Optional[Path] = None,
         demos: List = None,
         semantic_matcher = None,
-        top_k: int = 3
+        top_k: int = 3,
+        concurrency: int = 1,
+        executor: Optional[RolloutExecutor] = None,
+        max_cached_contexts: int = 64,
+        cache_mode: str = "off",
+        cache_ttl_seconds: Optional[float] = 30 * 24 * 3600,
+        cache_max_bytes: Optional[int] = 512 * 1024 * 1024,
+        worker_pool: Optional[WorkerPool] = None,
+        rate_limiter: Optional[SharedRateLimiter] = None,
+        controller: Optional[AIMDController] = None,
+        max_output_bytes: Optional[int] = 8 * 1024 * 1024,
+        early_stop: bool = True,
+        demo_token_budget: int = 4000,
+        demo_max_solution_tokens: Optional[int] = 1500,
+        test_cache: Optional[SuiteCache] = None,
+        test_selector: Optional[AffectedTestSelector] = None,
+        test_runner: Optional[ShardedTestRunner] = None,
+        test_daemons: Optional[RunnerDaemonPool] = None,
+        resource_governor: Optional[ResourceGovernor] = None
     ):
         super().__init__()
         self.gemini_binary = gemini_binary
@@ -53,10 +110,38 @@ class GeminiSkillAdapter(dspy.Module):
         self.timeout = timeout_seconds
         self.max_retries = max_retries
         self.output_format = output_format
+        # Streaming stdout limits: kill runaway generations, stop once the patch is in
+        self.max_output_bytes = max_output_bytes
+        self.early_stop = early_stop
         self.base_instruction = base_instruction
         self.demos = demos or []
         self.semantic_matcher = semantic_matcher
         self.top_k = top_k
+        # Demos are packed into a fixed token budget in relevance order
+        self.demo_packer = DemoPacker(
+            token_budget=demo_token_budget,
+            max_solution_tokens=demo_max_solution_tokens
+        )
+        
+        # Shared executor bounds the number of in-flight rollouts across all
+        # threads and candidate copies created by the optimizer.
+        self.executor = executor or RolloutExecutor(concurrency=concurrency, controller=controller)
+        # Fed with transient-error and latency outcomes of every CLI attempt
+        self.controller = controller or self.executor.controller
+        # Optional pre-warmed CLI processes; None means spawn-per-call
+        self.worker_pool = worker_pool
+        # Optional quota shared with every other optimizer process
+        self.rate_limiter = rate_limiter
+        # Optional (tree, patch, command) -> test result cache
+        self.test_cache = test_cache
+        # Optional affected-test selection (full suite when None)
+        self.test_selector = test_selector
+        # Optional sharded execution within a CPU budget shared with the metric
+        self.test_runner = test_runner
+        # Optional warm test runner per project directory
+        self.test_daemons = test_daemons
+        # Optional accounting and CPU/memory ceilings for npm test subprocesses
+        self.resource_governor = resource_governor
         
         # Define the predictor. Its instructions are the optimization target.
         self.predictor = dspy.Predict(GeminiSignature)
@@ -68,11 +153,27 @@ class GeminiSkillAdapter(dspy.Module):
             self.context_path = self.repo_root / ".gemini" / "GEMINI.md"
             
         self.cache_dir = self.repo_root / ".dspy_cache"
-        self.trace_dir = self.cache_dir / "trace_logs"
+        # Traces are appended off the rollout path by a background writer
+        self.trace_store = TraceStore(self.cache_dir / "traces")
+        
+        # Per-candidate immutable context dirs (keyed by content hash) so that
+        # concurrent rollouts never share a mutable GEMINI.md
+        session_name = context_dir.name if context_dir else "default"
+        self.context_store = ContextStore(
+            self.cache_dir / "contexts" / session_name,
+            max_entries=max_cached_contexts
+        )
+        
+        # Persistent cache of CLI responses keyed by (instruction, prompt, model, format)
+        self.response_cache = ResponseCache(
+            self.cache_dir / "responses.sqlite",
+            mode=cache_mode,
+            ttl_seconds=cache_ttl_seconds,
+            max_bytes=cache_max_bytes
+        )
         
         # Ensure directories exist
         self.context_path.parent.mkdir(parents=True, exist_ok=True)
-        self.trace_dir.mkdir(parents=True, exist_ok=True)
         
         self._validate_gemini_cli()
     
@@ -83,7 +184,40 @@ class GeminiSkillAdapter(dspy.Module):
     ) -> dspy.Prediction:
         """
         Execute Gemini with the instructions currently in the signature.
+        
+        Synchronous wrapper so DSPy optimizers keep working; the rollout
+        itself runs on the shared executor and respects its concurrency limit.
+        """
+        return self.executor.run(self.aforward(story_context, tech_stack))
+    
+    def forward_batch(self, inputs: List[Dict[str, str]]) -> List[dspy.Prediction]:
+        """
+        Run several rollouts concurrently.
+        
+        Args:
+            inputs: List of {'story_context': ..., 'tech_stack': ...} dicts
+        
+        Returns:
+            Predictions in the same order as inputs
+        """
+        return self.executor.gather([self.aforward(**kw) for kw in inputs])
+    
+    async def aforward(
+        self,
+        story_context: str,
+        tech_stack: str
+    ) -> dspy.Prediction:
         """
+        Async rollout: holds one executor slot for the whole Gemini + test cycle.
+        """
+        async with self.executor.slot():
+            return await self._arollout(story_context, tech_stack)
+    
+    async def _arollout(
+        self,
+        story_context: str,
+        tech_stack: str
+    ) -> dspy.Prediction:
         rollout_id = self._generate_rollout_id()
         start_time = datetime.utcnow()
         
@@ -91,9 +225,9 @@ class GeminiSkillAdapter(dspy.Module):
         instruction = self.predictor.signature.instructions
         
         try:
-            # Step 1: Atomic write of candidate instruction (combined with base)
+            # Step 1: Candidate instruction (combined with base), materialized
+            # once per unique content in the context store
             full_context = f"{self.base_instruction}\n\n{instruction}" if self.base_instruction else instruction
-            self._write_context_atomic(full_context)
             
             # Step 2: Select demos - use semantic matching if available, else fixed demos
             selected_demos = self.demos
@@ -104,15 +238,35 @@ class GeminiSkillAdapter(dspy.Module):
             # Step 3: Prepare prompt with selected demos
             prompt = self._prepare_prompt(story_context, tech_stack, selected_demos)
             
-            # Step 3: Invoke Gemini CLI
-            result = self._execute_gemini_with_retry(prompt, rollout_id)
+            # Step 3: Invoke Gemini CLI against this candidate's isolated context,
+            # unless an identical rollout is already in the response cache.
+            # SQLite and filesystem work runs in worker threads so it never
+            # stalls the event loop shared by every in-flight rollout.
+            cache_key = self.response_cache.make_key(
+                full_context, prompt, os.environ.get("GEMINI_MODEL", ""), self.output_format
+            )
+            result = await asyncio.to_thread(self.response_cache.get, cache_key)
+            model_seconds = 0.0
+            if result is None:
+                candidate_context = await asyncio.to_thread(self.context_store.acquire, full_context)
+                started = time.monotonic()
+                try:
+                    result = await self._aexecute_gemini_with_retry(prompt, rollout_id, candidate_context)
+                finally:
+                    model_seconds = time.monotonic() - started
+                    await asyncio.to_thread(self.context_store.release, candidate_context)
+                if not self._is_transient_error(result):
+                    await asyncio.to_thread(self.response_cache.put, cache_key, result)
             
-            # Step 4: Parse structured output
-            code_patch = self._extract_code_changes(result.stdout)
-            reasoning = self._extract_reasoning(result.stdout)
+            # Step 4: Parse structured output (single decode of stdout)
+            parsed = self._parse_output(result.stdout)
+            code_patch = parsed.code_patch or ""
+            reasoning = parsed.reasoning or "No reasoning"
             
             # Step 5: Run validation tests
-            test_results = self._run_tests()
+            started = time.monotonic()
+            test_results, resources = await asyncio.to_thread(self._run_tests_with_usage, code_patch)
+            test_seconds = time.monotonic() - started
             
             # Step 6: Build execution trace (includes code_patch for retrospective)
             trace = self._build_trace(
@@ -124,7 +278,10 @@ class GeminiSkillAdapter(dspy.Module):
                 stderr=result.stderr,
                 returncode=result.returncode,
                 test_results=test_results,
-                start_time=start_time
+                start_time=start_time,
+                stream=getattr(result, 'stream', None),
+                timings={'model_seconds': round(model_seconds, 3), 'test_seconds': round(test_seconds, 3)},
+                resources=resources
             )
             
             print(f"[DEBUG] Rollout {rollout_id} - Code Patch length: {len(code_patch)}")
@@ -139,6 +296,9 @@ class GeminiSkillAdapter(dspy.Module):
             
         except subprocess.TimeoutExpired as e:
             return self._handle_timeout(rollout_id, e)
+        except CacheMissError:
+            # Replay runs must fail loudly rather than score an empty rollout
+            raise
         except Exception as e:
             return self._handle_error(rollout_id, e)
     
@@ -152,14 +312,7 @@ class GeminiSkillAdapter(dspy.Module):
             raise IOError(f"Atomic GEMINI.md write failed: {e}")
     
     def _prepare_prompt(self, story_context: str, tech_stack: str, demos: List = None) -> str:
-        demo_section = ""
-        if demos:
-            demo_parts = []
-            for i, d in enumerate(demos[:3]):  # Max 3 demos to avoid context overflow
-                problem = getattr(d, 'story_context', str(d))
-                solution = getattr(d, 'code_patch', '')
-                demo_parts.append(f"### Example {i+1}\n**Problem:**\n{problem}\n\n**Solution:**\n{solution}")
-            demo_section = "\n\n---\n\n".join(demo_parts)
+        demo_section = self.demo_packer.pack(demos) if demos else ""
         
         demos_header = f"## Demonstrations\n{demo_section}\n\n" if demo_section else ""
         
@@ -172,70 +325,150 @@ class GeminiSkillAdapter(dspy.Module):
 Read context from .gemini/GEMINI.md. Output reasoning then code changes as JSON.
 """
     
-    def _execute_gemini_with_retry(
-        self,
-        prompt: str,
-        rollout_id: str
-    ) -> subprocess.CompletedProcess:
-        import time
-        
-        gemini_args = [
-            self.gemini_binary,
-            "-p", prompt,
-            "--output-format", self.output_format
-        ]
+    def _build_gemini_args(self, prompt: Optional[str] = None) -> List[str]:
+        gemini_args = [self.gemini_binary]
+        if prompt is not None:
+            gemini_args.extend(["-p", prompt])
+        gemini_args.extend(["--output-format", self.output_format])
         
         # Support GEMINI_MODEL env var natively
         model_env = os.environ.get("GEMINI_MODEL")
         if model_env:
             gemini_args.extend(["--model", model_env])
+        return gemini_args
+    
+    def _gemini_env(self, rollout_id: str, context_dir: Optional[Path] = None) -> Dict[str, str]:
+        return {
+            **os.environ,
+            "GEMINI_CONTEXT_PATH": str(context_dir or self.context_path.parent),
+            "GEMINI_ROLLOUT_ID": rollout_id
+        }
+    
+    def _execute_gemini_with_retry(
+        self,
+        prompt: str,
+        rollout_id: str,
+        context_dir: Optional[Path] = None
+    ) -> subprocess.CompletedProcess:
+        return self.executor.run(self._aexecute_gemini_with_retry(prompt, rollout_id, context_dir))
+    
+    async def _aexecute_gemini_with_retry(
+        self,
+        prompt: str,
+        rollout_id: str,
+        context_dir: Optional[Path] = None
+    ) -> subprocess.CompletedProcess:
+        gemini_args = self._build_gemini_args(prompt)
 
         for attempt in range(self.max_retries + 1):
             try:
-                process = subprocess.Popen(
-                    gemini_args,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.DEVNULL,
-                    text=True,
-                    cwd=self.repo_root,
-                    env={
-                        **os.environ,
-                        "GEMINI_CONTEXT_PATH": str(self.context_path.parent),
-                        "GEMINI_ROLLOUT_ID": rollout_id
-                    }
-                )
-                stdout, stderr = process.communicate(timeout=self.timeout)
-                result = subprocess.CompletedProcess(gemini_args, process.returncode, stdout, stderr)
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.aacquire(estimate_tokens(prompt))
+                attempt_start = time.monotonic()
+                if self.worker_pool is not None:
+                    # Prompt goes over stdin to a pre-warmed process
+                    result = await asyncio.to_thread(
+                        self.worker_pool.run,
+                        self._build_gemini_args(),
+                        prompt,
+                        self.timeout,
+                        self.repo_root,
+                        self._gemini_env(rollout_id, context_dir)
+                    )
+                else:
+                    result = await self.executor.run_process(
+                        gemini_args,
+                        timeout=self.timeout,
+                        cwd=self.repo_root,
+                        env=self._gemini_env(rollout_id, context_dir),
+                        monitor=StreamMonitor(
+                            output_format=self.output_format,
+                            max_bytes=self.max_output_bytes,
+                            stop_on_patch=self.early_stop
+                        )
+                    )
+                latency = time.monotonic() - attempt_start
                 if self._is_transient_error(result):
+                    if self.controller is not None:
+                        self.controller.on_congestion("rate_limit", latency)
+                    if self.rate_limiter is not None:
+                        # Shared cool-down for every process, even if this one
+                        # gives up; the next aacquire() waits it out
+                        await asyncio.to_thread(self.rate_limiter.penalize)
                     if attempt < self.max_retries:
-                        time.sleep(2 ** attempt)
+                        if self.rate_limiter is None:
+                            await asyncio.sleep(2 ** attempt)
                         continue
+                elif self.controller is not None:
+                    self.controller.on_success(latency)
                 return result
             except subprocess.TimeoutExpired:
+                if self.controller is not None:
+                    self.controller.on_congestion("timeout", self.timeout)
                 if attempt < self.max_retries:
                     continue
                 raise
         raise RuntimeError(f"Gemini execution failed after {self.max_retries} retries")
 
-    def _run_tests(self) -> str:
+    def _run_tests(self, code_patch: str = "") -> str:
+        return self._run_tests_with_usage(code_patch)[0]
+
+    def _run_tests_with_usage(self, code_patch: str = "") -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Test results JSON plus the test subprocess's resource usage (None on a
+        cache hit, or when no governor ran it). Usage is kept out of the
+        results so cache and metric memo keys do not change with timings.
+        """
+        command = ['npm', 'test', '--', '--silent', '--json']
+        extra_args = []
+        if self.test_selector is not None:
+            extra_args = self.test_selector.runner_args(self.repo_root, code_patch)
+        cache_key = None
+        if self.test_cache is not None:
+            # The CLI edits repo_root in place, so key on the live working tree
+            tree = tree_hash(self.repo_root, include_worktree=True)
+            if tree is not None:
+                cache_key = self.test_cache.make_key(tree, code_patch, command + extra_args)
+                cached = self.test_cache.get(cache_key)
+                if cached is not None:
+                    return cached, None
+        usage = None
         try:
-            result = subprocess.run(
-                ['npm', 'test', '--', '--silent', '--json'],
-                capture_output=True,
-                text=True,
-                timeout=120,
-                cwd=self.repo_root,
-                check=False
-            )
-            return json.dumps({
-                'exit_code': result.returncode,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'success': result.returncode == 0
-            })
-        except subprocess.TimeoutExpired:
-            return json.dumps({'error': 'timeout', 'success': False})
+            payload = None
+            if self.test_daemons is not None:
+                try:
+                    payload = self.test_daemons.run(self.repo_root, extra_args, timeout=120)
+                except RunnerDaemonError:
+                    # e.g. Jest not installed: run npm test instead
+                    payload = None
+            if payload is None and self.test_runner is not None:
+                payload = self.test_runner.run(self.repo_root, command, extra_args, timeout=120)
+            if payload is not None:
+                test_results = json.dumps(payload)
+            else:
+                if self.resource_governor is not None:
+                    result = self.resource_governor.run(command + extra_args, cwd=self.repo_root, timeout=120)
+                    usage = result.usage
+                else:
+                    result = subprocess.run(
+                        command + extra_args,
+                        capture_output=True,
+                        text=True,
+                        timeout=120,
+                        cwd=self.repo_root,
+                        check=False
+                    )
+                test_results = json.dumps({
+                    'exit_code': result.returncode,
+                    'stdout': result.stdout,
+                    'stderr': result.stderr,
+                    'success': result.returncode == 0
+                })
+            if cache_key is not None:
+                self.test_cache.put(cache_key, test_results)
+            return test_results, usage
+        except subprocess.TimeoutExpired as e:
+            return json.dumps({'error': 'timeout', 'success': False}), getattr(e, 'usage', None)
 
     def _detect_repo_root(self) -> Path:
         current = Path.cwd()
@@ -246,44 +479,28 @@ Read context from .gemini/GEMINI.md. Output reasoning then code changes as JSON.
         raise RuntimeError("Cannot detect repository root")
 
     def _validate_gemini_cli(self) -> None:
+        if self.gemini_binary in _VALIDATED_BINARIES:
+            return
         try:
             subprocess.run([self.gemini_binary, "--version"], capture_output=True, timeout=5, check=True)
         except:
             raise RuntimeError("Gemini CLI not found")
+        _VALIDATED_BINARIES.add(self.gemini_binary)
 
     def _generate_rollout_id(self) -> str:
         return f"rollout_{datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')}"
 
     def _extract_code_changes(self, stdout: str) -> str:
-        try:
-            # Handle potential markdown wrapping
-            clean_stdout = stdout.strip()
-            if clean_stdout.startswith("```json"):
-                import re
-                match = re.search(r'```json\s*(.*?)\s*```', clean_stdout, re.DOTALL)
-                if match:
-                    clean_stdout = match.group(1)
-            
-            data = json.loads(clean_stdout)
-            return data.get('code_patch', stdout)
-        except Exception as e:
-            print(f"[WARNING] Failed to parse code_patch JSON: {e}")
-            return stdout
+        return self._parse_output(stdout).code_patch or ""
 
     def _extract_reasoning(self, stdout: str) -> str:
-        try:
-            clean_stdout = stdout.strip()
-            if clean_stdout.startswith("```json"):
-                import re
-                match = re.search(r'```json\s*(.*?)\s*```', clean_stdout, re.DOTALL)
-                if match:
-                    clean_stdout = match.group(1)
-            
-            data = json.loads(clean_stdout)
-            return data.get('reasoning', "No reasoning")
-        except Exception as e:
-            print(f"[WARNING] Failed to parse reasoning JSON: {e}")
-            return "No reasoning"
+        return self._parse_output(stdout).reasoning or "No reasoning"
+
+    def _parse_output(self, stdout: str) -> ParsedResponse:
+        parsed = parse_cli_output(stdout)
+        if parsed.data is None and parsed.code_patch is None:
+            print(f"[WARNING] No structured JSON or diff found in CLI output ({len(stdout)} chars)")
+        return parsed
 
     def _build_trace(self, **kwargs) -> Dict[str, Any]:
         trace = {
@@ -295,16 +512,28 @@ Read context from .gemini/GEMINI.md. Output reasoning then code changes as JSON.
             'success': kwargs['returncode'] == 0,
             'test_results': kwargs['test_results']
         }
-        trace_file = self.trace_dir / f"{kwargs['rollout_id']}.json"
-        trace_file.write_text(json.dumps(trace, indent=2), encoding='utf-8')
+        if kwargs.get('timings'):
+            trace['timings'] = kwargs['timings']
+        if kwargs.get('resources'):
+            trace['resources'] = kwargs['resources']
+        stream = kwargs.get('stream')
+        if stream:
+            trace['stream'] = stream
+            if stream['termination'] != 'exit':
+                # Surface what was received before the process was stopped
+                trace['partial_output'] = kwargs.get('stdout', '')[-4000:]
+        self.trace_store.append(trace)
         return trace
 
     def _is_transient_error(self, result: subprocess.CompletedProcess) -> bool:
-        error_text = result.stderr + result.stdout
-        return any(p in error_text for p in ["429", "Rate limit", "RESOURCE_EXHAUSTED"])
+        return is_transient_error(result.stderr, result.stdout)
 
     def _handle_timeout(self, rollout_id: str, error: Exception) -> dspy.Prediction:
-        return dspy.Prediction(code_patch="", test_results="{}", reasoning="timeout", execution_trace={})
+        partial = getattr(error, 'output', None) or ""
+        if isinstance(partial, bytes):
+            partial = partial.decode('utf-8', errors='replace')
+        trace = {'rollout_id': rollout_id, 'error': 'timeout', 'partial_output': partial[-4000:]} if partial else {}
+        return dspy.Prediction(code_patch="", test_results="{}", reasoning="timeout", execution_trace=trace)
 
     def _handle_error(self, rollout_id: str, error: Exception) -> dspy.Prediction:
         return dspy.Prediction(code_patch="", test_results="{}", reasoning=str(error), execution_trace={})
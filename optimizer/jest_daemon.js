@@ -0,0 +1,96 @@
+#!/usr/bin/env node
+/*
+ * Long-lived Jest runner for one project directory (see runner_daemon.py).
+ *
+ * Usage: node jest_daemon.js <socket path>   (cwd = project directory)
+ *
+ * Protocol: newline-delimited JSON over a Unix socket.
+ *   {"command": "ping"}                      -> {"ok": true, "rss": <bytes>}
+ *   {"command": "run", "argv": {"_": [...]}} -> {"ok": true, "results": <jest --json report>, "rss": <bytes>}
+ * Runs are serialized: tests execute in band inside this process, which is
+ * what keeps Jest, the transformers and their caches warm between runs.
+ */
+'use strict';
+
+const fs = require('fs');
+const net = require('net');
+
+const socketPath = process.argv[2];
+const projectDir = process.cwd();
+
+function load(name) {
+  try {
+    return require(require.resolve(name, { paths: [projectDir] }));
+  } catch (err) {
+    return null;
+  }
+}
+
+const jest = load('jest') || load('@jest/core');
+if (!jest || typeof jest.runCLI !== 'function') {
+  console.error(`jest is not installed in ${projectDir}`);
+  process.exit(3);
+}
+const testResult = load('@jest/test-result');
+
+function rss() {
+  return process.memoryUsage().rss;
+}
+
+async function run(request) {
+  const argv = Object.assign(
+    { _: [], $0: 'jest', silent: true, runInBand: true, watchman: false, ci: true },
+    request.argv || {}
+  );
+  try {
+    const { results } = await jest.runCLI(argv, [projectDir]);
+    // Same shape as `jest --json` output
+    const report = testResult && testResult.formatTestResults
+      ? testResult.formatTestResults(results)
+      : results;
+    return { ok: true, results: report, rss: rss() };
+  } catch (err) {
+    return { ok: false, error: String((err && err.stack) || err), rss: rss() };
+  }
+}
+
+let queue = Promise.resolve();
+
+const server = net.createServer((socket) => {
+  let buffer = '';
+  socket.setEncoding('utf8');
+  socket.on('error', () => {});
+  socket.on('data', (chunk) => {
+    buffer += chunk;
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 1);
+      let request;
+      try {
+        request = JSON.parse(line);
+      } catch (err) {
+        socket.write(JSON.stringify({ ok: false, error: 'malformed request' }) + '\n');
+        continue;
+      }
+      if (request.command === 'ping') {
+        socket.write(JSON.stringify({ ok: true, rss: rss() }) + '\n');
+        continue;
+      }
+      queue = queue
+        .then(() => run(request))
+        .then((response) => socket.write(JSON.stringify(response) + '\n'));
+    }
+  });
+});
+
+try {
+  fs.unlinkSync(socketPath);
+} catch (err) {
+  // No stale socket
+}
+server.listen(socketPath);
+process.on('SIGTERM', () => {
+  server.close();
+  process.exit(0);
+});
@@ -8,16 +8,68 @@ from failure logs (stdout/stderr) to guide the GEPA optimizer.
 
 import dspy
 import subprocess
-import re
 import json
-from typing import Tuple, List, Dict, Any
+import time
+from collections import OrderedDict
+from typing import Tuple, List, Dict, Any, Optional
 from pathlib import Path
 
+try:
+    from .suite_cache import SuiteCache, tree_hash
+    from .sandbox_pool import SandboxPool
+    from .dependency_cache import DependencyCache
+    from .static_check import StaticChecker, StaticCheckFailed
+    from .affected_tests import AffectedTestSelector
+    from .shard_runner import ShardedTestRunner
+    from .runner_daemon import RunnerDaemonError, RunnerDaemonPool
+    from .runner_report import RunnerReport, parse_runner_report
+    from .log_scanner import LogScanner
+    from .feedback_summarizer import FeedbackSummarizer, error_signature
+    from .metric_memo import MetricMemo
+    from .resource_governor import ResourceGovernor
+except ImportError:
+    from suite_cache import SuiteCache, tree_hash
+    from sandbox_pool import SandboxPool
+    from dependency_cache import DependencyCache
+    from static_check import StaticChecker, StaticCheckFailed
+    from affected_tests import AffectedTestSelector
+    from shard_runner import ShardedTestRunner
+    from runner_daemon import RunnerDaemonError, RunnerDaemonPool
+    from runner_report import RunnerReport, parse_runner_report
+    from log_scanner import LogScanner
+    from feedback_summarizer import FeedbackSummarizer, error_signature
+    from metric_memo import MetricMemo
+    from resource_governor import ResourceGovernor
+
+# Distinct errors rendered per category, after grouping duplicates
+FEEDBACK_LIMITS = {
+    'undefined_variable': 10,
+    'type_error': 3,
+    'import_fail': 10,
+    'assertion_error': 2,
+    'syntax_error': 2,
+}
+
+# Matches collected per rendered category to group and count; see LogScanner
+SCAN_LIMIT = 200
+
+# Log tail searched for repeated lines when no error pattern matched
+GENERIC_TAIL_CHARS = 20000
+
+# Part of every metric memo key; bump when scores or feedback change for the
+# same inputs, so entries persisted by older code are not reused
+METRIC_VERSION = "2"
+
+# Rollouts whose resource usage is kept; totals are in ResourceGovernor.stats()
+MAX_RESOURCE_USAGE = 256
+
 class ScoreWithFeedback:
     """Helper class to return score and feedback."""
-    def __init__(self, score: float, feedback: str):
+    def __init__(self, score: float, feedback: str, failures: Optional[Dict[str, str]] = None):
         self.score = float(score)
         self.feedback = feedback
+        # Failing test name -> failure message, when the runner reported per-test results
+        self.failures = failures or {}
 
     def __float__(self):
         return self.score
@@ -54,23 +106,75 @@ class BMadImplementationMetric:
     def __init__(
         self,
         repo_root: Path,
-        sandbox_mode: bool = True,
-        failure_weight: float = 1.0
+        sandbox_mode: bool = False,
+        failure_weight: float = 1.0,
+        test_cache: Optional[SuiteCache] = None,
+        sandbox_pool: Optional[SandboxPool] = None,
+        dependency_cache: Optional[DependencyCache] = None,
+        static_checker: Optional[StaticChecker] = None,
+        test_selector: Optional[AffectedTestSelector] = None,
+        test_runner: Optional[ShardedTestRunner] = None,
+        test_daemons: Optional[RunnerDaemonPool] = None,
+        scoring: str = "binary",
+        feedback_max_chars: int = 2000,
+        memo: Optional[MetricMemo] = None,
+        resource_governor: Optional[ResourceGovernor] = None
     ):
         """
         Initialize metric function.
         
         Args:
             repo_root: Project root directory
-            sandbox_mode: If True, execute tests in isolated worktree
-            failure_weight: Penalty multiplier for failed tests
+            sandbox_mode: If True, score by applying code_patch to HEAD in an
+                isolated worktree and running the tests there (patch
+                pre-check, pool, dependencies, static checks and resource
+                usage all apply); otherwise score prediction.test_results
+            failure_weight: Penalty multiplier for failed tests (ratio scoring)
+            test_cache: Optional cache of sandbox results per (HEAD tree, patch)
+            sandbox_pool: Optional pool of reusable worktrees (default: one
+                temporary worktree per evaluation)
+            dependency_cache: Optional shared node_modules linked into sandboxes
+            static_checker: Optional syntax/type checks run before npm test
+            test_selector: Optional selection of the tests a patch can affect
+            test_runner: Optional sharded execution within a shared CPU budget
+            test_daemons: Optional warm test runner per sandbox (falls back to
+                test_runner / npm test when the daemon cannot run)
+            scoring: "binary" is 1.0/0.0; "ratio" scores a failing run by its
+                share of passing tests from the runner's JSON report
+            feedback_max_chars: Hard budget per feedback string (duplicates
+                are grouped first)
+            memo: Optional cache of results per (story, patch, test results)
+            resource_governor: Optional CPU/RSS/I/O accounting and ceilings
+                for npm test subprocesses (see resource_usage)
         """
         self.repo_root = repo_root
         self.sandbox_mode = sandbox_mode
         self.failure_weight = failure_weight
+        self.test_cache = test_cache
+        self.sandbox_pool = sandbox_pool
+        self.dependency_cache = dependency_cache
+        self.static_checker = static_checker
+        self.test_selector = test_selector
+        self.test_runner = test_runner
+        self.test_daemons = test_daemons
+        self.scoring = scoring
+        self.rejected_patches = 0
+        # Totals only: the metric is shared by every candidate of a run
+        self.static_rejections: Dict[str, float] = {
+            'rejections': 0, 'check_seconds': 0.0, 'saved_seconds': 0.0
+        }
+        self._test_runs = 0
+        self._test_seconds = 0.0
         
-        # Compile regex patterns for error extraction
-        self._compile_error_patterns()
+        # Single-pass error extraction; rendered categories are collected up
+        # to SCAN_LIMIT for grouping (others only need to be detected)
+        self.log_scanner = LogScanner({c: SCAN_LIMIT for c in FEEDBACK_LIMITS})
+        self.summarizer = FeedbackSummarizer(max_chars=feedback_max_chars)
+        self.memo = memo
+        self.resource_governor = resource_governor
+        # rollout_id -> checkout time and test subprocess usage, most recent
+        # MAX_RESOURCE_USAGE rollouts only (the metric lives for the whole run)
+        self.resource_usage: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
     
     def __call__(
         self,
@@ -87,98 +191,119 @@ class BMadImplementationMetric:
             trace: Full execution trace (optional)
         
         Returns:
-            ScoreWithFeedback: Binary score + rich textual feedback
+            ScoreWithFeedback: Score (pass ratio or binary) + rich textual
+                feedback + per-test failure map
         """
-        # Parse test results from prediction
-        try:
-            test_data = json.loads(prediction.test_results)
-        except json.JSONDecodeError:
-            return ScoreWithFeedback(
-                score=0.0,
-                feedback="ERROR: Cannot parse test results JSON"
-            )
+        if self.memo is None:
+            return self._evaluate(prediction)
+        # Results depend on the metric code and scoring settings as well as the inputs
+        namespace = f"v{METRIC_VERSION}:{self.scoring}:{self.failure_weight}:{self.summarizer.max_chars}"
+        if self.sandbox_mode:
+            # Sandbox results depend on the base tree, not on prediction.test_results
+            namespace += f":sandbox:{tree_hash(self.repo_root)}"
+        key = self.memo.make_key(example, prediction, namespace)
+        cached = self.memo.get(key)
+        if cached is not None:
+            score, feedback, failures = cached
+            return ScoreWithFeedback(score=score, feedback=feedback, failures=dict(failures))
+        result = self._evaluate(prediction)
+        self.memo.put(key, (result.score, result.feedback, dict(result.failures)))
+        return result
+    
+    def evaluate_full_suite(self, prediction: dspy.Prediction) -> ScoreWithFeedback:
+        """
+        Score `prediction.code_patch` on the whole test suite in a sandbox,
+        whatever sandbox_mode is, bypassing the memo and test selection
+        (e.g. to confirm the optimized candidate after subset scoring).
+        """
+        return self._evaluate(prediction, sandbox=True, full_suite=True)
+    
+    def _evaluate(
+        self,
+        prediction: dspy.Prediction,
+        sandbox: Optional[bool] = None,
+        full_suite: bool = False
+    ) -> ScoreWithFeedback:
+        if self.sandbox_mode if sandbox is None else sandbox:
+            test_data = self._sandbox_results(prediction, full_suite)
+            if 'feedback' in test_data:
+                # Rejected before any test ran; the feedback is already structured
+                return ScoreWithFeedback(score=0.0, feedback=self.summarizer.fit(test_data['feedback']))
+        else:
+            # Parse test results from prediction
+            try:
+                test_data = json.loads(prediction.test_results)
+            except json.JSONDecodeError:
+                return ScoreWithFeedback(
+                    score=0.0,
+                    feedback="ERROR: Cannot parse test results JSON"
+                )
         
-        # Calculate binary score
-        score = 1.0 if test_data.get('success', False) else 0.0
+        success = test_data.get('success', False)
+        report = parse_runner_report(test_data.get('stdout', ''))
+        score = self._score(success, report)
         
         # Extract rich feedback if failed
-        if score == 0.0:
+        if not success:
             feedback = self._extract_rich_feedback(
                 test_data.get('stderr', ''),
                 test_data.get('stdout', ''),
                 prediction.code_patch
             )
+            if report is not None and report.failed:
+                feedback = self._summarize_report(report) + "\n\n" + feedback
         else:
             feedback = "All tests passed successfully"
         
         return ScoreWithFeedback(
             score=score,
-            feedback=feedback
+            feedback=self.summarizer.fit(feedback),
+            failures=report.failures() if report is not None else None
         )
     
-    def _compile_error_patterns(self) -> None:
+    def _sandbox_results(self, prediction: dspy.Prediction, full_suite: bool = False) -> Dict[str, Any]:
         """
-        Compile regex patterns for common JavaScript/TypeScript errors.
+        Test results of `prediction.code_patch` applied to HEAD, in the shape
+        _run_tests returns, or {'feedback': ...} when rejected before testing.
+        """
+        import uuid
         
-        Patterns are prioritized by severity and actionability.
+        trace = getattr(prediction, 'execution_trace', None) or {}
+        # Unique per evaluation: the same rollout may be scored more than once at a time
+        rollout_id = f"{trace.get('rollout_id', 'eval')}_{uuid.uuid4().hex[:8]}"
+        success, log = self.execute_in_sandbox(getattr(prediction, 'code_patch', '') or '', rollout_id, full_suite)
+        if not success and log.startswith(("[PATCH]", "[STATIC]")):
+            return {'success': False, 'feedback': log}
+        # The sandbox command prints no JSON report, so ratio scoring falls back to 0/1 here
+        return {'success': success, 'stderr': log, 'stdout': ''}
+    
+    def _score(self, success: bool, report: Optional[RunnerReport]) -> float:
         """
-        self.error_patterns = {
-            # Critical runtime errors
-            'undefined_variable': re.compile(
-                r'ReferenceError: (\w+) is not defined',
-                re.MULTILINE
-            ),
-            'type_error': re.compile(
-                r'TypeError: (.+?)(?:\n|$)',
-                re.MULTILINE
-            ),
-            'syntax_error': re.compile(
-                r'SyntaxError: (.+?)(?:\n|$)',
-                re.MULTILINE
-            ),
-            
-            # Test assertion failures
-            'assertion_error': re.compile(
-                r'AssertionError: (.+?)(?:\n|$)',
-                re.MULTILINE
-            ),
-            'expect_failure': re.compile(
-                r'Expected (.+?) to (.+?) but got (.+?)(?:\n|$)',
-                re.MULTILINE
-            ),
-            
-            # Module/import errors
-            'import_fail': re.compile(
-                r"Cannot find module ['\"](.+?)['\"]",
-                re.MULTILINE
-            ),
-            'resolve_error': re.compile(
-                r"Module not found: Error: Can't resolve ['\"](.+?)['\"]",
-                re.MULTILINE
-            ),
-            
-            # Async/Promise errors
-            'unhandled_promise': re.compile(
-                r'UnhandledPromiseRejectionWarning: (.+?)(?:\n|$)',
-                re.MULTILINE
-            ),
-            'timeout_error': re.compile(
-                r'Timeout of (\d+)ms exceeded',
-                re.MULTILINE
-            ),
-            
-            # ESLint/Linter errors
-            'eslint_error': re.compile(
-                r'(\d+:\d+)\s+error\s+(.+?)\s+(\w+)$',
-                re.MULTILINE
-            ),
-            
-            # Build/compilation errors
-            'webpack_error': re.compile(
-                r'Module build failed.*?Error: (.+?)(?:\n|$)',
-                re.DOTALL
-            )
-        }
+        1.0 for a passing run. A failing run scores its pass ratio when the
+        runner reported failing tests, else 0.0 (binary mode, no report, or
+        a failure the tests do not explain such as a coverage threshold).
+        """
+        if success:
+            return 1.0
+        if self.scoring == "binary" or report is None or not report.failed:
+            return 0.0
+        return report.pass_ratio(self.failure_weight) or 0.0
+    
+    def _summarize_report(self, report: RunnerReport, limit: int = 5) -> str:
+        total = report.passed + report.failed
+        lines = [f"[TESTS] {report.passed}/{total} passed ({report.runner}); failing:"]
+        # Tests failing on the same (normalized) first message line are one entry
+        failures = [
+            (name, message.strip().splitlines()[0] if message.strip() else "")
+            for name, message in report.failures().items()
+        ]
+        groups = self.summarizer.group(failures, key=lambda f: error_signature(f[1]) or f[0])
+        for (name, first_line), count in groups[:limit]:
+            others = f" (+{count - 1} more tests)" if count > 1 else ""
+            lines.append(f"  - {name}{others}" + (f": {first_line}" if first_line else ""))
+        if len(groups) > limit:
+            lines.append(f"  ... and {len(groups) - limit} more distinct failures")
+        return "\n".join(lines)
     
     def _extract_rich_feedback(
         self,
@@ -205,12 +330,8 @@ class BMadImplementationMetric:
         """
         combined_log = stderr + "\n" + stdout
         
-        # Extract all matching errors by category
-        errors_by_category = {}
-        for category, pattern in self.error_patterns.items():
-            matches = pattern.findall(combined_log)
-            if matches:
-                errors_by_category[category] = matches
+        # Extract matching errors by category
+        errors_by_category = self.log_scanner.scan(combined_log)
         
         # No errors found in logs
         if not errors_by_category:
@@ -221,7 +342,9 @@ class BMadImplementationMetric:
         
         # Priority 1: Runtime errors
         if 'undefined_variable' in errors_by_category:
-            vars_undefined = errors_by_category['undefined_variable']
+            vars_undefined = self.summarizer.summarize(
+                errors_by_category['undefined_variable'], FEEDBACK_LIMITS['undefined_variable']
+            )
             feedback_parts.append(
                 f"\n[CRITICAL] Undefined variables: {', '.join(vars_undefined)}"
             )
@@ -231,7 +354,9 @@ class BMadImplementationMetric:
             )
         
         if 'type_error' in errors_by_category:
-            type_errors = errors_by_category['type_error'][:3]  # Limit to 3
+            type_errors = self.summarizer.summarize(
+                errors_by_category['type_error'], FEEDBACK_LIMITS['type_error']
+            )
             feedback_parts.append(
                 f"\n[CRITICAL] Type errors:\n  - " + "\n  - ".join(type_errors)
             )
@@ -242,7 +367,9 @@ class BMadImplementationMetric:
         
         # Priority 2: Import errors
         if 'import_fail' in errors_by_category:
-            missing_modules = errors_by_category['import_fail']
+            missing_modules = self.summarizer.summarize(
+                errors_by_category['import_fail'], FEEDBACK_LIMITS['import_fail']
+            )
             feedback_parts.append(
                 f"\n[ERROR] Missing modules: {', '.join(missing_modules)}"
             )
@@ -253,7 +380,9 @@ class BMadImplementationMetric:
         
         # Priority 3: Assertion failures
         if 'assertion_error' in errors_by_category:
-            assertions = errors_by_category['assertion_error'][:2]
+            assertions = self.summarizer.summarize(
+                errors_by_category['assertion_error'], FEEDBACK_LIMITS['assertion_error']
+            )
             feedback_parts.append(
                 f"\n[FAILURE] Test assertions:\n  - " + "\n  - ".join(assertions)
             )
@@ -264,7 +393,9 @@ class BMadImplementationMetric:
         
         # Priority 4: Syntax/linting
         if 'syntax_error' in errors_by_category:
-            syntax_errors = errors_by_category['syntax_error'][:2]
+            syntax_errors = self.summarizer.summarize(
+                errors_by_category['syntax_error'], FEEDBACK_LIMITS['syntax_error']
+            )
             feedback_parts.append(
                 f"\n[SYNTAX] Parse errors:\n  - " + "\n  - ".join(syntax_errors)
             )
@@ -279,62 +410,153 @@ class BMadImplementationMetric:
         """
         Fallback feedback when no specific patterns match.
         
-        Returns last 500 characters of error logs.
+        Returns last 500 characters of error logs, with repeated lines
+        (same normalized signature) collapsed into one with a count.
         """
-        combined = stderr + stdout
+        combined = self.summarizer.condense_log((stderr + stdout)[-GENERIC_TAIL_CHARS:])
         if len(combined) > 500:
             return f"Test failed. Last 500 chars of log:\n{combined[-500:]}"
         return f"Test failed. Full log:\n{combined}"
     
-    def execute_in_sandbox(self, code_patch: str, rollout_id: str) -> Tuple[bool, str]:
+    def execute_in_sandbox(self, code_patch: str, rollout_id: str, full_suite: bool = False) -> Tuple[bool, str]:
         """
         Execute code changes in isolated Git worktree.
         
+        Uses a leased sandbox when a SandboxPool is configured, so several
+        evaluations can run in parallel without re-checking out the repo.
+        
         Args:
             code_patch: Git diff to apply
             rollout_id: Unique identifier for sandbox
+            full_suite: Run every test even when a test selector is configured
         
         Returns:
             (success: bool, log: str)
         """
+        # Doomed patches cost a git call, not a sandbox cycle
+        rejection = self.precheck_patch(code_patch)
+        if rejection is not None:
+            return (False, rejection)
+        
+        command = ['npm', 'test', '--', '--silent']
+        cache_key = None
+        if self.test_cache is not None:
+            tree = tree_hash(self.repo_root)
+            if tree is not None:
+                # Selected tests depend only on (tree, patch); the mode keeps
+                # subset results apart from full-suite ones
+                key_command = command
+                if self.test_selector is not None and self.test_selector.enabled and not full_suite:
+                    key_command = command + [f"<affected:{self.test_selector.mode}>"]
+                cache_key = self.test_cache.make_key(tree, code_patch, key_command)
+                cached = self.test_cache.get(cache_key)
+                if cached is not None:
+                    cached = json.loads(cached)
+                    return (cached['success'], cached['log'])
+        
+        usage: Dict[str, Any] = {}
+        self.resource_usage[rollout_id] = usage
+        while len(self.resource_usage) > MAX_RESOURCE_USAGE:
+            self.resource_usage.popitem(last=False)
+        try:
+            if self.sandbox_pool is not None:
+                started = time.monotonic()
+                with self.sandbox_pool.lease() as sandbox_dir:
+                    usage['checkout_seconds'] = round(time.monotonic() - started, 3)
+                    success, log = self._apply_and_test(sandbox_dir, code_patch, command, usage, full_suite)
+            else:
+                success, log = self._run_in_temporary_worktree(code_patch, rollout_id, command, usage, full_suite)
+        except StaticCheckFailed as failed:
+            self._record_static_rejection(failed.seconds)
+            return (False, failed.feedback)
+        except subprocess.TimeoutExpired as e:
+            if getattr(e, 'usage', None) is not None:
+                usage['test'] = e.usage
+            return (False, f"Sandbox execution failed: {e}")
+        except Exception as e:
+            return (False, f"Sandbox execution failed: {e}")
+        
+        if cache_key is not None:
+            self.test_cache.put(cache_key, json.dumps({'success': success, 'log': log}))
+        return (success, log)
+    
+    def precheck_patch(self, code_patch: str) -> Optional[str]:
+        """
+        Check that `code_patch` applies to HEAD, without creating a worktree.
+        
+        Applies with --check against a throwaway index read from HEAD, so
+        neither the working tree nor the real index is touched.
+        
+        Returns:
+            Feedback explaining why the patch was rejected, or None if it
+            applies (or cannot be checked, e.g. before the first commit)
+        """
+        if not code_patch or not code_patch.strip():
+            return (
+                "[PATCH] Empty patch: no code changes were produced.\n"
+                "→ GEMINI.md should enforce: 'Always finish with the complete "
+                "unified diff of every file changed.'"
+            )
+        
+        import os
+        import tempfile
+        
+        try:
+            with tempfile.TemporaryDirectory(prefix="ouroboros_index_") as index_dir:
+                env = {**os.environ, 'GIT_INDEX_FILE': str(Path(index_dir) / "index")}
+                subprocess.run(
+                    ['git', 'read-tree', 'HEAD'],
+                    check=True,
+                    cwd=self.repo_root,
+                    env=env,
+                    capture_output=True
+                )
+                result = subprocess.run(
+                    ['git', 'apply', '--check', '--cached', '-'],
+                    input=code_patch,
+                    cwd=self.repo_root,
+                    env=env,
+                    capture_output=True,
+                    text=True
+                )
+        except (subprocess.CalledProcessError, OSError):
+            return None
+        
+        if result.returncode == 0:
+            return None
+        self.rejected_patches += 1
+        errors = [line for line in result.stderr.splitlines() if line.strip()][:5]
+        return (
+            "[PATCH] Patch does not apply to HEAD:\n  - " + "\n  - ".join(errors or ["unknown error"]) +
+            "\n→ GEMINI.md should enforce: 'Emit a unified diff (diff --git a/... b/...) "
+            "against the current file contents, with exact context lines.'"
+        )
+    
+    def _run_in_temporary_worktree(
+        self,
+        code_patch: str,
+        rollout_id: str,
+        command: List[str],
+        usage: Optional[Dict[str, Any]] = None,
+        full_suite: bool = False
+    ) -> Tuple[bool, str]:
+        """Single-use worktree, removed afterwards (used without a sandbox pool)."""
         import tempfile
-        import uuid
         
         sandbox_dir = Path(tempfile.gettempdir()) / f"ouroboros_{rollout_id}"
         
         try:
             # Create worktree
+            started = time.monotonic()
             subprocess.run(
                 ['git', 'worktree', 'add', str(sandbox_dir), 'HEAD'],
                 check=True,
                 cwd=self.repo_root,
                 capture_output=True
             )
-            
-            # Apply patch
-            patch_file = sandbox_dir / "changes.patch"
-            patch_file.write_text(code_patch, encoding='utf-8')
-            
-            subprocess.run(
-                ['git', 'apply', 'changes.patch'],
-                check=True,
-                cwd=sandbox_dir,
-                capture_output=True
-            )
-            
-            # Run tests in sandbox
-            result = subprocess.run(
-                ['npm', 'test', '--', '--silent'],
-                cwd=sandbox_dir,
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-            
-            return (result.returncode == 0, result.stderr)
-            
-        except Exception as e:
-            return (False, f"Sandbox execution failed: {e}")
+            if usage is not None:
+                usage['checkout_seconds'] = round(time.monotonic() - started, 3)
+            return self._apply_and_test(sandbox_dir, code_patch, command, usage, full_suite)
         
         finally:
             # Cleanup worktree
@@ -343,4 +565,80 @@ class BMadImplementationMetric:
                     ['git', 'worktree', 'remove', str(sandbox_dir), '--force'],
                     cwd=self.repo_root,
                     capture_output=True
-                )
\ No newline at end of file
+                )
+    
+    def _apply_and_test(
+        self,
+        sandbox_dir: Path,
+        code_patch: str,
+        command: List[str],
+        usage: Optional[Dict[str, Any]] = None,
+        full_suite: bool = False
+    ) -> Tuple[bool, str]:
+        # Apply patch
+        patch_file = sandbox_dir / "changes.patch"
+        patch_file.write_text(code_patch, encoding='utf-8')
+        
+        subprocess.run(
+            ['git', 'apply', 'changes.patch'],
+            check=True,
+            cwd=sandbox_dir,
+            capture_output=True
+        )
+        
+        # Worktrees start without dependencies
+        if self.dependency_cache is not None:
+            self.dependency_cache.prepare(sandbox_dir, code_patch)
+        
+        # Cheap syntax/type checks on the touched files first
+        if self.static_checker is not None:
+            started = time.monotonic()
+            feedback = self.static_checker.run(sandbox_dir, code_patch)
+            if feedback is not None:
+                raise StaticCheckFailed(feedback, time.monotonic() - started)
+        
+        # Run tests in sandbox, limited to the affected ones when selecting
+        extra_args = []
+        if self.test_selector is not None and not full_suite:
+            extra_args = self.test_selector.runner_args(sandbox_dir, code_patch)
+        started = time.monotonic()
+        payload = None
+        if self.test_daemons is not None:
+            try:
+                payload = self.test_daemons.run(sandbox_dir, extra_args, timeout=120)
+            except RunnerDaemonError:
+                # e.g. Jest not installed in the sandbox: run npm test instead
+                payload = None
+        if payload is None and self.test_runner is not None:
+            payload = self.test_runner.run(sandbox_dir, command, extra_args, timeout=120)
+        test_usage = None
+        if payload is not None:
+            success, log = payload['success'], payload['stderr']
+        elif self.resource_governor is not None:
+            result = self.resource_governor.run(command + extra_args, cwd=sandbox_dir, timeout=120)
+            success, log, test_usage = result.returncode == 0, result.stderr, result.usage
+        else:
+            result = subprocess.run(
+                command + extra_args,
+                cwd=sandbox_dir,
+                capture_output=True,
+                text=True,
+                timeout=120
+            )
+            success, log = result.returncode == 0, result.stderr
+        elapsed = time.monotonic() - started
+        self._test_runs += 1
+        self._test_seconds += elapsed
+        if usage is not None:
+            # Daemon and sharded runs are not separate subprocesses of ours: wall time only
+            usage['test'] = test_usage or {'wall_seconds': round(elapsed, 3)}
+        return (success, log)
+    
+    def _record_static_rejection(self, check_seconds: float) -> None:
+        # Savings are estimated from the mean duration of test runs so far
+        saved = 0.0
+        if self._test_runs:
+            saved = max(0.0, self._test_seconds / self._test_runs - check_seconds)
+        self.static_rejections['rejections'] += 1
+        self.static_rejections['check_seconds'] += check_seconds
+        self.static_rejections['saved_seconds'] += saved
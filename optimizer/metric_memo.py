@@ -0,0 +1,167 @@
+"""
+MetricMemo: Memoized Metric Results per (Story, Patch, Test Results)
+
+DSPy optimizers score the same (example, prediction) pair more than once:
+bootstrapping re-checks demos, and candidate validation re-evaluates
+predictions already scored on a minibatch. Every call used to re-parse the
+test results JSON and redo feedback extraction.
+
+MetricMemo keeps the metric's output (score, feedback, failure map) in an
+in-memory LRU, keyed by:
+
+  - the story (story_path / source_file, else a hash of story_context),
+  - SHA-256 of code_patch and of test_results,
+  - a namespace from the metric's version and scoring settings, so results
+    computed by older metric code or under other settings are never returned.
+
+With `db_path` set, entries are also written to SQLite (WAL) and survive
+between runs; a memory miss falls back to disk before recomputing. The
+table is held to `max_entries` rows as well: the least recently accessed
+rows are deleted when the memo opens and once the writes since the last
+prune reach a sixteenth of `max_entries`.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# (score, feedback, failures)
+MemoEntry = Tuple[float, str, Dict[str, str]]
+
+# Writes between table prunes, as a fraction of max_entries
+PRUNE_FRACTION = 16
+
+
+def _digest(text: Any) -> str:
+    return hashlib.sha256(str(text or "").encode('utf-8')).hexdigest()
+
+
+class MetricMemo:
+    """
+    LRU of metric results, optionally persisted.
+
+    Usage:
+        memo = MetricMemo(max_entries=4096, db_path=Path(".dspy_cache/metric_memo.sqlite"))
+        key = memo.make_key(example, prediction, namespace="ratio:1.0:2000")
+        entry = memo.get(key)
+        if entry is None:
+            memo.put(key, (score, feedback, failures))
+    """
+
+    def __init__(self, max_entries: int = 4096, db_path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, MemoEntry]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS memo (
+                    key TEXT PRIMARY KEY,
+                    entry TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS memo_accessed ON memo (accessed_at)")
+            self._prune()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def make_key(example: Any, prediction: Any, namespace: str = "") -> str:
+        story = (
+            getattr(example, 'story_path', None)
+            or getattr(example, 'source_file', None)
+            or _digest(getattr(example, 'story_context', ''))
+        )
+        payload = json.dumps([
+            namespace,
+            str(story),
+            _digest(getattr(prediction, 'code_patch', '')),
+            _digest(getattr(prediction, 'test_results', ''))
+        ])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[MemoEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self._conn is not None:
+                row = self._conn.execute("SELECT entry FROM memo WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE memo SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    score, feedback, failures = json.loads(row[0])
+                    entry = (score, feedback, failures)
+                    self._remember(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(self, key: str, entry: MemoEntry) -> None:
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO memo VALUES (?, ?, ?)",
+                    (key, json.dumps(list(entry), ensure_ascii=False), time.time())
+                )
+                self._writes += 1
+                if self._writes >= max(1, self.max_entries // PRUNE_FRACTION):
+                    self._prune()
+                else:
+                    self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries),
+                'pruned': self.pruned
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _prune(self) -> None:
+        """Delete all but the `max_entries` most recently accessed rows, then commit."""
+        cursor = self._conn.execute(
+            "DELETE FROM memo WHERE key NOT IN "
+            "(SELECT key FROM memo ORDER BY accessed_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self._conn.commit()
+        self.pruned += max(0, cursor.rowcount)
+        self._writes = 0
+
+    def _remember(self, key: str, entry: MemoEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
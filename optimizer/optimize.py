@@ -20,6 +20,20 @@ import dspy
 from gemini_adapter import GeminiSkillAdapter
 from metric import BMadImplementationMetric
 from example_loader import load_examples_from_dir
+from worker_pool import WorkerPool
+from rate_limiter import SharedRateLimiter, estimate_tokens, is_transient_error
+from concurrency_controller import AIMDController
+from output_parser import unwrap_envelope
+from suite_cache import SuiteCache
+from sandbox_pool import SandboxPool
+from dependency_cache import DependencyCache
+from static_check import StaticChecker
+from affected_tests import AffectedTestSelector
+from shard_runner import CpuBudget, ShardedTestRunner
+from runner_daemon import RunnerDaemonPool
+from reflection_clusters import ClusteringProposer
+from metric_memo import MetricMemo
+from resource_governor import ResourceGovernor
 
 
 
@@ -30,10 +44,19 @@ class CLIReflectionLM(dspy.LM):
     Adapter to use the local 'bin/gemini' wrapper as a DSPy LM.
     This allows using the user's authenticated CLI for the 'Teacher' agent.
     """
-    def __init__(self, binary_path="gemini", model="gemini-cli", timeout=120):
+    def __init__(
+        self,
+        binary_path="gemini",
+        model="gemini-cli",
+        timeout=120,
+        worker_pool: Optional[WorkerPool] = None,
+        rate_limiter: Optional[SharedRateLimiter] = None
+    ):
         super().__init__(model=model)
         self.binary_path = binary_path
         self.timeout = timeout
+        self.worker_pool = worker_pool
+        self.rate_limiter = rate_limiter
 
     def basic_request(self, prompt: str, **kwargs):
         pass # DSPy abstract method
@@ -54,33 +77,50 @@ class CLIReflectionLM(dspy.LM):
             print(f"[DEBUG] Invoking CLI with prompt length: {len(prompt_str)}")
             
             import os
-            cli_args = [self.binary_path, "-p", prompt_str, "--output-format", "json"]
+            base_args = [self.binary_path, "--output-format", "json"]
             
             # Support GEMINI_MODEL env var natively
             model_env = os.environ.get("GEMINI_MODEL")
             if model_env:
-                cli_args.extend(["--model", model_env])
+                base_args.extend(["--model", model_env])
             
-            # Call the wrapper safely
-            process = subprocess.Popen(
-                cli_args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.DEVNULL,
-                text=True
-            )
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimate_tokens(prompt_str))
             
-            try:
-                stdout, stderr = process.communicate(timeout=self.timeout)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                stdout, stderr = process.communicate()
-                print(f"[ERROR] CLI LM Connection Timed Out after {self.timeout}s")
-                raise
+            if self.worker_pool is not None:
+                # Reuse a pre-warmed CLI process (prompt is sent over stdin)
+                try:
+                    process = self.worker_pool.run(base_args, prompt_str, self.timeout)
+                except subprocess.TimeoutExpired:
+                    print(f"[ERROR] CLI LM Connection Timed Out after {self.timeout}s")
+                    raise
+                stdout, stderr = process.stdout, process.stderr
+            else:
+                cli_args = [base_args[0], "-p", prompt_str, *base_args[1:]]
+                
+                # Call the wrapper safely
+                process = subprocess.Popen(
+                    cli_args,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    stdin=subprocess.DEVNULL,
+                    text=True
+                )
+                
+                try:
+                    stdout, stderr = process.communicate(timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    stdout, stderr = process.communicate()
+                    print(f"[ERROR] CLI LM Connection Timed Out after {self.timeout}s")
+                    raise
                 
             # result = process # wrapper for compatible logic below
             print(f"[DEBUG] CLI returned code: {process.returncode}")
             
+            if self.rate_limiter is not None and is_transient_error(stderr, stdout):
+                self.rate_limiter.penalize()
+            
             content = stdout.strip()
             if process.returncode != 0:
                 print(f"[WARNING] CLI LM returned non-zero code {process.returncode}: {stderr}")
@@ -89,20 +129,10 @@ class CLIReflectionLM(dspy.LM):
                     print("[ERROR] No content generated.")
                     content = "{}" 
             
-            # Parse the CLI wrapper's JSON output to get the actual text
-            import json
-            try:
-                data = json.loads(content)
-                # The CLI returns { "response": "...", "stats": ... }
-                # We want just the response text.
-                if isinstance(data, dict) and "response" in data:
-                    content = data["response"]
-                else:
-                     # Fallback if structure is different
-                     pass
-            except json.JSONDecodeError:
-                # If not JSON (maybe raw text?), use as-is
-                pass
+            # The CLI returns { "response": "...", "stats": ... }; we want just
+            # the response text. Non-JSON output (maybe raw text?) is used as-is.
+            response, _ = unwrap_envelope(content)
+            content = response if isinstance(response, str) else json.dumps(response)
 
             # CRITICAL FIX: Return a LIST of strings
             return [content]
@@ -224,6 +254,18 @@ def save_pareto_frontier(frontier: List[dict], output_dir: Path, timestamp: str)
     latest_file.write_text(json.dumps(frontier, indent=2), encoding='utf-8')
 
 
+def latest_patches(trace_store, instruction: str, stories: List[str]) -> dict:
+    """Most recent code_patch per story generated under `instruction`, from the rollout traces."""
+    trace_store.flush()
+    wanted = set(stories)
+    patches = {}
+    # Oldest first, so later rollouts overwrite earlier ones
+    for trace in trace_store.iter_traces():
+        if trace.get('instruction') == instruction and trace.get('story_context') in wanted:
+            patches[trace['story_context']] = trace.get('code_patch', '')
+    return patches
+
+
 def run_optimization(
     repo_root: Path,
     story_paths: List[Path],
@@ -238,7 +280,41 @@ def run_optimization(
     use_semantic: bool,
     use_api: bool,
     top_k: int,
-    verbose: bool
+    verbose: bool,
+    concurrency: int = 1,
+    cache_mode: str = "off",
+    cache_ttl_days: float = 30.0,
+    cache_max_mb: int = 512,
+    warm_workers: int = 0,
+    rpm: float = 0.0,
+    tpm: float = 0.0,
+    adaptive_concurrency: bool = False,
+    latency_target: float = 0.0,
+    max_output_mb: float = 8.0,
+    output_format: str = "json",
+    demo_token_budget: int = 4000,
+    test_cache_mb: int = 0,
+    sandbox_eval: bool = False,
+    sandbox_pool_size: int = 0,
+    shared_node_modules: str = "off",
+    sandbox_root: str = "auto",
+    static_checks: bool = False,
+    test_selection: str = "off",
+    full_suite_final: bool = False,
+    test_shards: int = 0,
+    cpu_budget: int = 0,
+    shard_worker_args: str = "",
+    shard_path_args: str = "--runTestsByPath",
+    test_daemon: bool = False,
+    daemon_max_rss_mb: int = 1536,
+    scoring: str = "binary",
+    feedback_max_chars: int = 2000,
+    cluster_feedback: bool = False,
+    metric_memo_entries: int = 4096,
+    persist_metric_memo: bool = False,
+    test_cpu_seconds: float = 0,
+    test_memory_mb: int = 0,
+    account_test_resources: bool = False
 ) -> None:
     timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
     
@@ -247,6 +323,18 @@ def run_optimization(
     target_file = "adapter.md" # Always save to adapter.md to preserve base SKILL.md
     print(f"[INFO] Baseline SKILL.md loaded for skill '{skill_name}' (Content: {len(baseline_context)} chars)")
 
+    # Pre-warmed CLI processes shared by the reflection LM and the adapter
+    worker_pool = WorkerPool(size=warm_workers) if warm_workers > 0 else None
+    
+    # Quota shared (via the mounted repo volume) with every other optimizer container
+    rate_limiter = None
+    if rpm > 0 or tpm > 0:
+        rate_limiter = SharedRateLimiter(
+            repo_root / ".dspy_cache" / "rate_limit.json",
+            requests_per_minute=rpm or None,
+            tokens_per_minute=tpm or None
+        )
+    
     # Clean implementation of the fallback logic
     lm = None
     if use_api and "GEMINI_API_KEY" in os.environ and os.environ["GEMINI_API_KEY"]:
@@ -268,7 +356,7 @@ def run_optimization(
         if use_api:
              print(f"[WARN] --use-api requested but failed or no key found. Using CLIReflectionLM as fallback.")
         print(f"[INFO] Using CLIReflectionLM via '{gemini_binary}'")
-        lm = CLIReflectionLM(binary_path=gemini_binary)
+        lm = CLIReflectionLM(binary_path=gemini_binary, worker_pool=worker_pool, rate_limiter=rate_limiter)
 
     dspy.settings.configure(lm=lm)
     
@@ -290,10 +378,90 @@ def run_optimization(
             else:
                 print("[WARN] Semantic matching requested but sentence-transformers not installed")
     
+    # Test results keyed by (tree, patch, command), shared by adapter and metric
+    test_cache = None
+    if test_cache_mb > 0:
+        test_cache = SuiteCache(
+            repo_root / ".dspy_cache" / "test_results.sqlite",
+            max_bytes=test_cache_mb * 1024 * 1024
+        )
+    
+    if not sandbox_eval and (sandbox_pool_size > 0 or shared_node_modules != "off" or static_checks):
+        print("[WARN] --sandbox-pool, --shared-node-modules and --static-checks only apply with --sandbox-eval")
+    
+    # Reusable worktrees for sandboxed metric evaluations (stale ones pruned here)
+    # auto: RAM-backed /dev/shm while memory allows, else tmp; disk: tmp only; or a directory
+    sandbox_pool = None
+    if sandbox_eval and sandbox_pool_size > 0:
+        if sandbox_root == "auto":
+            sandbox_pool = SandboxPool(repo_root, size=sandbox_pool_size)
+        else:
+            sandbox_pool = SandboxPool(
+                repo_root,
+                size=sandbox_pool_size,
+                root=None if sandbox_root == "disk" else Path(sandbox_root),
+                ram_root=None
+            )
+    dependency_cache = None
+    if sandbox_eval and shared_node_modules != "off":
+        dependency_cache = DependencyCache(repo_root / ".dspy_cache" / "deps", mode=shared_node_modules)
+    
+    # Run only the tests a patch can reach (full suite whenever that is unclear)
+    test_selector = None
+    if full_suite_final and test_selection == "off":
+        print("[WARN] --full-suite-final has no effect without --test-selection (scores already use the full suite)")
+        full_suite_final = False
+    if test_selection != "off":
+        test_selector = AffectedTestSelector(
+            mode=test_selection,
+            cache_dir=repo_root / ".dspy_cache" / "import_graph"
+        )
+    
+    # Test files sharded across one CPU budget shared by every concurrent evaluation
+    test_runner = None
+    if test_shards > 0:
+        import shlex
+        test_runner = ShardedTestRunner(
+            CpuBudget(cpu_budget or None),
+            max_shards=test_shards,
+            worker_args=shlex.split(shard_worker_args),
+            path_args=shlex.split(shard_path_args)
+        )
+    
+    # Repeated (story, patch, test results) evaluations reuse the metric result
+    metric_memo = None
+    if metric_memo_entries > 0:
+        metric_memo = MetricMemo(
+            max_entries=metric_memo_entries,
+            db_path=repo_root / ".dspy_cache" / "metric_memo.sqlite" if persist_metric_memo else None
+        )
+    
+    # Wall/CPU/RSS/I/O of every npm test run, with optional ceilings (0 = none)
+    resource_governor = None
+    if account_test_resources or test_cpu_seconds or test_memory_mb:
+        resource_governor = ResourceGovernor(
+            cpu_seconds=test_cpu_seconds or None,
+            memory_bytes=test_memory_mb * 1024 * 1024 or None
+        )
+    
+    # Warm Jest process per sandbox instead of a cold `npm test` per evaluation
+    test_daemons = None
+    if test_daemon:
+        test_daemons = RunnerDaemonPool(max_rss_bytes=daemon_max_rss_mb * 1024 * 1024)
+    
     # Establish isolated context directory for this session
     session_dir = repo_root / ".gemini" / "sessions" / skill_name
     session_dir.mkdir(parents=True, exist_ok=True)
     
+    # AIMD window between 1 and --concurrency, driven by 429s/timeouts
+    controller = None
+    if adaptive_concurrency:
+        controller = AIMDController(
+            min_window=1,
+            max_window=concurrency,
+            latency_target=latency_target or None
+        )
+    
     adapter = GeminiSkillAdapter(
         gemini_binary=gemini_binary,
         repo_root=repo_root,
@@ -301,13 +469,44 @@ def run_optimization(
         context_dir=session_dir,
         demos=demos,
         semantic_matcher=semantic_matcher,
-        top_k=top_k
+        top_k=top_k,
+        concurrency=concurrency,
+        cache_mode=cache_mode,
+        cache_ttl_seconds=cache_ttl_days * 24 * 3600,
+        cache_max_bytes=cache_max_mb * 1024 * 1024,
+        worker_pool=worker_pool,
+        rate_limiter=rate_limiter,
+        controller=controller,
+        max_output_bytes=int(max_output_mb * 1024 * 1024),
+        output_format=output_format,
+        demo_token_budget=demo_token_budget,
+        test_cache=test_cache,
+        test_selector=test_selector,
+        test_runner=test_runner,
+        test_daemons=test_daemons,
+        resource_governor=resource_governor
     )
     adapter.predictor.signature.instructions = baseline_context
-    metric = BMadImplementationMetric(repo_root=repo_root, sandbox_mode=True)
+    metric = BMadImplementationMetric(
+        repo_root=repo_root,
+        sandbox_mode=sandbox_eval,
+        test_cache=test_cache,
+        sandbox_pool=sandbox_pool,
+        dependency_cache=dependency_cache,
+        static_checker=StaticChecker.for_project(repo_root) if sandbox_eval and static_checks else None,
+        test_selector=test_selector,
+        test_runner=test_runner,
+        test_daemons=test_daemons,
+        scoring=scoring,
+        feedback_max_chars=feedback_max_chars,
+        memo=metric_memo,
+        resource_governor=resource_governor
+    )
     
     optimizer = None
     optimizer_name = "None"
+    # Shared failures across a minibatch reach the reflection LM once
+    clustering_proposer = None
     
     try:
         # Try BootstrapFewShot if requested and demos available
@@ -323,10 +522,14 @@ def run_optimization(
             # Fall back to GEPA or COPRO
             try:
                 from dspy.teleprompt import GEPA
+                if cluster_feedback:
+                    clustering_proposer = ClusteringProposer()
                 optimizer = GEPA(
                     metric=metric,
                     max_metric_calls=max_rollouts,
                     reflection_lm=lm,
+                    instruction_proposer=clustering_proposer,
+                    num_threads=concurrency,
                     verbose=verbose,
                     log_dir=str(output_dir / "gepa_logs")
                 )
@@ -343,12 +546,12 @@ def run_optimization(
         print(f"[ERROR] Failed to initialize optimizer: {e}")
         raise
     
-    print(f"[INFO] Starting optimization with {optimizer_name} ({max_rollouts} runs)...")
+    print(f"[INFO] Starting optimization with {optimizer_name} ({max_rollouts} runs, concurrency={concurrency})...")
     
     try:
         kwargs = {}
         if optimizer_name == "COPRO":
-            kwargs['eval_kwargs'] = {}
+            kwargs['eval_kwargs'] = {'num_threads': concurrency}
             
         optimized_adapter = optimizer.compile(
             adapter,
@@ -380,12 +583,77 @@ def run_optimization(
         )
         
         save_pareto_frontier([{"timestamp": timestamp, "runs": max_rollouts}], output_dir, timestamp)
+        
+        if resource_governor is not None:
+            print(f"[INFO] Test resources: {resource_governor.stats()}")
+        if metric_memo is not None:
+            print(f"[INFO] Metric memo: {metric_memo.stats()}")
+        if clustering_proposer is not None:
+            print(f"[INFO] Reflection clustering: {clustering_proposer.stats()}")
+        if test_daemons is not None:
+            print(f"[INFO] Test daemons: {test_daemons.stats()}")
+        if test_runner is not None:
+            print(f"[INFO] Sharded tests: {test_runner.stats()}")
+        if test_selector is not None:
+            print(f"[INFO] Affected-test selection: {test_selector.stats()}")
+        if full_suite_final and trainset:
+            # Scores during optimization used test subsets: re-score the patches the
+            # winner actually produced on everything (no new Gemini calls, no memo)
+            winner = optimized_adapter.predictor.signature.instructions
+            patches = latest_patches(adapter.trace_store, winner, [ex.story_context for ex in trainset])
+            scores = [
+                float(metric.evaluate_full_suite(dspy.Prediction(code_patch=patches[ex.story_context])))
+                for ex in trainset if ex.story_context in patches
+            ]
+            if scores:
+                print(f"[INFO] Final candidate on the full test suite: "
+                      f"mean score {sum(scores) / len(scores):.3f} over {len(scores)} stories")
+            else:
+                print("[WARN] No rollouts of the final candidate were recorded; full-suite check skipped")
+        if cache_mode != "off":
+            print(f"[INFO] Response cache: {adapter.response_cache.stats()}")
+        if test_cache is not None:
+            print(f"[INFO] Test result cache: {test_cache.stats()}")
+        if sandbox_pool is not None:
+            print(f"[INFO] Sandbox pool: {sandbox_pool.stats()}")
+        if dependency_cache is not None:
+            print(f"[INFO] Shared node_modules: {dependency_cache.stats()}")
+        if sandbox_eval:
+            print(f"[INFO] Sandbox evaluation: {metric.rejected_patches} patches rejected before checkout")
+        if metric.static_checker is not None:
+            saved = metric.static_rejections['saved_seconds']
+            print(f"[INFO] Static pre-checks: {metric.static_checker.stats()}, "
+                  f"~{saved:.1f}s of test runs avoided")
+        if worker_pool is not None:
+            print(f"[INFO] Worker pool (warm reuse is per candidate context): {worker_pool.stats()}")
+        if rate_limiter is not None:
+            print(f"[INFO] Rate limiter waited {rate_limiter.total_wait_seconds:.1f}s in this process")
+        if controller is not None:
+            concurrency_metrics = controller.metrics()
+            metrics_file = output_dir / f"concurrency_{timestamp}.json"
+            metrics_file.write_text(json.dumps(concurrency_metrics, indent=2), encoding='utf-8')
+            print(f"[INFO] Adaptive concurrency: final window {concurrency_metrics['window']} "
+                  f"({concurrency_metrics['congestion_events']} congestion events), history in {metrics_file}")
         print("[SUCCESS] Optimization cycle complete.")
         
     except Exception as e:
         print(f"[ERROR] Optimization failed: {e}")
         import traceback; traceback.print_exc()
         raise
+    finally:
+        adapter.executor.close()
+        adapter.response_cache.close()
+        adapter.trace_store.close()
+        if test_cache is not None:
+            test_cache.close()
+        if test_daemons is not None:
+            test_daemons.close()
+        if metric_memo is not None:
+            metric_memo.close()
+        if sandbox_pool is not None:
+            sandbox_pool.close()
+        if worker_pool is not None:
+            worker_pool.close()
 
 
 def main():
@@ -404,9 +672,77 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Preview configuration and loaded examples without running optimization")
     parser.add_argument("--semantic", action="store_true", help="Use semantic matching to select examples (requires --examples-dir)")
     parser.add_argument("--top-k", type=int, default=3, help="Number of examples to match when using --semantic")
+    parser.add_argument("--demo-token-budget", type=int, default=4000,
+                        help="Approximate prompt tokens available for demonstrations (long solutions are elided)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Maximum number of Gemini rollouts evaluated in parallel")
+    parser.add_argument("--cache-mode", choices=["off", "read", "readwrite", "replay"], default="off",
+                        help="Gemini response cache in .dspy_cache (replay fails on misses instead of calling the CLI)")
+    parser.add_argument("--cache-ttl-days", type=float, default=30.0, help="Expire cached responses after this many days")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="Evict least-recently-used responses beyond this size")
+    parser.add_argument("--test-cache-mb", type=int, default=0,
+                        help="Reuse test results for an identical tree and patch, evicting beyond this size (0 = disabled)")
+    parser.add_argument("--sandbox-eval", action="store_true",
+                        help="Score each patch by applying it to HEAD in an isolated worktree and testing there "
+                             "(instead of the tests the rollout ran in the repository)")
+    parser.add_argument("--sandbox-pool", type=int, default=0,
+                        help="Reuse this many git worktrees for sandboxed test runs (0 = fresh worktree per evaluation)")
+    parser.add_argument("--sandbox-root", type=str, default="auto",
+                        help="Where pooled sandboxes live: auto (RAM-backed /dev/shm when memory allows), disk, or a directory")
+    parser.add_argument("--shared-node-modules", choices=["off", "symlink", "hardlink"], default="off",
+                        help="Install dependencies once per lockfile and link them into sandboxes")
+    parser.add_argument("--static-checks", action="store_true",
+                        help="Reject patches failing syntax/type pre-checks (configured in .static_checks.json) before npm test")
+    parser.add_argument("--test-selection", choices=["off", "graph", "jest"], default="off",
+                        help="Run only tests affected by the patch: via a cached import graph, or Jest --findRelatedTests")
+    parser.add_argument("--full-suite-final", action="store_true",
+                        help="With --test-selection, re-score the optimized candidate's patches on the full test suite in a sandbox")
+    parser.add_argument("--test-shards", type=int, default=0,
+                        help="Split each evaluation's test files into up to this many parallel shards (0 = one npm test run)")
+    parser.add_argument("--cpu-budget", type=int, default=0,
+                        help="Cores shared by the shards of all concurrent evaluations (0 = all cores)")
+    parser.add_argument("--shard-worker-args", type=str, default="",
+                        help="Runner arguments that keep one shard on one core, e.g. '--maxWorkers=1' for Jest")
+    parser.add_argument("--shard-path-args", type=str, default="--runTestsByPath",
+                        help="Runner arguments placed before each shard's files so they match as exact paths (Jest default; '' for runners that take plain paths)")
+    parser.add_argument("--scoring", choices=["ratio", "binary"], default="binary",
+                        help="Score failing runs 0/1 only, or by their share of passing tests (Jest/Vitest/Mocha JSON)")
+    parser.add_argument("--feedback-max-chars", type=int, default=2000,
+                        help="Hard budget per metric feedback string sent to reflection (repeated errors are grouped first)")
+    parser.add_argument("--metric-memo-entries", type=int, default=4096,
+                        help="Memoize metric results per (story, patch, test results) in an LRU of this size, also the row limit of the persisted table (0 = off)")
+    parser.add_argument("--persist-metric-memo", action="store_true",
+                        help="Also keep memoized metric results in .dspy_cache/metric_memo.sqlite across runs")
+    parser.add_argument("--cluster-feedback", action="store_true",
+                        help="With GEPA, merge near-identical failure feedback across a minibatch into one reflection record")
+    parser.add_argument("--test-daemon", action="store_true",
+                        help="Keep a warm Jest runner per sandbox, restarted on crash or memory growth (falls back to npm test)")
+    parser.add_argument("--daemon-max-rss-mb", type=int, default=1536,
+                        help="Restart a test daemon once its memory exceeds this size")
+    parser.add_argument("--test-cpu-seconds", type=float, default=0,
+                        help="Kill a test run once its processes used this much CPU time (0 = no limit)")
+    parser.add_argument("--test-memory-mb", type=int, default=0,
+                        help="Kill a test run once its processes' combined RSS exceeds this size (0 = no limit)")
+    parser.add_argument("--account-test-resources", action="store_true",
+                        help="Record wall time, CPU, peak RSS and bytes written of every test run (implied by the limits above)")
+    parser.add_argument("--warm-workers", type=int, default=0,
+                        help="Keep this many Gemini CLI processes pre-warmed (0 = spawn per call)")
+    parser.add_argument("--rpm", type=float, default=0.0,
+                        help="Shared requests-per-minute quota across all optimizer processes (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0.0,
+                        help="Shared tokens-per-minute quota (estimated from prompt size; 0 = unlimited)")
+    parser.add_argument("--adaptive-concurrency", action="store_true",
+                        help="Tune in-flight rollouts with AIMD (1..--concurrency) based on 429s and timeouts")
+    parser.add_argument("--latency-target", type=float, default=0.0,
+                        help="With --adaptive-concurrency, stop growing the window while Gemini calls take longer than this many seconds (0 = off)")
+    parser.add_argument("--max-output-mb", type=float, default=8.0,
+                        help="Kill a Gemini rollout whose stdout exceeds this size")
+    parser.add_argument("--output-format", choices=["json", "stream-json"], default="json",
+                        help="Gemini CLI output format for rollouts (stream-json allows stopping as soon as the patch is complete)")
     parser.add_argument("--verbose", action="store_true")
     
     args = parser.parse_args()
+    if args.full_suite_final and args.test_selection == "off":
+        parser.error("--full-suite-final requires --test-selection")
     
     if args.repo_root:
         repo_root = args.repo_root.resolve()
@@ -429,8 +765,36 @@ def main():
         print(f"[REPO ROOT] {repo_root}")
         print(f"[OPTIMIZER] {'BootstrapFewShot' if args.bootstrap else 'COPRO/GEPA'}")
         print(f"[MAX ROLLOUTS] {args.max_rollouts}")
+        print(f"[CONCURRENCY] {'AIMD 1..' if args.adaptive_concurrency else ''}{args.concurrency}"
+              f"{f' (latency target {args.latency_target}s)' if args.adaptive_concurrency and args.latency_target else ''}")
+        print(f"[RESPONSE CACHE] {args.cache_mode}")
+        print(f"[TEST CACHE] {str(args.test_cache_mb) + ' MB' if args.test_cache_mb > 0 else 'Disabled'}")
+        print(f"[SANDBOX EVAL] {'Enabled' if args.sandbox_eval else 'Disabled'}")
+        print(f"[SANDBOX POOL] {f'{args.sandbox_pool} (root: {args.sandbox_root})' if args.sandbox_pool > 0 else 'Disabled'}")
+        print(f"[SHARED NODE_MODULES] {args.shared_node_modules}")
+        print(f"[STATIC CHECKS] {'Enabled' if args.static_checks else 'Disabled'}")
+        print(f"[TEST SELECTION] {args.test_selection}{' (full suite for final candidate)' if args.full_suite_final else ''}")
+        if args.test_shards > 0:
+            print(f"[TEST SHARDS] up to {args.test_shards} (cpu budget: {args.cpu_budget or 'all cores'})")
+        else:
+            print("[TEST SHARDS] Disabled")
+        print(f"[SCORING] {args.scoring} (feedback budget {args.feedback_max_chars} chars)")
+        if args.metric_memo_entries > 0:
+            print(f"[METRIC MEMO] {args.metric_memo_entries} entries{' (persisted)' if args.persist_metric_memo else ''}")
+        else:
+            print("[METRIC MEMO] Disabled")
+        print(f"[FEEDBACK CLUSTERING] {'Enabled' if args.cluster_feedback else 'Disabled'}")
+        print(f"[TEST DAEMON] {'Enabled (restart above ' + str(args.daemon_max_rss_mb) + ' MB)' if args.test_daemon else 'Disabled'}")
+        cpu_limit = f"{args.test_cpu_seconds}s CPU" if args.test_cpu_seconds else "no CPU limit"
+        memory_limit = f"{args.test_memory_mb} MB RSS" if args.test_memory_mb else "no memory limit"
+        accounting = args.account_test_resources or args.test_cpu_seconds or args.test_memory_mb
+        print(f"[TEST LIMITS] {cpu_limit}, {memory_limit}{'' if accounting else ' (accounting off)'}")
+        print(f"[WARM WORKERS] {args.warm_workers}")
+        print(f"[OUTPUT FORMAT] {args.output_format} (max {args.max_output_mb} MB)")
+        print(f"[RATE LIMIT] {'rpm=' + str(args.rpm) + ' tpm=' + str(args.tpm) if args.rpm > 0 or args.tpm > 0 else 'Disabled'}")
         print(f"[LM BACKEND] {'Real Gemini API' if args.use_api else 'Local CLI Wrapper'}")
         print(f"[SEMANTIC MATCHING] {'Enabled (top-' + str(args.top_k) + ')' if args.semantic else 'Disabled'}")
+        print(f"[DEMO TOKEN BUDGET] {args.demo_token_budget}")
         
         print(f"\n[STORIES] {len(story_paths)} files:")
         for sp in story_paths:
@@ -479,7 +843,41 @@ def main():
         use_semantic=args.semantic,
         use_api=args.use_api,
         top_k=args.top_k,
-        verbose=args.verbose
+        verbose=args.verbose,
+        concurrency=args.concurrency,
+        cache_mode=args.cache_mode,
+        cache_ttl_days=args.cache_ttl_days,
+        cache_max_mb=args.cache_max_mb,
+        warm_workers=args.warm_workers,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        adaptive_concurrency=args.adaptive_concurrency,
+        latency_target=args.latency_target,
+        max_output_mb=args.max_output_mb,
+        output_format=args.output_format,
+        demo_token_budget=args.demo_token_budget,
+        test_cache_mb=args.test_cache_mb,
+        sandbox_eval=args.sandbox_eval,
+        sandbox_pool_size=args.sandbox_pool,
+        shared_node_modules=args.shared_node_modules,
+        sandbox_root=args.sandbox_root,
+        static_checks=args.static_checks,
+        test_selection=args.test_selection,
+        full_suite_final=args.full_suite_final,
+        test_shards=args.test_shards,
+        cpu_budget=args.cpu_budget,
+        shard_worker_args=args.shard_worker_args,
+        shard_path_args=args.shard_path_args,
+        test_daemon=args.test_daemon,
+        daemon_max_rss_mb=args.daemon_max_rss_mb,
+        scoring=args.scoring,
+        feedback_max_chars=args.feedback_max_chars,
+        cluster_feedback=args.cluster_feedback,
+        metric_memo_entries=args.metric_memo_entries,
+        persist_metric_memo=args.persist_metric_memo,
+        test_cpu_seconds=args.test_cpu_seconds,
+        test_memory_mb=args.test_memory_mb,
+        account_test_resources=args.account_test_resources
     )
 
 if __name__ == "__main__":
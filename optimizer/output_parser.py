@@ -0,0 +1,216 @@
+"""
+Output Parser: Single-Pass Structured Decoding of Gemini CLI Responses
+
+Decodes a CLI response once into a ParsedResponse instead of re-parsing
+stdout for every field. Handles:
+  - the CLI envelope {"response": "...", "stats": {...}} (json output),
+  - JSON objects anywhere in the text, including inside ```json fences
+    or surrounded by prose, found with json.JSONDecoder.raw_decode,
+  - plain unified diffs (```diff fences or bare `diff --git` text) when
+    the model did not return JSON at all.
+
+Run `python output_parser.py --benchmark-mb 8` for a timing on large outputs.
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+
+_DECODER = json.JSONDecoder()
+# A JSON object can only start with '{' followed by a key or '}'. Filtering on
+# this skips code braces (`{ return x; }`, `{a: 1}`) and escaped JSON inside
+# strings (`{\"key\"`) without attempting - and failing - a decode. Failed
+# decodes are expensive: building a JSONDecodeError counts every newline from
+# the start of the document, which made brace-heavy text quadratic.
+_OBJECT_START = re.compile(r'\{\s*["}]')
+_DIFF_FENCE = re.compile(r'```(?:diff|patch)\s*\n(.*?)```', re.DOTALL)
+_DIFF_LINE_PREFIXES = (
+    'diff --git ', 'index ', '--- ', '+++ ', '@@', '+', '-', ' ', '\\',
+    'new file mode', 'deleted file mode', 'old mode', 'new mode',
+    'similarity index', 'rename from', 'rename to', 'Binary files'
+)
+
+
+class ParsedResponse:
+    """Typed view of one CLI response."""
+
+    def __init__(
+        self,
+        raw: str,
+        text: str,
+        data: Optional[Dict[str, Any]] = None,
+        envelope: Optional[Dict[str, Any]] = None,
+        code_patch: Optional[str] = None
+    ):
+        self.raw = raw
+        self.text = text
+        self.data = data
+        self.envelope = envelope
+        self._code_patch = code_patch
+
+    @property
+    def code_patch(self) -> Optional[str]:
+        """Patch from the JSON payload, else a diff found in the text, else None."""
+        if self.data is not None and isinstance(self.data.get('code_patch'), str):
+            return self.data['code_patch']
+        return self._code_patch
+
+    @property
+    def reasoning(self) -> Optional[str]:
+        if self.data is not None and isinstance(self.data.get('reasoning'), str):
+            return self.data['reasoning']
+        return None
+
+    @property
+    def stats(self) -> Optional[Dict[str, Any]]:
+        if self.envelope is not None and isinstance(self.envelope.get('stats'), dict):
+            return self.envelope['stats']
+        return None
+
+    def __repr__(self):
+        return (f"ParsedResponse(data_keys={sorted(self.data) if self.data else None}, "
+                f"envelope={self.envelope is not None}, patch_len={len(self.code_patch or '')})")
+
+
+def iter_json_objects(text: str, start: int = 0):
+    """
+    Yield (obj, start, end) for every top-level JSON object in `text`.
+
+    Scans left to right over plausible object starts only; after a
+    successful decode the scan resumes past the object, so nested objects
+    are not revisited.
+    """
+    pos = start
+    while True:
+        match = _OBJECT_START.search(text, pos)
+        if match is None:
+            return
+        candidate = match.start()
+        try:
+            obj, end = _DECODER.raw_decode(text, candidate)
+        except json.JSONDecodeError:
+            pos = candidate + 1
+            continue
+        yield obj, candidate, end
+        pos = end
+
+
+def _decode_around_key(text: str, key: str) -> Optional[Dict[str, Any]]:
+    """Try the few object starts nearest before `"key"` - the common case."""
+    key_pos = text.find(f'"{key}"')
+    if key_pos < 0:
+        return None
+    start = text.rfind('{', 0, key_pos)
+    for _ in range(8):
+        if start < 0:
+            return None
+        if _OBJECT_START.match(text, start):
+            try:
+                obj, _ = _DECODER.raw_decode(text, start)
+            except json.JSONDecodeError:
+                obj = None
+            if isinstance(obj, dict) and key in obj:
+                return obj
+        start = text.rfind('{', 0, start)
+    return None
+
+
+def unwrap_envelope(stdout: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Strip the CLI's {"response": ..., "stats": ...} wrapper if present.
+
+    Returns (response, envelope); response is the stdout unchanged when no
+    envelope is found.
+    """
+    stripped = stdout.strip()
+    if not stripped.startswith('{'):
+        return stdout, None
+    try:
+        obj, _ = _DECODER.raw_decode(stripped)
+    except json.JSONDecodeError:
+        return stdout, None
+    if isinstance(obj, dict) and 'response' in obj:
+        return obj['response'], obj
+    return stdout, None
+
+
+def parse_cli_output(stdout: str, patch_key: str = 'code_patch') -> ParsedResponse:
+    """Decode a CLI response once. Never raises on malformed input."""
+    response, envelope = unwrap_envelope(stdout or "")
+
+    if isinstance(response, dict):
+        return ParsedResponse(stdout, json.dumps(response), data=response, envelope=envelope)
+    text = response if isinstance(response, str) else json.dumps(response)
+
+    data = _decode_around_key(text, patch_key)
+    fallback = None
+    for obj, _, _ in ([] if data is not None else iter_json_objects(text)):
+        if not isinstance(obj, dict):
+            continue
+        if patch_key in obj:
+            data = obj
+            break
+        if fallback is None and 'reasoning' in obj:
+            fallback = obj
+    data = data or fallback
+
+    diff = None
+    if data is None or patch_key not in data:
+        diff = _find_diff(text)
+    return ParsedResponse(stdout, text, data=data, envelope=envelope, code_patch=diff)
+
+
+def _find_diff(text: str) -> Optional[str]:
+    match = _DIFF_FENCE.search(text)
+    if match:
+        return match.group(1)
+    start = text.find('diff --git ')
+    if start < 0:
+        return None
+    # Bare diff: stop at the first line that cannot belong to a patch
+    lines = []
+    for line in text[start:].splitlines(keepends=True):
+        if line.startswith('```') or not line.startswith(_DIFF_LINE_PREFIXES):
+            break
+        lines.append(line)
+    return "".join(lines)
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark CLI output parsing on large responses")
+    parser.add_argument("--benchmark-mb", type=float, default=8.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    target = int(args.benchmark_mb * 1024 * 1024)
+    filler = "Reasoning line with {braces} and `code` fragments: function f() { return 1; }\n"
+    prose = filler * (target // 2 // len(filler))
+    patch = "diff --git a/x.js b/x.js\n" + "+console.log('x');\n" * (target // 2 // 20)
+    payload = json.dumps({"reasoning": prose, "code_patch": patch})
+    code_prose = "function f(x) { if (x) { return {a: 1}; } }\n" * (target // 2 // 45)
+    cases = {
+        "bare json": payload,
+        "brace prose": code_prose + payload,
+        "fenced + prose": f"Here is the result:\n```json\n{payload}\n```\nDone.",
+        "cli envelope": json.dumps({"response": f"```json\n{payload}\n```", "stats": {"tokens": 1}}),
+    }
+
+    print(f"{'case':<16} {'size':>10} {'best':>10} {'MB/s':>8}")
+    for name, stdout in cases.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            parsed = parse_cli_output(stdout)
+            timings.append(time.perf_counter() - start)
+        assert parsed.code_patch == patch, f"{name}: patch mismatch"
+        best = min(timings)
+        size_mb = len(stdout) / (1024 * 1024)
+        print(f"{name:<16} {size_mb:>8.1f}MB {best * 1000:>8.1f}ms {size_mb / best:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+SharedRateLimiter: Cross-Process Token-Bucket Limiter for Gemini Calls
+
+docker/run_parallel.sh starts one optimizer container per skill, all
+drawing on the same Gemini quota. Instead of each process backing off on
+its own (and stampeding together), every caller takes from two shared
+token buckets - requests-per-minute and tokens-per-minute - whose state
+lives in a small JSON file on the shared /app volume, guarded by an
+exclusive fcntl lock. A 429 drains the shared buckets so all processes
+cool down together, and waits are jittered to avoid synchronized retries.
+"""
+
+import asyncio
+import fcntl
+import json
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Markers of quota / rate-limit responses in Gemini CLI stdout or stderr
+TRANSIENT_ERROR_PATTERNS = ("429", "Rate limit", "RESOURCE_EXHAUSTED")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/code)."""
+    return max(1, len(text) // 4)
+
+
+def is_transient_error(*texts: Optional[str]) -> bool:
+    """True if any of the CLI output streams reports a rate limit or exhausted quota."""
+    return any(p in (text or "") for text in texts for p in TRANSIENT_ERROR_PATTERNS)
+
+
+class SharedRateLimiter:
+    """
+    File-locked RPM/TPM token buckets shared by every optimizer process.
+
+    Usage:
+        limiter = SharedRateLimiter(Path(".dspy_cache/rate_limit.json"), requests_per_minute=60)
+        limiter.acquire(estimate_tokens(prompt))
+        ...
+        if rate_limited:
+            limiter.penalize()
+
+    Either bucket may be disabled by passing None, but not both.
+    """
+
+    def __init__(
+        self,
+        state_path: Path,
+        requests_per_minute: Optional[float] = 60.0,
+        tokens_per_minute: Optional[float] = None,
+        burst_seconds: float = 10.0,
+        jitter: float = 0.25,
+        penalty_seconds: float = 10.0
+    ):
+        for name, rate in (("requests_per_minute", requests_per_minute), ("tokens_per_minute", tokens_per_minute)):
+            if rate is not None and rate <= 0:
+                raise ValueError(f"{name} must be > 0 or None, got {rate}")
+        if requests_per_minute is None and tokens_per_minute is None:
+            raise ValueError("At least one of requests_per_minute or tokens_per_minute is required")
+        self.state_path = Path(state_path)
+        self.lock_path = self.state_path.with_suffix(self.state_path.suffix + '.lock')
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Bucket capacity: how much unused quota may accumulate for a burst.
+        self.request_capacity = max(1.0, requests_per_minute / 60.0 * burst_seconds) if requests_per_minute else None
+        self.token_capacity = tokens_per_minute / 60.0 * burst_seconds if tokens_per_minute else None
+        self.jitter = jitter
+        self.penalty_seconds = penalty_seconds
+        self.total_wait_seconds = 0.0
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Block until a request of `tokens` fits both buckets. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            delay = self._try_take(tokens)
+            if delay <= 0:
+                self.total_wait_seconds += waited
+                return waited
+            delay = self._jittered(delay)
+            time.sleep(delay)
+            waited += delay
+
+    async def aacquire(self, tokens: int = 1) -> float:
+        """Async variant of acquire() for use on the rollout event loop."""
+        waited = 0.0
+        while True:
+            # flock() and the state file I/O block; keep them off the loop
+            delay = await asyncio.to_thread(self._try_take, tokens)
+            if delay <= 0:
+                self.total_wait_seconds += waited
+                return waited
+            delay = self._jittered(delay)
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def penalize(self) -> None:
+        """Report a 429/RESOURCE_EXHAUSTED: push every process into a shared cool-down."""
+        with self._locked_state() as state:
+            if self.requests_per_minute:
+                state['requests'] = -self.requests_per_minute / 60.0 * self.penalty_seconds
+            if self.tokens_per_minute:
+                state['tokens'] = -self.tokens_per_minute / 60.0 * self.penalty_seconds
+            state['penalties'] = state.get('penalties', 0) + 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._locked_state() as state:
+            return dict(state)
+
+    def _try_take(self, tokens: int) -> float:
+        """Take from both buckets if possible; otherwise return seconds until they would fit."""
+        request_rate = self.requests_per_minute / 60.0 if self.requests_per_minute else None
+        token_rate = self.tokens_per_minute / 60.0 if self.tokens_per_minute else None
+        # A single request larger than the bucket must still be admitted eventually.
+        tokens = min(tokens, self.token_capacity) if self.token_capacity else tokens
+
+        with self._locked_state() as state:
+            requests_ok = request_rate is None or state['requests'] >= 1
+            tokens_ok = token_rate is None or state['tokens'] >= tokens
+            if requests_ok and tokens_ok:
+                if request_rate is not None:
+                    state['requests'] -= 1
+                if token_rate is not None:
+                    state['tokens'] -= tokens
+                return 0.0
+
+            delay = 0.0
+            if request_rate is not None:
+                delay = max(delay, (1 - state['requests']) / request_rate)
+            if token_rate is not None:
+                delay = max(delay, (tokens - state['tokens']) / token_rate)
+            return delay
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + random.uniform(0, self.jitter))
+
+    @contextmanager
+    def _locked_state(self):
+        """Exclusive, refilled view of the shared bucket state."""
+        with open(self.lock_path, 'a+') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                state = self._load(now)
+                elapsed = max(0.0, now - state['updated'])
+                if self.requests_per_minute:
+                    state['requests'] = min(
+                        self.request_capacity,
+                        state['requests'] + elapsed * self.requests_per_minute / 60.0
+                    )
+                if self.tokens_per_minute:
+                    state['tokens'] = min(
+                        self.token_capacity,
+                        state['tokens'] + elapsed * self.tokens_per_minute / 60.0
+                    )
+                state['updated'] = now
+                yield state
+                temp_path = self.state_path.with_suffix('.tmp')
+                temp_path.write_text(json.dumps(state), encoding='utf-8')
+                temp_path.replace(self.state_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, now: float) -> Dict[str, float]:
+        try:
+            return json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {
+                'requests': self.request_capacity or 0.0,
+                'tokens': self.token_capacity or 0.0,
+                'updated': now
+            }
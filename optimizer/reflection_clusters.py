@@ -0,0 +1,155 @@
+"""
+ClusteringProposer: One Reflection Record per Shared Failure
+
+When several stories in a GEPA minibatch fail for the same reason, the
+reflection LM used to read one near-identical record (inputs, outputs and
+metric feedback) per story. ClusteringProposer sits in GEPA's
+`instruction_proposer` slot, in front of the proposer that calls the
+reflection LM:
+
+  - records of each component are clustered by their feedback: token-set
+    similarity of the normalized text (feedback_summarizer.error_signature,
+    so paths and line numbers do not separate clusters), greedily against
+    each cluster's first record,
+  - each cluster of two or more becomes one record: the first member's
+    inputs and outputs, plus a digest naming the examples it stands for
+    ("Shared by 3 of 5 examples: #1 ..., #2 ..., #4 ...") and its feedback,
+  - records with a unique failure are passed through unchanged,
+  - the compression (records and characters, before and after) is
+    printed and kept in `iterations` for every proposal.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+try:
+    from .feedback_summarizer import error_signature
+except ImportError:
+    from feedback_summarizer import error_signature
+
+_TOKEN = re.compile(r'[^\W_]+|<\w+>')
+
+# Code context appended by the metric; it differs per story and is not part of the failure
+_CODE_SECTION = "\n\nCode generated:"
+
+REFERENCE_CHARS = 60
+
+
+def feedback_tokens(feedback: str) -> frozenset:
+    """Normalized token set used to compare two feedback strings."""
+    feedback = feedback.split(_CODE_SECTION, 1)[0]
+    return frozenset(_TOKEN.findall(error_signature(feedback).lower()))
+
+
+def cluster_feedback(feedbacks: Sequence[str], threshold: float = 0.6) -> List[List[int]]:
+    """
+    Group indices of `feedbacks` whose token sets have Jaccard similarity
+    >= `threshold` with a cluster's first member. Clusters keep input order.
+    """
+    clusters: List[List[int]] = []
+    leaders: List[frozenset] = []
+    for index, feedback in enumerate(feedbacks):
+        tokens = feedback_tokens(feedback)
+        for cluster, leader in zip(clusters, leaders):
+            union = tokens | leader
+            if union and len(tokens & leader) / len(union) >= threshold:
+                cluster.append(index)
+                break
+        else:
+            clusters.append([index])
+            leaders.append(tokens)
+    return clusters
+
+
+class ClusteringProposer:
+    """
+    GEPA ProposalFn that consolidates the reflective dataset before proposing.
+
+    Usage:
+        GEPA(metric=metric, reflection_lm=lm, instruction_proposer=ClusteringProposer())
+    """
+
+    def __init__(self, inner: Optional[Any] = None, threshold: float = 0.6, verbose: bool = True):
+        if inner is None:
+            # GEPA's default proposer (calls the reflection LM)
+            from dspy.teleprompt.gepa.instruction_proposal import InstructionProposer
+            inner = InstructionProposer()
+        self.inner = inner
+        self.threshold = threshold
+        self.verbose = verbose
+        self.iterations: List[Dict[str, Any]] = []
+
+    def __call__(
+        self,
+        candidate: Dict[str, str],
+        reflective_dataset: Mapping[str, Sequence[Mapping[str, Any]]],
+        components_to_update: List[str]
+    ) -> Dict[str, str]:
+        clustered = {
+            component: self.consolidate(records)
+            for component, records in reflective_dataset.items()
+        }
+        self._record(reflective_dataset, clustered)
+        return self.inner(
+            candidate=candidate,
+            reflective_dataset=clustered,
+            components_to_update=components_to_update
+        )
+
+    def consolidate(self, records: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """One record per feedback cluster, with references to the examples it covers."""
+        feedbacks = [str(r.get("Feedback", "")) for r in records]
+        consolidated = []
+        for cluster in cluster_feedback(feedbacks, self.threshold):
+            first = dict(records[cluster[0]])
+            if len(cluster) > 1:
+                references = ", ".join(f"#{i + 1} {self._reference(records[i])}" for i in cluster)
+                first["Feedback"] = (
+                    f"Shared by {len(cluster)} of {len(records)} examples: {references}\n"
+                    f"{feedbacks[cluster[0]]}"
+                )
+            consolidated.append(first)
+        return consolidated
+
+    def stats(self) -> Dict[str, Any]:
+        chars_in = sum(i['chars_in'] for i in self.iterations)
+        chars_out = sum(i['chars_out'] for i in self.iterations)
+        return {
+            'proposals': len(self.iterations),
+            'records_in': sum(i['records_in'] for i in self.iterations),
+            'records_out': sum(i['records_out'] for i in self.iterations),
+            'compression': round(chars_in / chars_out, 2) if chars_out else None
+        }
+
+    @staticmethod
+    def _reference(record: Mapping[str, Any]) -> str:
+        inputs = record.get("Inputs")
+        if isinstance(inputs, Mapping) and inputs:
+            text = str(next(iter(inputs.values())))
+        else:
+            text = str(inputs or "")
+        text = " ".join(text.split())
+        if len(text) > REFERENCE_CHARS:
+            text = text[:REFERENCE_CHARS] + "..."
+        return f"({text})" if text else ""
+
+    def _record(
+        self,
+        before: Mapping[str, Sequence[Mapping[str, Any]]],
+        after: Mapping[str, Sequence[Mapping[str, Any]]]
+    ) -> None:
+        chars_in = len(json.dumps(before, default=str))
+        chars_out = len(json.dumps(after, default=str))
+        iteration = {
+            'records_in': sum(len(r) for r in before.values()),
+            'records_out': sum(len(r) for r in after.values()),
+            'chars_in': chars_in,
+            'chars_out': chars_out,
+            'ratio': round(chars_in / chars_out, 2) if chars_out else None
+        }
+        self.iterations.append(iteration)
+        if self.verbose:
+            print(f"[INFO] Reflection clustering #{len(self.iterations)}: "
+                  f"{iteration['records_in']} -> {iteration['records_out']} records, "
+                  f"{chars_in} -> {chars_out} chars ({iteration['ratio']}x)")
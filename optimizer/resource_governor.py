@@ -0,0 +1,195 @@
+"""
+ResourceGovernor: Per-Evaluation Resource Accounting and Ceilings
+
+Slow rollouts could come from the model, the sandbox checkout or the test
+suite, and nothing recorded which. The governor runs a test subprocess
+and reports, for that subprocess alone:
+
+  - wall time,
+  - user and system CPU, and peak RSS, from `os.wait4` (the child plus
+    every descendant it waited for; unlike RUSAGE_CHILDREN deltas this
+    stays correct when several evaluations run at once),
+  - bytes written to block devices (ru_oublock, 512-byte units; writes
+    that stay in the page cache or tmpfs are not counted).
+
+The subprocess runs in its own session. While it runs, a watchdog sums
+CPU and RSS over its process group from /proc and kills the whole group
+when a ceiling is exceeded ("killed": "cpu" / "memory") or the timeout
+passes. Ceilings need /proc (Linux); accounting works on any POSIX system.
+cgroup v2 was not used: creating a child cgroup needs a delegated,
+writable hierarchy, which sandboxes and CI runners rarely provide.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def group_usage(pgid: int) -> Optional[Tuple[float, int]]:
+    """(CPU seconds, RSS bytes) summed over live processes of a group; None without /proc."""
+    if not os.path.isdir('/proc'):
+        return None
+    cpu, rss = 0.0, 0
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry.name}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after "(comm)": state ppid pgrp ... utime(11) stime cutime cstime ... rss(21)
+        fields = stat[stat.rindex(')') + 2:].split()
+        if int(fields[2]) != pgid:
+            continue
+        cpu += sum(int(t) for t in fields[11:15]) / _CLOCK_TICKS
+        rss += int(fields[21]) * _PAGE_SIZE
+    return cpu, rss
+
+
+class ResourceGovernor:
+    """
+    Runs test subprocesses with accounting and optional CPU/memory ceilings.
+
+    Usage:
+        governor = ResourceGovernor(cpu_seconds=600, memory_bytes=4 * 1024**3)
+        result = governor.run(['npm', 'test'], cwd=sandbox_dir, timeout=120)
+        result.returncode, result.usage['max_rss_bytes']
+    """
+
+    def __init__(
+        self,
+        cpu_seconds: Optional[float] = None,
+        memory_bytes: Optional[int] = None,
+        poll_interval: float = 0.2
+    ):
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.poll_interval = poll_interval
+        self.runs = 0
+        self.kills: Dict[str, int] = {'cpu': 0, 'memory': 0, 'timeout': 0}
+        self.peak_rss_bytes = 0
+        self.cpu_total = 0.0
+
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def run(self, args: Sequence[str], cwd: Path, timeout: float) -> subprocess.CompletedProcess:
+        """
+        Run `args` to completion and return a CompletedProcess with a
+        `usage` dict attached. A ceiling kill returns normally (non-zero
+        exit, reason in stderr); a timeout raises subprocess.TimeoutExpired
+        with the same `usage` attribute.
+        """
+        started = time.monotonic()
+        proc = subprocess.Popen(
+            list(args), cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, start_new_session=True
+        )
+        output: Dict[str, str] = {}
+        readers = [
+            threading.Thread(target=lambda: output.__setitem__('stdout', proc.stdout.read()), daemon=True),
+            threading.Thread(target=lambda: output.__setitem__('stderr', proc.stderr.read()), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+
+        killed: List[str] = []
+        done = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watch, args=(proc.pid, started + timeout, done, killed), daemon=True
+        )
+        watchdog.start()
+        try:
+            # Wait without reaping: while the leader is a zombie its pgid cannot be reused
+            os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        finally:
+            done.set()
+            watchdog.join()
+        # Workers left behind by the runner would hold the pipes open
+        self._kill_group(proc.pid)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        # Popen must not wait for the pid we reaped
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        for reader in readers:
+            reader.join()
+        proc.stdout.close()
+        proc.stderr.close()
+
+        reason = killed[0] if killed else None
+        usage = {
+            'wall_seconds': round(time.monotonic() - started, 3),
+            'user_cpu_seconds': round(rusage.ru_utime, 3),
+            'system_cpu_seconds': round(rusage.ru_stime, 3),
+            # Linux reports kilobytes, macOS bytes
+            'max_rss_bytes': rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+            'bytes_written': rusage.ru_oublock * 512,
+            'killed': reason
+        }
+        self._account(usage)
+
+        stdout, stderr = output.get('stdout', ''), output.get('stderr', '')
+        if reason == 'timeout':
+            expired = subprocess.TimeoutExpired(list(args), timeout, output=stdout, stderr=stderr)
+            expired.usage = usage
+            raise expired
+        if reason is not None:
+            limit = (f"{self.cpu_seconds}s CPU" if reason == 'cpu'
+                     else f"{self.memory_bytes // (1024 * 1024)} MB RSS")
+            stderr += f"\n[RESOURCE] Test run killed: exceeded the {limit} ceiling"
+        result = subprocess.CompletedProcess(list(args), proc.returncode, stdout, stderr)
+        result.usage = usage
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'kills': dict(self.kills),
+                'cpu_seconds': round(self.cpu_total, 3),
+                'peak_rss_mb': round(self.peak_rss_bytes / (1024 * 1024), 1)
+            }
+
+    def _watch(self, pgid: int, deadline: float, done: threading.Event, killed: List[str]) -> None:
+        limited = self.cpu_seconds is not None or self.memory_bytes is not None
+        while not done.wait(self.poll_interval):
+            reason = None
+            if time.monotonic() > deadline:
+                reason = 'timeout'
+            elif limited:
+                usage = group_usage(pgid)
+                if usage is not None:
+                    cpu, rss = usage
+                    if self.cpu_seconds is not None and cpu > self.cpu_seconds:
+                        reason = 'cpu'
+                    elif self.memory_bytes is not None and rss > self.memory_bytes:
+                        reason = 'memory'
+            if reason is not None:
+                killed.append(reason)
+                self._kill_group(pgid)
+                return
+
+    @staticmethod
+    def _kill_group(pgid: int) -> None:
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _account(self, usage: Dict[str, Any]) -> None:
+        with self._lock:
+            self.runs += 1
+            self.cpu_total += usage['user_cpu_seconds'] + usage['system_cpu_seconds']
+            self.peak_rss_bytes = max(self.peak_rss_bytes, usage['max_rss_bytes'])
+            if usage['killed']:
+                self.kills[usage['killed']] += 1
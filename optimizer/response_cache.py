@@ -0,0 +1,168 @@
+"""
+ResponseCache: Persistent Content-Addressed Cache of Gemini CLI Rollouts
+
+Stores (stdout, stderr, returncode) of Gemini CLI invocations in a SQLite
+database under .dspy_cache, keyed by a hash of the candidate instruction,
+the rendered prompt, the model (GEMINI_MODEL) and the output format.
+Re-running an optimization on the same skill and stories then skips CLI
+calls that were already paid for.
+
+Modes:
+    off       - never read or write
+    read      - serve hits, never write
+    readwrite - serve hits, record new successful responses
+    replay    - serve hits, raise CacheMissError instead of calling the CLI
+"""
+
+import hashlib
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+CACHE_MODES = ("off", "read", "readwrite", "replay")
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a rollout has no recorded response."""
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with TTL and size-based LRU eviction.
+
+    Usage:
+        cache = ResponseCache(Path(".dspy_cache/responses.sqlite"), mode="readwrite")
+        key = cache.make_key(instruction, prompt, model, "json")
+        result = cache.get(key) or run_cli()
+        cache.put(key, result)
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        mode: str = "readwrite",
+        ttl_seconds: Optional[float] = 30 * 24 * 3600,
+        max_bytes: Optional[int] = 512 * 1024 * 1024
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of {CACHE_MODES}")
+        self.db_path = Path(db_path)
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if mode != "off":
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    args TEXT NOT NULL,
+                    stdout TEXT NOT NULL,
+                    stderr TEXT NOT NULL,
+                    returncode INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.commit()
+
+    def __deepcopy__(self, memo):
+        # One connection and one set of counters per optimization run.
+        return self
+
+    @staticmethod
+    def make_key(instruction: str, prompt: str, model: str, output_format: str) -> str:
+        payload = json.dumps([instruction, prompt, model or "", output_format], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[subprocess.CompletedProcess]:
+        """Return the cached response for `key`, or None on a miss."""
+        if self._conn is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT args, stdout, stderr, returncode, created_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row and self.ttl_seconds is not None and now - row[4] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+
+        if row is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded Gemini response for key {key[:12]} (replay mode)")
+            return None
+
+        self.hits += 1
+        args, stdout, stderr, returncode, _ = row
+        return subprocess.CompletedProcess(json.loads(args), returncode, stdout, stderr)
+
+    def put(self, key: str, result: subprocess.CompletedProcess) -> None:
+        """Record a response. Only successful CLI runs are cached."""
+        if self._conn is None or self.mode != "readwrite" or result.returncode != 0:
+            return
+
+        args = result.args if isinstance(result.args, list) else [str(result.args)]
+        stdout = result.stdout or ""
+        stderr = result.stderr or ""
+        size = len(stdout.encode('utf-8')) + len(stderr.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(args), stdout, stderr, result.returncode, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        entries, total_bytes = 0, 0
+        if self._conn is not None:
+            with self._lock:
+                entries, total_bytes = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': total_bytes}
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then least-recently-accessed rows until under max_bytes."""
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        if self.max_bytes is None:
+            return
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+
+        victims: List[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in victims])
@@ -2,16 +2,23 @@
 """
 Retrospective Generator: Auto-generate Golden Examples from Successful Traces
 
-Reads trace logs from .dspy_cache/trace_logs/ and generates .example.md files
-for successful rollouts that can be used for future Few-Shot optimization.
+Reads rollout traces from the trace store in .dspy_cache/traces/ (or a legacy
+directory of per-rollout .json files) and generates .example.md files for
+successful rollouts that can be used for future Few-Shot optimization.
 """
 
 import argparse
 import json
 import re
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
+
+try:
+    from .trace_store import TraceStore
+except ImportError:
+    from trace_store import TraceStore
 
 
 def extract_key_techniques(code_patch: str) -> List[str]:
@@ -93,9 +100,24 @@ def process_trace_file(
         print(f"[WARN] Failed to read {trace_path}: {e}")
         return None
     
+    trace.setdefault('rollout_id', trace_path.stem)
+    return process_trace(trace, trace_path.name, domain, min_score, output_dir)
+
+
+def process_trace(
+    trace: Dict[str, Any],
+    source: str,
+    domain: str,
+    min_score: float,
+    output_dir: Path
+) -> Optional[str]:
+    """
+    Generate an example from one trace record if it was successful.
+    `source` names the trace in log messages.
+    """
     # Check success criteria
     if not trace.get('success', False):
-        #print(f"[DEBUG] Skipping {trace_path.name}: not successful")
+        #print(f"[DEBUG] Skipping {source}: not successful")
         return None
     
     # Parse test results if available
@@ -108,23 +130,23 @@ def process_trace_file(
     
     pass_rate = 1.0 if test_results.get('success', False) else 0.0
     if pass_rate < min_score:
-        print(f"[DEBUG] Skipping {trace_path.name}: pass_rate {pass_rate} < {min_score}")
+        print(f"[DEBUG] Skipping {source}: pass_rate {pass_rate} < {min_score}")
         return None
     
     # Extract required fields
-    rollout_id = trace.get('rollout_id', trace_path.stem)
+    rollout_id = trace.get('rollout_id', source)
     instruction = trace.get('instruction', '')
     
     # We need story context - check if it's in the trace
     story_context = trace.get('story_context', instruction)
     if not story_context:
-        print(f"[WARN] No story context in {trace_path}")
+        print(f"[WARN] No story context in {source}")
         return None
     
     # Get code patch from the trace (might need to be extracted differently)
     code_patch = trace.get('code_patch', '')
     if not code_patch:
-        print(f"[WARN] No code patch in {trace_path}")
+        print(f"[WARN] No code patch in {source}")
         return None
     
     # Extract techniques and generate
@@ -163,23 +185,37 @@ def run_retrospective(
         print(f"[ERROR] Trace directory not found: {trace_dir}")
         return generated
     
-    trace_files = list(trace_dir.glob("*.json"))
-    print(f"[INFO] Found {len(trace_files)} trace files in {trace_dir}")
+    if TraceStore.is_store(trace_dir):
+        store = TraceStore(trace_dir)
+        total = store.stats()['traces']
+        print(f"[INFO] Found {total} traces in trace store {trace_dir}")
+        results = (
+            process_trace(trace, trace.get('rollout_id', 'trace'), domain, min_score, output_dir)
+            for trace in islice(store.iter_traces(), limit)
+        )
+    else:
+        # Legacy layout: one <rollout_id>.json per rollout
+        trace_files = list(trace_dir.glob("*.json"))
+        total = len(trace_files)
+        print(f"[INFO] Found {total} trace files in {trace_dir}")
+        results = (
+            process_trace_file(trace_path, domain, min_score, output_dir)
+            for trace_path in trace_files[:limit]
+        )
     
-    for trace_path in trace_files[:limit]:
-        result = process_trace_file(trace_path, domain, min_score, output_dir)
+    for result in results:
         if result:
             print(f"[SUCCESS] Generated: {result}")
             generated.append(result)
     
-    print(f"\n[SUMMARY] Generated {len(generated)} Golden Examples from {len(trace_files)} traces")
+    print(f"\n[SUMMARY] Generated {len(generated)} Golden Examples from {total} traces")
     return generated
 
 
 def main():
     parser = argparse.ArgumentParser(description="Generate Golden Examples from successful traces")
-    parser.add_argument("--trace-dir", type=Path, default=Path(".dspy_cache/trace_logs"),
-                        help="Directory containing trace JSON files")
+    parser.add_argument("--trace-dir", type=Path, default=Path(".dspy_cache/traces"),
+                        help="Trace store directory (or a legacy directory of trace JSON files)")
     parser.add_argument("--domain", type=str, required=True,
                         help="Domain for generated examples (e.g., 'backend', 'algorithms')")
     parser.add_argument("--output-dir", type=Path, default=None,
@@ -0,0 +1,202 @@
+"""
+RolloutExecutor: Bounded-Concurrency Async Execution for Gemini Rollouts
+
+Owns a dedicated asyncio event loop running on a background thread and
+a gate that caps how many rollouts are in flight at once - either a fixed
+`concurrency` or the live window of an AIMDController. Rollouts are
+submitted as coroutines from any (synchronous) thread, which lets DSPy
+optimizers keep calling GeminiSkillAdapter.forward() while the actual
+CLI invocations run concurrently via asyncio.create_subprocess_exec.
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Dict, List, Optional, Sequence
+
+try:
+    from .concurrency_controller import AIMDController
+    from .stream_reader import StreamMonitor
+except ImportError:
+    from concurrency_controller import AIMDController
+    from stream_reader import StreamMonitor
+
+
+class StreamedProcess(subprocess.CompletedProcess):
+    """CompletedProcess plus how the streamed stdout read ended."""
+
+    def __init__(self, args, returncode, stdout, stderr, stream: Dict[str, Any]):
+        super().__init__(args, returncode, stdout, stderr)
+        self.stream = stream
+
+
+class RolloutExecutor:
+    """
+    Runs rollout coroutines on a shared event loop behind a concurrency gate.
+
+    Usage:
+        executor = RolloutExecutor(concurrency=4)
+        result = executor.run(adapter.aforward(story, stack))
+        results = executor.gather([adapter.aforward(s, stack) for s in stories])
+    """
+
+    def __init__(self, concurrency: int = 1, controller: Optional[AIMDController] = None):
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+        self.concurrency = concurrency
+        # When set, the controller's window replaces the fixed limit
+        self.controller = controller
+        self._active = 0
+        self._capacity = asyncio.Condition()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="rollout-executor",
+            daemon=True
+        )
+        self._thread.start()
+
+    def __deepcopy__(self, memo):
+        # DSPy optimizers deepcopy programs per candidate; every copy must
+        # share the same loop and gate so the concurrency bound is global.
+        return self
+
+    @property
+    def limit(self) -> int:
+        return self.controller.limit if self.controller is not None else self.concurrency
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the `limit` rollout slots for the enclosed block."""
+        async with self._capacity:
+            await self._capacity.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+        try:
+            yield
+        finally:
+            async with self._capacity:
+                self._active -= 1
+                # The limit may have grown while this slot was held
+                self._capacity.notify_all()
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on the executor loop and block until it finishes."""
+        if self._in_loop_thread():
+            raise RuntimeError("RolloutExecutor.run() called from its own event loop; await the coroutine instead")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result()
+
+    def gather(self, coros: Sequence[Awaitable[Any]]) -> List[Any]:
+        """Run many coroutines concurrently (bounded by slot()) and return results in order."""
+        async def _gather():
+            return await asyncio.gather(*coros)
+        return self.run(_gather())
+
+    async def run_process(
+        self,
+        args: List[str],
+        timeout: float,
+        cwd: Optional[Path] = None,
+        env: Optional[Dict[str, str]] = None,
+        monitor: Optional[StreamMonitor] = None
+    ) -> subprocess.CompletedProcess:
+        """
+        Async equivalent of Popen(...).communicate(timeout=...).
+
+        With a `monitor`, stdout is consumed incrementally and the child is
+        killed as soon as the monitor reports a complete patch (returncode
+        is then reported as 0) or its byte cap is exceeded.
+
+        Raises subprocess.TimeoutExpired (after killing the child) so callers
+        keep the same error handling as the blocking implementation.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.DEVNULL,
+            cwd=str(cwd) if cwd else None,
+            env=env
+        )
+        if monitor is not None:
+            return await self._run_streamed(process, args, timeout, monitor)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.communicate()
+            raise subprocess.TimeoutExpired(args, timeout)
+        return subprocess.CompletedProcess(
+            args,
+            process.returncode,
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace')
+        )
+
+    async def _run_streamed(
+        self,
+        process: asyncio.subprocess.Process,
+        args: List[str],
+        timeout: float,
+        monitor: StreamMonitor
+    ) -> StreamedProcess:
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        termination = "exit"
+
+        async def consume():
+            nonlocal termination
+            while True:
+                chunk = await process.stdout.read(64 * 1024)
+                if not chunk:
+                    break
+                monitor.feed(chunk)
+                if monitor.over_limit:
+                    termination = "output_cap"
+                    break
+                if monitor.complete:
+                    termination = "complete"
+                    break
+            if termination != "exit":
+                self._kill(process)
+            await process.wait()
+
+        try:
+            await asyncio.wait_for(consume(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._kill(process)
+            await process.wait()
+            stderr_task.cancel()
+            raise subprocess.TimeoutExpired(args, timeout, output=monitor.output())
+
+        stderr = (await stderr_task).decode('utf-8', errors='replace')
+        returncode = 0 if termination == "complete" else process.returncode
+        if termination == "output_cap":
+            stderr += f"\n[ouroboros] stdout exceeded {monitor.max_bytes} bytes; process killed"
+        if monitor.errors:
+            # stream-json reports API errors as events; surface them where
+            # transient-error detection looks
+            stderr += "".join(f"\n{error}" for error in monitor.errors)
+        return StreamedProcess(args, returncode, monitor.output(), stderr, stream=monitor.status(termination))
+
+    @staticmethod
+    def _kill(process: asyncio.subprocess.Process) -> None:
+        # os.kill rather than Process.kill(): the latter polls (and may reap)
+        # the child, racing the event loop's child watcher for its exit status.
+        if process.returncode is None:
+            try:
+                os.kill(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def close(self) -> None:
+        """Stop the background loop. Pending rollouts are abandoned."""
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def _in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
@@ -0,0 +1,260 @@
+"""
+RunnerDaemon: Warm Test-Runner Processes per Sandbox
+
+Every evaluation used to pay Jest/Node startup and transform-cache warmup,
+often longer than the tests themselves. A RunnerDaemon keeps one
+long-lived runner (jest_daemon.js, which drives Jest's programmatic
+`runCLI`) per project directory, and talks to it over a Unix socket:
+
+    {"command": "run", "argv": {"_": ["test/a.test.js"]}}
+    -> {"ok": true, "results": <jest --json report>, "rss": <bytes>}
+
+The daemon is restarted automatically:
+  - when it crashed or the socket broke (the request is retried once),
+  - after a response reports RSS above `max_rss_bytes`, or after
+    `max_runs` runs, to bound memory growth from the in-band runner,
+  - after a timed-out run (it is killed rather than left running).
+
+RunnerDaemonPool keeps one daemon per sandbox path, so pooled sandboxes
+(SandboxPool) keep their daemon warm across leases.
+"""
+
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+DAEMON_SCRIPT = Path(__file__).with_name("jest_daemon.js")
+
+
+class RunnerDaemonError(RuntimeError):
+    """The daemon could not be started or answered with an error."""
+
+
+class RunnerDaemonUnavailable(RunnerDaemonError):
+    """The daemon exits on startup (e.g. Jest is not installed)."""
+
+
+class RunnerDaemon:
+    """
+    One warm test runner for one project directory.
+
+    Usage:
+        daemon = RunnerDaemon(sandbox_dir)
+        payload = daemon.run(["test/a.test.js"], timeout=120)
+        daemon.close()
+    """
+
+    def __init__(
+        self,
+        project_dir: Path,
+        command: Optional[Sequence[str]] = None,
+        max_rss_bytes: int = 1536 * 1024 * 1024,
+        max_runs: int = 200,
+        startup_timeout: float = 30.0
+    ):
+        self.project_dir = Path(project_dir)
+        # The socket path is appended as the last argument
+        self.command = list(command) if command else ["node", str(DAEMON_SCRIPT)]
+        self.max_rss_bytes = max_rss_bytes
+        self.max_runs = max_runs
+        self.startup_timeout = startup_timeout
+        self.starts = 0
+        self.restarts = 0
+        self.runs = 0
+
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._runtime_dir: Optional[Path] = None
+        self._runs_since_start = 0
+
+    def run(self, extra_args: Sequence[str] = (), timeout: float = 120) -> Dict[str, Any]:
+        """
+        Run tests and return the {exit_code, stdout, stderr, success} payload.
+
+        `extra_args` are test files, or `--findRelatedTests <files>`.
+        Raises subprocess.TimeoutExpired on timeout, RunnerDaemonError if
+        the daemon cannot run the tests.
+        """
+        request = {'command': 'run', 'argv': self._argv(extra_args)}
+        with self._lock:
+            for attempt in range(2):
+                self._ensure_started()
+                try:
+                    response = self._request(request, timeout)
+                    break
+                except socket.timeout:
+                    self._stop()
+                    raise subprocess.TimeoutExpired(self.command, timeout)
+                except (OSError, ValueError) as e:
+                    # Crashed mid-run or the socket broke: restart and retry once
+                    self._stop()
+                    self.restarts += 1
+                    if attempt == 1:
+                        raise RunnerDaemonError(f"Test daemon failed twice: {e}; {self._log_tail()}")
+            self.runs += 1
+            self._runs_since_start += 1
+            if response.get('rss', 0) > self.max_rss_bytes or self._runs_since_start >= self.max_runs:
+                # Recycle before the next run rather than risk an OOM kill mid-run
+                self._stop()
+                self.restarts += 1
+
+        if not response.get('ok'):
+            raise RunnerDaemonError(response.get('error', 'unknown daemon error'))
+        return self._payload(response['results'])
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+    @staticmethod
+    def _argv(extra_args: Sequence[str]) -> Dict[str, Any]:
+        args = list(extra_args)
+        if args and args[0] == '--findRelatedTests':
+            return {'_': args[1:], 'findRelatedTests': True}
+        return {'_': [a for a in args if not a.startswith('-')]}
+
+    @staticmethod
+    def _payload(report: Dict[str, Any]) -> Dict[str, Any]:
+        success = bool(report.get('success'))
+        # Failure messages go where npm test would have printed them
+        messages = [r.get('message') or r.get('failureMessage') or '' for r in report.get('testResults', [])]
+        return {
+            'exit_code': 0 if success else 1,
+            'stdout': json.dumps(report),
+            'stderr': "\n".join(m for m in messages if m),
+            'success': success
+        }
+
+    def _ensure_started(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            return
+        self._stop()
+        self._runtime_dir = Path(tempfile.mkdtemp(prefix="ouroboros_daemon_"))
+        socket_path = self._runtime_dir / "runner.sock"
+        log = open(self._runtime_dir / "daemon.log", 'wb')
+        try:
+            self._process = subprocess.Popen(
+                self.command + [str(socket_path)],
+                cwd=self.project_dir,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT
+            )
+        finally:
+            log.close()
+        self.starts += 1
+        self._runs_since_start = 0
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                tail = self._log_tail()
+                self._stop()
+                raise RunnerDaemonUnavailable(f"Test daemon exited during startup: {tail}")
+            if socket_path.exists():
+                try:
+                    if self._request({'command': 'ping'}, timeout=5).get('ok'):
+                        return
+                except (OSError, ValueError):
+                    pass
+            time.sleep(0.05)
+        self._stop()
+        raise RunnerDaemonError(f"Test daemon did not start within {self.startup_timeout}s")
+
+    def _request(self, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(str(self._runtime_dir / "runner.sock"))
+            conn.sendall(json.dumps(request).encode('utf-8') + b"\n")
+            chunks: List[bytes] = []
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    raise ConnectionResetError("daemon closed the connection")
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+        return json.loads(b"".join(chunks))
+
+    def _stop(self) -> None:
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            self._process = None
+        if self._runtime_dir is not None:
+            shutil.rmtree(self._runtime_dir, ignore_errors=True)
+            self._runtime_dir = None
+
+    def _log_tail(self, limit: int = 500) -> str:
+        if self._runtime_dir is None:
+            return ""
+        try:
+            return (self._runtime_dir / "daemon.log").read_text(encoding='utf-8', errors='replace')[-limit:]
+        except OSError:
+            return ""
+
+
+class RunnerDaemonPool:
+    """
+    One RunnerDaemon per project directory, created on first use.
+
+    Usage:
+        daemons = RunnerDaemonPool()
+        payload = daemons.run(sandbox_dir, test_files, timeout=120)
+        daemons.close()
+    """
+
+    def __init__(self, command: Optional[Sequence[str]] = None, **daemon_kwargs: Any):
+        self.command = command
+        self.daemon_kwargs = daemon_kwargs
+        self._lock = threading.Lock()
+        self._daemons: Dict[Path, RunnerDaemon] = {}
+        # Directories whose daemon cannot start; callers go straight to npm test
+        self._unavailable: Dict[Path, str] = {}
+        self.failures = 0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def run(self, project_dir: Path, extra_args: Sequence[str] = (), timeout: float = 120) -> Dict[str, Any]:
+        key = Path(project_dir).resolve()
+        with self._lock:
+            if key in self._unavailable:
+                raise RunnerDaemonUnavailable(self._unavailable[key])
+            daemon = self._daemons.get(key)
+            if daemon is None:
+                daemon = RunnerDaemon(key, command=self.command, **self.daemon_kwargs)
+                self._daemons[key] = daemon
+        try:
+            return daemon.run(extra_args, timeout)
+        except RunnerDaemonError as e:
+            with self._lock:
+                self.failures += 1
+                if isinstance(e, RunnerDaemonUnavailable):
+                    self._unavailable[key] = str(e)
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            daemons = list(self._daemons.values())
+        return {
+            'daemons': len(daemons),
+            'runs': sum(d.runs for d in daemons),
+            'starts': sum(d.starts for d in daemons),
+            'restarts': sum(d.restarts for d in daemons),
+            'failures': self.failures
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            daemons = list(self._daemons.values())
+            self._daemons.clear()
+        for daemon in daemons:
+            daemon.close()
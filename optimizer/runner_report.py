@@ -0,0 +1,140 @@
+"""
+Runner Reports: Per-Test Outcomes from Jest, Vitest and Mocha JSON
+
+`npm test -- --json` already returns a report of every test, but the metric
+only looked at the exit code. This module decodes the report into
+per-test outcomes so a candidate that passes 9 of 10 tests scores
+differently from one that breaks the whole suite.
+
+Recognized formats (the last report found in stdout wins, so npm banners
+and console output around it are fine):
+
+  - Jest `--json` and Vitest `--reporter=json` (Jest-compatible):
+    {"numTotalTests": ..., "testResults": [{"name": file,
+      "assertionResults": [{"fullName", "status", "failureMessages"}]}]}
+    A test file that failed to run (syntax error, missing module) has no
+    assertionResults; it counts as one failed test named after the file.
+  - Mocha `--reporter json`:
+    {"stats": {...}, "tests": [...], "failures": [{"fullTitle", "err"}]}
+"""
+
+from typing import Any, Dict, List, Optional
+
+try:
+    from .output_parser import iter_json_objects
+except ImportError:
+    from output_parser import iter_json_objects
+
+PASSED = "passed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+# Jest/Vitest assertion statuses that neither pass nor fail
+_SKIPPED_STATUSES = {"pending", "skipped", "todo", "disabled"}
+
+MAX_MESSAGE_CHARS = 500
+
+
+class CaseOutcome:
+    """One test case: name, file, passed/failed/skipped, failure message."""
+
+    def __init__(self, name: str, status: str, file: str = "", message: str = ""):
+        self.name = name
+        self.status = status
+        self.file = file
+        self.message = message
+
+    def __repr__(self):
+        return f"CaseOutcome({self.name!r}, {self.status!r})"
+
+
+class RunnerReport:
+    """Per-test outcomes of one test run."""
+
+    def __init__(self, runner: str, outcomes: List[CaseOutcome]):
+        self.runner = runner
+        self.outcomes = outcomes
+
+    @property
+    def passed(self) -> int:
+        return sum(o.status == PASSED for o in self.outcomes)
+
+    @property
+    def failed(self) -> int:
+        return sum(o.status == FAILED for o in self.outcomes)
+
+    @property
+    def skipped(self) -> int:
+        return sum(o.status == SKIPPED for o in self.outcomes)
+
+    def pass_ratio(self, failure_weight: float = 1.0) -> Optional[float]:
+        """passed / (passed + failure_weight * failed); None if nothing ran."""
+        denominator = self.passed + failure_weight * self.failed
+        if denominator <= 0:
+            return None
+        return self.passed / denominator
+
+    def failures(self) -> Dict[str, str]:
+        """Failing test name -> first lines of its failure message."""
+        return {
+            o.name: o.message[:MAX_MESSAGE_CHARS]
+            for o in self.outcomes if o.status == FAILED
+        }
+
+
+def parse_runner_report(stdout: str) -> Optional[RunnerReport]:
+    """Decode the last Jest/Vitest/Mocha JSON report in `stdout`, if any."""
+    report = None
+    for obj, _, _ in iter_json_objects(stdout or ""):
+        if not isinstance(obj, dict):
+            continue
+        if 'numTotalTests' in obj and 'testResults' in obj:
+            report = _from_jest(obj)
+        elif isinstance(obj.get('stats'), dict) and 'tests' in obj:
+            report = _from_mocha(obj)
+    return report
+
+
+def _from_jest(report: Dict[str, Any]) -> RunnerReport:
+    outcomes = []
+    for file_result in report.get('testResults', []):
+        file = file_result.get('name') or file_result.get('testFilePath', '')
+        assertions = file_result.get('assertionResults') or []
+        if not assertions:
+            if file_result.get('status') == FAILED:
+                message = file_result.get('message') or file_result.get('failureMessage') or ''
+                outcomes.append(CaseOutcome(file, FAILED, file, message.strip()))
+            continue
+        for assertion in assertions:
+            status = assertion.get('status', '')
+            if status in _SKIPPED_STATUSES:
+                status = SKIPPED
+            elif status != PASSED:
+                status = FAILED
+            name = assertion.get('fullName') or assertion.get('title', '')
+            message = "\n".join(assertion.get('failureMessages') or []).strip()
+            outcomes.append(CaseOutcome(name, status, file, message))
+    # Vitest's JSON reporter is indistinguishable from Jest's, by design
+    return RunnerReport("jest", outcomes)
+
+
+def _from_mocha(report: Dict[str, Any]) -> RunnerReport:
+    failed = {t.get('fullTitle'): t for t in report.get('failures', [])}
+    pending = {t.get('fullTitle') for t in report.get('pending', [])}
+    outcomes = []
+    for test in report.get('tests', []):
+        name = test.get('fullTitle') or test.get('title', '')
+        if name in failed:
+            err = failed[name].get('err') or {}
+            outcomes.append(CaseOutcome(name, FAILED, test.get('file', ''), str(err.get('message', ''))))
+        elif name in pending or test.get('pending'):
+            outcomes.append(CaseOutcome(name, SKIPPED, test.get('file', '')))
+        else:
+            outcomes.append(CaseOutcome(name, PASSED, test.get('file', '')))
+    # Hook failures ("before all" hook) are reported in failures but not in tests
+    listed = {o.name for o in outcomes}
+    for name, test in failed.items():
+        if name not in listed:
+            err = test.get('err') or {}
+            outcomes.append(CaseOutcome(name, FAILED, test.get('file', ''), str(err.get('message', ''))))
+    return RunnerReport("mocha", outcomes)
@@ -0,0 +1,347 @@
+"""
+SandboxPool: Reusable Git Worktrees for Test Evaluation
+
+`execute_in_sandbox` used to `git worktree add` a fresh checkout for every
+evaluation and `git worktree remove` it afterwards, paying the full
+checkout (and any npm install) each time and leaking a worktree whenever
+the optimizer was killed mid-run. The pool keeps up to `size` detached
+worktrees instead:
+
+  - a sandbox is leased exclusively, and reset to the repository's current
+    HEAD on checkout (`git reset --hard` + `git clean -fdx`, keeping
+    `node_modules`, incremental tsc state and other `keep` paths),
+  - each slot is guarded by an fcntl lock held for the life of the pool,
+    so several processes in one container never share a sandbox,
+  - at startup, pool worktrees whose slot lock is free (left by a crashed
+    run) are removed, and so are per-evaluation `ouroboros_*` worktrees in
+    the temp dir older than LEGACY_MAX_AGE (younger ones may belong to a
+    live optimizer running without a pool).
+
+Sandboxes are created on first use, so an idle pool costs nothing.
+
+Placement: test suites that write many small files are I/O bound on a
+disk-backed /tmp, so new sandboxes go to a RAM-backed root (/dev/shm) when
+it has room for the largest sandbox measured so far (or the HEAD tree size
+before the first measurement) plus `ram_reserve_bytes`. Otherwise they go to
+`root` on disk. Each sandbox is measured once, after the lease that created
+it, without the `keep` paths (node_modules is linked from the shared
+dependency cache, and walking it costs far more than the estimate is
+worth). A RAM sandbox is moved back to disk once free memory drops below
+the reserve. stats() reports
+checkout and test time per placement.
+"""
+
+import fcntl
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, List, Optional, Sequence
+
+DEFAULT_RAM_ROOT = Path("/dev/shm") / "ouroboros_sandboxes"
+
+
+class SandboxLeaseTimeout(RuntimeError):
+    """No sandbox became free within the requested timeout."""
+
+
+class SandboxPool:
+    """
+    Fixed-size pool of reusable worktrees of `repo_root`.
+
+    Usage:
+        pool = SandboxPool(repo_root, size=4)
+        with pool.lease() as sandbox_dir:
+            subprocess.run(['git', 'apply', ...], cwd=sandbox_dir)
+        pool.close()
+    """
+
+    PREFIX = "ouroboros_"
+    # Far longer than one evaluation lives (test timeout plus checkout)
+    LEGACY_MAX_AGE = 3600
+
+    def __init__(
+        self,
+        repo_root: Path,
+        size: int = 2,
+        root: Optional[Path] = None,
+        keep: Sequence[str] = ("node_modules", ".ouroboros.tsbuildinfo"),
+        ram_root: Optional[Path] = DEFAULT_RAM_ROOT,
+        ram_reserve_bytes: int = 512 * 1024 * 1024
+    ):
+        if size < 1:
+            raise ValueError(f"size must be >= 1, got {size}")
+        self.repo_root = Path(repo_root)
+        self.size = size
+        self.root = Path(root) if root else Path(tempfile.gettempdir()) / "ouroboros_sandboxes"
+        self.keep = tuple(keep)
+        self.ram_reserve_bytes = ram_reserve_bytes
+        self.leases = 0
+        self.created = 0
+        self.recovered = 0
+
+        self._cond = threading.Condition()
+        self._idle: List[Path] = []
+        self._busy = 0
+        # Slot name -> open lock file proving this pool owns it
+        self._slot_locks: Dict[str, IO] = {}
+        self._closed = False
+        # Slot name -> bytes used after its last lease
+        self._sizes: Dict[str, int] = {}
+        self._placements: Dict[str, Dict[str, float]] = {}
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        # git reports resolved paths (e.g. /private/var on macOS)
+        self.root = self.root.resolve()
+        self.ram_root = self._usable_root(ram_root)
+        self.recovered = self._recover()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[Path]:
+        """Check out a clean sandbox at the current HEAD for the duration of the block."""
+        sandbox = self._acquire(timeout)
+        started = time.monotonic()
+        try:
+            if not (sandbox / ".git").exists():
+                self._create(sandbox)
+            self._reset(sandbox)
+        except Exception:
+            # Drop a sandbox that cannot be prepared; its slot is recreated on demand
+            self._discard(sandbox)
+            self._release(sandbox)
+            raise
+        checkout_seconds = time.monotonic() - started
+        started = time.monotonic()
+        try:
+            yield sandbox
+        finally:
+            self._account(sandbox, checkout_seconds, time.monotonic() - started)
+            self._release(sandbox)
+
+    def placement(self, sandbox: Path) -> str:
+        return "ram" if self.ram_root is not None and sandbox.parent == self.ram_root else "disk"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'size': self.size,
+                'sandboxes': len(self._slot_locks),
+                'idle': len(self._idle),
+                'busy': self._busy,
+                'leases': self.leases,
+                'created': self.created,
+                'recovered': self.recovered,
+                'sandbox_bytes': sum(self._sizes.values()),
+                'placements': {
+                    name: {k: round(v, 3) for k, v in totals.items()}
+                    for name, totals in self._placements.items()
+                }
+            }
+
+    def close(self) -> None:
+        """Remove every sandbox owned by this pool (waits for active leases)."""
+        with self._cond:
+            self._closed = True
+            while self._busy:
+                self._cond.wait()
+            sandboxes = list(self._idle)
+        for sandbox in sandboxes:
+            self._discard(sandbox)
+        with self._cond:
+            # Slots whose sandbox was never created still hold a lock
+            for lock_file in self._slot_locks.values():
+                lock_file.close()
+            self._slot_locks.clear()
+
+    def _acquire(self, timeout: Optional[float]) -> Path:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("SandboxPool is closed")
+                if self._idle:
+                    sandbox = self._idle.pop()
+                    break
+                if len(self._slot_locks) < self.size:
+                    sandbox = self._claim_slot()
+                    break
+                if not self._cond.wait(timeout):
+                    raise SandboxLeaseTimeout(f"No sandbox free after {timeout}s")
+            self._busy += 1
+            self.leases += 1
+        return sandbox
+
+    def _release(self, sandbox: Path) -> None:
+        with self._cond:
+            self._busy -= 1
+            if sandbox.name in self._slot_locks:
+                self._idle.append(sandbox)
+            self._cond.notify_all()
+
+    def _claim_slot(self) -> Path:
+        """Lock the lowest free slot number and place it (called with self._cond held)."""
+        number = 0
+        while True:
+            name = f"{self.PREFIX}{number}"
+            if name not in self._slot_locks:
+                lock_file = self._try_lock(name)
+                if lock_file is not None:
+                    self._slot_locks[name] = lock_file
+                    return self._choose_root() / name
+            number += 1
+
+    def _choose_root(self) -> Path:
+        if self.ram_root is not None:
+            needed = self._estimated_size() + self.ram_reserve_bytes
+            if self._ram_free() >= needed:
+                return self.ram_root
+        return self.root
+
+    def _estimated_size(self) -> int:
+        if self._sizes:
+            return max(self._sizes.values())
+        listing = self._git(self.repo_root, 'ls-tree', '-r', '-l', 'HEAD', check=False)
+        total = 0
+        for line in listing.splitlines():
+            # <mode> <type> <object> <size>\t<path>
+            fields = line.split(None, 4)
+            if len(fields) > 3 and fields[3].isdigit():
+                total += int(fields[3])
+        return total
+
+    def _ram_free(self) -> int:
+        """Free space on the RAM root, capped by the memory actually available."""
+        free = shutil.disk_usage(self.ram_root).free
+        try:
+            with open('/proc/meminfo', 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        free = min(free, int(line.split()[1]) * 1024)
+                        break
+        except OSError:
+            pass
+        return free
+
+    def _account(self, sandbox: Path, checkout_seconds: float, test_seconds: float) -> None:
+        """Record size and timings after a lease; move a RAM sandbox to disk under memory pressure."""
+        # A reset brings the tree back to HEAD, so one measurement per sandbox suffices
+        size = None if sandbox.name in self._sizes else _tree_bytes(sandbox, skip=self.keep)
+        placement = self.placement(sandbox)
+        with self._cond:
+            if size is not None:
+                self._sizes[sandbox.name] = size
+            totals = self._placements.setdefault(
+                placement, {'leases': 0, 'checkout_seconds': 0.0, 'test_seconds': 0.0}
+            )
+            totals['leases'] += 1
+            totals['checkout_seconds'] += checkout_seconds
+            totals['test_seconds'] += test_seconds
+        if placement == "ram" and self._ram_free() < self.ram_reserve_bytes:
+            print(f"[WARN] Low memory: moving sandbox {sandbox.name} from {self.ram_root} to disk")
+            # Freed slot is recreated on disk by the next lease
+            self._discard(sandbox)
+
+    def _create(self, sandbox: Path) -> None:
+        if sandbox.exists():
+            # Leftover directory that is no longer a registered worktree
+            self._git(self.repo_root, 'worktree', 'remove', '--force', str(sandbox), check=False)
+            shutil.rmtree(sandbox, ignore_errors=True)
+        self._git(self.repo_root, 'worktree', 'add', '--detach', str(sandbox), 'HEAD')
+        self.created += 1
+
+    def _reset(self, sandbox: Path) -> None:
+        head = self._git(self.repo_root, 'rev-parse', 'HEAD').strip()
+        self._git(sandbox, 'reset', '--hard', '-q', head)
+        excludes = [arg for path in self.keep for arg in ('-e', path)]
+        self._git(sandbox, 'clean', '-fdxq', *excludes)
+
+    def _discard(self, sandbox: Path) -> None:
+        self._git(self.repo_root, 'worktree', 'remove', '--force', str(sandbox), check=False)
+        with self._cond:
+            lock_file = self._slot_locks.pop(sandbox.name, None)
+            self._sizes.pop(sandbox.name, None)
+            if sandbox in self._idle:
+                self._idle.remove(sandbox)
+        if lock_file is not None:
+            lock_file.close()
+
+    def _recover(self) -> int:
+        """Remove `ouroboros_*` worktrees that no live pool owns."""
+        listing = self._git(self.repo_root, 'worktree', 'list', '--porcelain', check=False)
+        removed = 0
+        for line in listing.splitlines():
+            if not line.startswith('worktree '):
+                continue
+            path = Path(line[len('worktree '):])
+            if not path.name.startswith(self.PREFIX):
+                continue
+            # Only this container's sandboxes: pool slots, or legacy per-rollout worktrees
+            slot = path.parent in (self.root, self.ram_root)
+            if not slot and path.parent != Path(tempfile.gettempdir()).resolve():
+                continue
+            lock_file = self._try_lock(path.name) if slot else None
+            if slot and lock_file is None:
+                continue  # Owned by another live pool
+            if not slot and self._is_recent(path):
+                continue  # Possibly a running evaluation of another process
+            self._git(self.repo_root, 'worktree', 'remove', '--force', str(path), check=False)
+            if lock_file is not None:
+                lock_file.close()
+            removed += 1
+        if removed:
+            print(f"[INFO] Removed {removed} stale sandbox worktrees")
+        return removed
+
+    def _is_recent(self, path: Path) -> bool:
+        try:
+            return time.time() - path.stat().st_mtime < self.LEGACY_MAX_AGE
+        except OSError:
+            return False  # Directory already gone: only the registration is left
+
+    @staticmethod
+    def _usable_root(ram_root: Optional[Path]) -> Optional[Path]:
+        if ram_root is None or not Path(ram_root).parent.is_dir():
+            return None
+        try:
+            Path(ram_root).mkdir(exist_ok=True)
+        except OSError:
+            return None
+        return Path(ram_root).resolve()
+
+    def _try_lock(self, name: str) -> Optional[IO]:
+        # Lock files live on the disk root whatever the sandbox placement
+        lock_file = open(self.root / f"{name}.lock", 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    @staticmethod
+    def _git(cwd: Path, *args: str, check: bool = True) -> str:
+        result = subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True, check=False)
+        if check and result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, ['git', *args], result.stdout, result.stderr)
+        return result.stdout
+
+
+def _tree_bytes(path: Path, skip: Sequence[str] = ()) -> int:
+    """Apparent size of the files under `path`, not following symlinks, without the top-level `skip` entries."""
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        if dirpath == str(path):
+            dirnames[:] = [d for d in dirnames if d not in skip]
+            filenames = [f for f in filenames if f not in skip]
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                continue
+    return total
@@ -0,0 +1,213 @@
+"""
+ShardedTestRunner: Test Files Split Across a Shared CPU Budget
+
+A single `npm test` per evaluation lets the runner pick its own
+parallelism, so several sandboxes evaluated at once oversubscribe the
+CPU. The runner instead:
+
+  - splits the test files into shards, balanced by file size (largest
+    first onto the lightest shard),
+  - leases one core per shard from a CpuBudget shared by every active
+    sandbox in the process; a run gets as many shards as there are free
+    cores (at least one, waiting if none are free),
+  - runs each shard as `<command> <worker_args> <path_args> <files...>`
+    in parallel; path_args defaults to Jest's `--runTestsByPath`, since
+    Jest otherwise reads the files as regexes (`a.test.js` also matches
+    `data.test.js`) and runs a test in every shard whose pattern hits it,
+  - merges the shard outputs into the single test_results payload
+    ({exit_code, stdout, stderr, success}). Jest `--json` reports are
+    combined into one report (counts summed, testResults concatenated).
+
+Runs whose arguments cannot be split (e.g. Jest --findRelatedTests) use
+one core and one process.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from .affected_tests import is_test_file
+    from .output_parser import iter_json_objects
+except ImportError:
+    from affected_tests import is_test_file
+    from output_parser import iter_json_objects
+
+
+class CpuBudget:
+    """Counting lease on CPU cores, shared by every sandbox evaluating at once."""
+
+    def __init__(self, cores: Optional[int] = None):
+        self.cores = max(1, cores or os.cpu_count() or 1)
+        self.in_use = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def acquire(self, wanted: int) -> int:
+        """Block until a core is free; return how many (1..wanted) were granted."""
+        with self._cond:
+            while self.in_use >= self.cores:
+                self._cond.wait()
+            granted = max(1, min(wanted, self.cores - self.in_use))
+            self.in_use += granted
+            self.peak = max(self.peak, self.in_use)
+            return granted
+
+    def release(self, cores: int) -> None:
+        with self._cond:
+            self.in_use -= cores
+            self._cond.notify_all()
+
+
+class ShardedTestRunner:
+    """
+    Runs one evaluation's tests as parallel shards within a CpuBudget.
+
+    Usage:
+        runner = ShardedTestRunner(CpuBudget(), worker_args=['--maxWorkers=1'])
+        payload = runner.run(sandbox_dir, ['npm', 'test', '--', '--silent', '--json'])
+    """
+
+    def __init__(
+        self,
+        budget: CpuBudget,
+        max_shards: Optional[int] = None,
+        worker_args: Sequence[str] = (),
+        path_args: Sequence[str] = ('--runTestsByPath',)
+    ):
+        self.budget = budget
+        self.max_shards = max_shards
+        # Keeps each shard's runner to one process, e.g. ['--maxWorkers=1'] for Jest
+        self.worker_args = list(worker_args)
+        # Makes the runner read shard files as exact paths, not patterns
+        self.path_args = list(path_args)
+        self.runs = 0
+        self.shards_run = 0
+        self.seconds = 0.0
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def run(
+        self,
+        project_dir: Path,
+        command: List[str],
+        extra_args: Sequence[str] = (),
+        timeout: float = 120
+    ) -> Dict[str, Any]:
+        """
+        Run the tests for one evaluation and return the merged payload.
+
+        `extra_args` are test files (from affected-test selection) or
+        runner options; empty means every test file in the project.
+        Raises subprocess.TimeoutExpired if any shard exceeds `timeout`.
+        """
+        if extra_args and any(arg.startswith('-') for arg in extra_args):
+            files: List[str] = []
+        else:
+            files = list(extra_args) or discover_test_files(project_dir)
+
+        wanted = min(len(files), self.max_shards or len(files)) if files else 1
+        granted = self.budget.acquire(wanted)
+        started = time.monotonic()
+        try:
+            if files:
+                shards = split_shards(project_dir, files, granted)
+                commands = [command + self.worker_args + self.path_args + shard for shard in shards]
+            else:
+                commands = [command + list(extra_args)]
+            with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+                results = list(pool.map(
+                    lambda args: subprocess.run(
+                        args, cwd=project_dir, capture_output=True, text=True, timeout=timeout
+                    ),
+                    commands
+                ))
+        finally:
+            self.budget.release(granted)
+            self.seconds += time.monotonic() - started
+        self.runs += 1
+        self.shards_run += len(results)
+        return merge_results(results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'cores': self.budget.cores,
+            'peak_cores_in_use': self.budget.peak,
+            'runs': self.runs,
+            'shards': self.shards_run,
+            'seconds': round(self.seconds, 3)
+        }
+
+
+def discover_test_files(project_dir: Path) -> List[str]:
+    listing = subprocess.run(
+        ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+        cwd=project_dir, capture_output=True, text=True, check=False
+    ).stdout
+    return sorted(p for p in listing.split("\0") if p and is_test_file(p))
+
+
+def split_shards(project_dir: Path, files: Sequence[str], count: int) -> List[List[str]]:
+    """Longest-processing-time split, using file size as the duration estimate."""
+    def size(path: str) -> int:
+        try:
+            return (project_dir / path).stat().st_size
+        except OSError:
+            return 0
+
+    count = max(1, min(count, len(files)))
+    shards: List[List[str]] = [[] for _ in range(count)]
+    loads = [0] * count
+    for path in sorted(files, key=size, reverse=True):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(path)
+        loads[lightest] += size(path) or 1
+    return [sorted(shard) for shard in shards]
+
+
+def merge_results(results: Sequence[subprocess.CompletedProcess]) -> Dict[str, Any]:
+    """Combine shard processes into one {exit_code, stdout, stderr, success} payload."""
+    exit_code = next((r.returncode for r in results if r.returncode != 0), 0)
+    reports = [_jest_report(r.stdout) for r in results]
+    if len(results) > 1 and all(reports):
+        stdout = json.dumps(merge_jest_reports(reports))
+    else:
+        stdout = "\n".join(r.stdout for r in results)
+    return {
+        'exit_code': exit_code,
+        'stdout': stdout,
+        'stderr': "\n".join(r.stderr for r in results if r.stderr),
+        'success': exit_code == 0,
+        'shards': len(results)
+    }
+
+
+def merge_jest_reports(reports: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {'success': all(r.get('success', False) for r in reports), 'testResults': []}
+    for report in reports:
+        for key, value in report.items():
+            if key.startswith('num') and isinstance(value, int):
+                merged[key] = merged.get(key, 0) + value
+        merged['testResults'].extend(report.get('testResults', []))
+    starts = [r['startTime'] for r in reports if isinstance(r.get('startTime'), (int, float))]
+    if starts:
+        merged['startTime'] = min(starts)
+    return merged
+
+
+def _jest_report(stdout: str) -> Optional[Dict[str, Any]]:
+    """The Jest --json report in `stdout` (npm may print a banner before it)."""
+    report = None
+    for obj, _, _ in iter_json_objects(stdout):
+        if isinstance(obj, dict) and 'numTotalTests' in obj:
+            report = obj
+    return report
@@ -0,0 +1,323 @@
+"""
+StaticChecker: Syntax/Type Pre-Check Before the Full Test Suite
+
+Many failing candidates die on a SyntaxError that the metric only saw
+after a complete `npm test`. The checker runs cheap per-file checks on the
+files a patch touches, inside the sandbox after the patch is applied, and
+stops the evaluation at the first failing check with its diagnostics as
+feedback.
+
+Checks run cheapest first (by `cost`). The defaults are:
+
+  - json:  parse touched .json files (in process); tsconfig/jsconfig,
+           .eslintrc.json and editor settings are read as JSONC (comments
+           and trailing commas allowed),
+  - node:  `node --check` on touched .js/.cjs/.mjs files, unless the
+           project transpiles JavaScript (a Babel config, a "babel" key in
+           package.json, .flowconfig, or a "jsx" compiler option): JSX
+           and Flow are valid there but not to node,
+  - tsc:   incremental `tsc --noEmit` when the project has a tsconfig.json;
+           only diagnostics in touched files count, so errors that already
+           exist elsewhere in the project do not reject a candidate.
+
+Projects override the list with `.static_checks.json` in the repo root:
+
+    {"checks": [{"name": "eslint", "command": ["npx", "--no-install", "eslint", "{files}"],
+                 "extensions": [".js"], "cost": 5}]}
+
+`{files}` expands to the touched files, `{file}` runs the command once per
+file. An empty list disables the stage. A check whose tool is missing
+(not on PATH, or for `npx --no-install`, not in node_modules/.bin) is
+skipped rather than failed.
+"""
+
+import json
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Per-project override, next to the skills registry index
+CONFIG_FILE = ".static_checks.json"
+
+# Incremental tsc state; SandboxPool keeps it between leases
+TSC_BUILD_INFO = ".ouroboros.tsbuildinfo"
+
+_PATCH_TARGET = re.compile(r'^\+\+\+ (?:b/)?(\S+)', re.MULTILINE)
+
+MAX_DIAGNOSTIC_CHARS = 1500
+
+# Files whose presence means .js may contain JSX or Flow
+_TRANSPILER_CONFIGS = (
+    ".babelrc", ".babelrc.json", ".babelrc.js", ".babelrc.cjs", ".babelrc.mjs",
+    "babel.config.js", "babel.config.json", "babel.config.cjs", "babel.config.mjs",
+    ".flowconfig",
+)
+
+# JSON files that tools read with comments and trailing commas allowed
+_JSONC_NAMES = re.compile(r'^(?:tsconfig|jsconfig)(?:\..+)?\.json$|^\.eslintrc\.json$')
+_JSONC_DIRS = (".vscode", ".devcontainer")
+
+
+class StaticCheckFailed(Exception):
+    """Raised inside a sandbox to end an evaluation before the test suite."""
+
+    def __init__(self, feedback: str, seconds: float):
+        super().__init__(feedback)
+        self.feedback = feedback
+        self.seconds = seconds
+
+
+def touched_files(patch: str) -> List[str]:
+    """Files a unified diff leaves in place (added or modified), in patch order."""
+    files = []
+    for path in _PATCH_TARGET.findall(patch or ""):
+        if path != "/dev/null" and path not in files:
+            files.append(path)
+    return files
+
+
+def is_jsonc(path: str) -> bool:
+    """Whether `path` is a JSON-with-comments file (tsconfig and friends)."""
+    parts = Path(path).parts
+    return bool(_JSONC_NAMES.match(parts[-1])) or any(d in parts[:-1] for d in _JSONC_DIRS)
+
+
+def strip_jsonc(text: str) -> str:
+    """Remove comments and trailing commas outside strings, leaving plain JSON."""
+    out: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':
+            # Copy the string, honouring escapes
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == '\\' else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+            continue
+        if text.startswith('//', i):
+            i = text.find('\n', i)
+            i = n if i == -1 else i
+            continue
+        if text.startswith('/*', i):
+            i = text.find('*/', i + 2)
+            i = n if i == -1 else i + 2
+            continue
+        if c in '}]':
+            # Drop a comma separated from the bracket only by whitespace (comments are already gone)
+            k = len(out) - 1
+            while k >= 0 and out[k].isspace():
+                k -= 1
+            if k >= 0 and out[k] == ',':
+                del out[k]
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def transpiles_js(project_dir: Path) -> bool:
+    """Whether the project compiles its .js files (Babel/Flow/JSX), so node cannot check them."""
+    if any((project_dir / name).exists() for name in _TRANSPILER_CONFIGS):
+        return True
+    try:
+        if 'babel' in json.loads((project_dir / "package.json").read_text(encoding='utf-8')):
+            return True
+    except (OSError, ValueError):
+        pass
+    for name in ("jsconfig.json", "tsconfig.json"):
+        try:
+            config = json.loads(strip_jsonc((project_dir / name).read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+        if isinstance(config, dict) and 'jsx' in (config.get('compilerOptions') or {}):
+            return True
+    return False
+
+
+class StaticCheck:
+    """One pre-check: a command (or the built-in JSON parser) over matching files."""
+
+    def __init__(
+        self,
+        name: str,
+        extensions: Sequence[str],
+        command: Optional[Sequence[str]] = None,
+        cost: float = 1.0,
+        filter_to_files: bool = False,
+        requires: Optional[str] = None,
+        timeout: float = 60.0,
+        skip_if: Optional[Callable[[Path], bool]] = None
+    ):
+        self.name = name
+        self.extensions = tuple(extensions)
+        # None = built-in JSON parse
+        self.command = list(command) if command else None
+        self.cost = cost
+        # Only fail on diagnostics that mention a touched file (project-wide tools)
+        self.filter_to_files = filter_to_files
+        # Only run when this file exists in the project (e.g. tsconfig.json)
+        self.requires = requires
+        self.timeout = timeout
+        # Project-level reason the check would reject valid files
+        self.skip_if = skip_if
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "StaticCheck":
+        return cls(
+            name=config['name'],
+            extensions=config.get('extensions', []),
+            command=config.get('command'),
+            cost=config.get('cost', 1.0),
+            filter_to_files=config.get('filter_to_files', False),
+            requires=config.get('requires'),
+            timeout=config.get('timeout', 60.0)
+        )
+
+    def select(self, project_dir: Path, files: Sequence[str]) -> List[str]:
+        if self.requires and not (project_dir / self.requires).exists():
+            return []
+        if self.skip_if is not None and self.skip_if(project_dir):
+            return []
+        return [f for f in files if f.endswith(self.extensions) and (project_dir / f).is_file()]
+
+    def available(self, project_dir: Path) -> bool:
+        """Whether the check's tool is installed (npx --no-install would otherwise go to the registry)."""
+        if self.command is None:
+            return True
+        if Path(self.command[0]).name == "npx":
+            tool = next((arg for arg in self.command[1:] if not arg.startswith("-")), None)
+            return tool is not None and (project_dir / "node_modules" / ".bin" / tool).exists()
+        return shutil.which(self.command[0]) is not None
+
+    def run(self, project_dir: Path, files: List[str]) -> Optional[str]:
+        """Return diagnostics if the check fails, None if it passes or cannot run."""
+        if self.command is None:
+            return self._check_json(project_dir, files)
+        if any("{file}" in arg for arg in self.command):
+            invocations = [[arg.replace("{file}", f) for arg in self.command] for f in files]
+        else:
+            invocations = [self._expand(files)]
+
+        failures = []
+        for args in invocations:
+            try:
+                result = subprocess.run(
+                    args, cwd=project_dir, capture_output=True, text=True, timeout=self.timeout
+                )
+            except (FileNotFoundError, subprocess.TimeoutExpired):
+                return None
+            if result.returncode == 0:
+                continue
+            output = (result.stdout + "\n" + result.stderr).strip()
+            if self.filter_to_files:
+                output = "\n".join(
+                    line for line in output.splitlines() if any(line.startswith(f) for f in files)
+                )
+            if output:
+                failures.append(output)
+        return "\n".join(failures) or None
+
+    def _expand(self, files: List[str]) -> List[str]:
+        args = []
+        for arg in self.command:
+            if arg == "{files}":
+                args.extend(files)
+            else:
+                args.append(arg)
+        return args
+
+    @staticmethod
+    def _check_json(project_dir: Path, files: List[str]) -> Optional[str]:
+        errors = []
+        for f in files:
+            try:
+                text = (project_dir / f).read_text(encoding='utf-8')
+                json.loads(strip_jsonc(text) if is_jsonc(f) else text)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                errors.append(f"{f}: {e}")
+        return "\n".join(errors) or None
+
+
+DEFAULT_CHECKS = (
+    StaticCheck("json", extensions=[".json"], cost=0),
+    StaticCheck("node --check", extensions=[".js", ".cjs", ".mjs"],
+                command=["node", "--check", "{file}"], cost=1, skip_if=transpiles_js),
+    StaticCheck("tsc --noEmit", extensions=[".ts", ".tsx", ".mts", ".cts"],
+                command=["npx", "--no-install", "tsc", "--noEmit", "--incremental",
+                         "--tsBuildInfoFile", TSC_BUILD_INFO, "--pretty", "false"],
+                cost=10, filter_to_files=True, requires="tsconfig.json", timeout=300),
+)
+
+
+class StaticChecker:
+    """
+    Ordered pre-check stage for a sandbox with a patch applied.
+
+    Usage:
+        checker = StaticChecker.for_project(repo_root)
+        feedback = checker.run(sandbox_dir, code_patch)   # None = go on to npm test
+    """
+
+    def __init__(self, checks: Sequence[StaticCheck] = DEFAULT_CHECKS):
+        self.checks = sorted(checks, key=lambda c: c.cost)
+        self.runs = 0
+        self.failures = 0
+        self.seconds = 0.0
+        # Checks skipped because their tool is not installed
+        self.unavailable: List[str] = []
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @classmethod
+    def for_project(cls, repo_root: Path) -> "StaticChecker":
+        """Checks from `.static_checks.json` if the project has one, else the defaults."""
+        config_path = Path(repo_root) / CONFIG_FILE
+        if not config_path.exists():
+            return cls()
+        config = json.loads(config_path.read_text(encoding='utf-8'))
+        return cls([StaticCheck.from_config(c) for c in config.get('checks', [])])
+
+    def run(self, project_dir: Path, code_patch: str) -> Optional[str]:
+        """Return feedback from the first failing check, or None if all pass."""
+        files = touched_files(code_patch)
+        if not files or not self.checks:
+            return None
+        started = time.monotonic()
+        self.runs += 1
+        try:
+            for check in self.checks:
+                selected = check.select(project_dir, files)
+                if not selected:
+                    continue
+                if not check.available(project_dir):
+                    if check.name not in self.unavailable:
+                        self.unavailable.append(check.name)
+                    continue
+                diagnostics = check.run(project_dir, selected)
+                if diagnostics:
+                    self.failures += 1
+                    if len(diagnostics) > MAX_DIAGNOSTIC_CHARS:
+                        diagnostics = diagnostics[:MAX_DIAGNOSTIC_CHARS] + "\n..."
+                    return (
+                        f"[STATIC] {check.name} failed before running tests "
+                        f"({len(selected)} file(s) checked):\n{diagnostics}\n"
+                        "→ GEMINI.md should enforce: 'Re-read every edited file for valid "
+                        "syntax and types before finishing.'"
+                    )
+            return None
+        finally:
+            self.seconds += time.monotonic() - started
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'checks': [c.name for c in self.checks],
+            'runs': self.runs,
+            'failures': self.failures,
+            'unavailable': list(self.unavailable),
+            'seconds': round(self.seconds, 3)
+        }
@@ -0,0 +1,198 @@
+"""
+StreamMonitor: Incremental Consumption of Gemini CLI stdout
+
+Instead of buffering the whole CLI output with communicate(), the
+executor feeds stdout chunks to a StreamMonitor as they arrive. The
+monitor:
+  - reassembles assistant text from `--output-format stream-json` events
+    (plain `json`/`text` output is passed through unchanged) and collects
+    `error` events so quota errors stay visible to the retry logic,
+  - reports completion as soon as a full JSON object carrying `code_patch`
+    has been received, so the process can be stopped early,
+  - enforces a byte cap so runaway generations are killed instead of
+    consuming memory until the timeout.
+
+Completion is detected by a structural scanner that only looks at the
+newly received text: it tracks string/escape state and brace depth, and
+only decodes an object when a closing brace encloses the patch key. Each
+character is scanned once, so monitoring stays linear in the output size.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+# Characters that change the scanner state: braces, quotes and escapes
+_STRUCTURAL = re.compile(r'[{}"\\]')
+
+
+class StreamMonitor:
+    """
+    Accumulates CLI stdout and decides when reading can stop.
+
+    Usage:
+        monitor = StreamMonitor(output_format="stream-json", max_bytes=8 * 1024 * 1024)
+        for chunk in chunks:
+            monitor.feed(chunk)
+            if monitor.complete or monitor.over_limit:
+                break
+        text = monitor.output()
+    """
+
+    def __init__(
+        self,
+        output_format: str = "json",
+        max_bytes: Optional[int] = None,
+        stop_on_patch: bool = True,
+        patch_key: str = "code_patch"
+    ):
+        self.output_format = output_format
+        self.max_bytes = max_bytes
+        self.stop_on_patch = stop_on_patch
+        self.patch_key = patch_key
+
+        self.bytes_read = 0
+        self.complete = False
+        self.over_limit = False
+        # Error events reported in stream-json output (e.g. quota exhausted)
+        self.errors: List[str] = []
+
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending_line = b""
+        self._text_parts: List[str] = []
+        self._events = 0
+
+        # Scanner state, in absolute offsets into text()
+        self._length = 0
+        self._tail = ""
+        self._key_pos: Optional[int] = None
+        self._in_string = False
+        self._skip = -1
+        self._starts: List[int] = []
+
+    @property
+    def streaming(self) -> bool:
+        return self.output_format == "stream-json"
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.bytes_read += len(chunk)
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            self.over_limit = True
+            # Keep what fits under the cap for the trace
+            chunk = chunk[:max(0, len(chunk) - (self.bytes_read - self.max_bytes))]
+
+        if self.streaming:
+            text = self._feed_events(chunk)
+        else:
+            text = self._decoder.decode(chunk)
+        if not text:
+            return
+        self._text_parts.append(text)
+
+        if self.stop_on_patch and not self.complete:
+            self._scan(text)
+        self._length += len(text)
+        self._tail = (self._tail + text)[-len(self.patch_key):]
+
+    def text(self) -> str:
+        """Assistant text received so far."""
+        if len(self._text_parts) > 1:
+            self._text_parts = ["".join(self._text_parts)]
+        return self._text_parts[0] if self._text_parts else ""
+
+    def output(self) -> str:
+        """stdout as the adapter's parsers expect it."""
+        return self.text()
+
+    def status(self, termination: str) -> Dict[str, Any]:
+        return {
+            'termination': termination,
+            'bytes_read': self.bytes_read,
+            'events': self._events,
+            'errors': len(self.errors),
+            'complete': self.complete,
+            'over_limit': self.over_limit
+        }
+
+    def _feed_events(self, chunk: bytes) -> str:
+        data = self._pending_line + chunk
+        *lines, self._pending_line = data.split(b"\n")
+        parts = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self._events += 1
+            if isinstance(event, dict) and (event.get('type') == 'error' or 'error' in event):
+                error = event.get('error', event)
+                self.errors.append(error if isinstance(error, str) else json.dumps(error))
+            parts.append(self._event_text(event))
+        return "".join(parts)
+
+    @staticmethod
+    def _event_text(event: Any) -> str:
+        if not isinstance(event, dict):
+            return ""
+        if event.get('role', 'assistant') != 'assistant':
+            return ""
+        content = event.get('content')
+        return content if isinstance(content, str) else ""
+
+    def _scan(self, text: str) -> None:
+        """Advance the structural scanner over newly received `text`."""
+        base = self._length
+        window = self._tail + text
+        key_positions = []
+        found = window.find(self.patch_key)
+        while found >= 0:
+            key_positions.append(base - len(self._tail) + found)
+            found = window.find(self.patch_key, found + 1)
+        next_key = 0
+
+        for match in _STRUCTURAL.finditer(text):
+            pos = base + match.start()
+            char = match.group()
+            # Most recent key occurrence before this character
+            while next_key < len(key_positions) and key_positions[next_key] < pos:
+                self._key_pos = key_positions[next_key]
+                next_key += 1
+            if pos == self._skip:
+                continue
+            if self._in_string:
+                if char == '\\':
+                    self._skip = pos + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                # Quotes only delimit strings inside an object; prose may hold stray ones
+                self._in_string = bool(self._starts)
+            elif char == '{':
+                self._starts.append(pos)
+            elif char == '}' and self._starts:
+                start = self._starts.pop()
+                if self._key_pos is not None and start < self._key_pos < pos:
+                    if self._has_complete_patch(start):
+                        self.complete = True
+                        return
+
+    def _has_complete_patch(self, start: int) -> bool:
+        """True if the object starting at `start` decodes and holds the patch key."""
+        try:
+            obj, _ = json.JSONDecoder().raw_decode(self.text(), start)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(obj, dict):
+            return False
+        if self.patch_key in obj:
+            return True
+        # CLI envelope: {"response": "<model text with the patch>", ...}
+        response = obj.get('response')
+        return isinstance(response, str) and self.patch_key in response
@@ -0,0 +1,180 @@
+"""
+SuiteCache: Persistent Cache of Test-Suite Results
+
+Low-temperature models frequently emit exactly the same `code_patch` for
+a story, and every such rollout used to pay a full `npm test` run
+(30-120s). SuiteCache stores the test result JSON in a SQLite database
+under .dspy_cache, keyed by:
+
+  - the tree hash the tests ran against (HEAD^{tree}, plus a digest of
+    uncommitted and untracked changes when testing a live working tree),
+  - the normalized patch (CRLF, trailing whitespace and `index` lines
+    do not change the key),
+  - the test command.
+
+Only completed runs are cached; timeouts and sandbox failures are retried.
+Entries are evicted least-recently-used once the cache exceeds max_bytes.
+"""
+
+import hashlib
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+class SuiteCache:
+    """
+    SQLite-backed (tree, patch, command) -> test result cache.
+
+    Usage:
+        cache = SuiteCache(Path(".dspy_cache/test_results.sqlite"))
+        key = cache.make_key(tree_hash(repo_root), code_patch, command)
+        result = cache.get(key)
+        if result is None:
+            result = run_tests()
+            cache.put(key, result)
+    """
+
+    def __init__(self, db_path: Path, max_bytes: Optional[int] = 256 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            str(self.db_path), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def normalize_patch(patch: str) -> str:
+        """Canonical form of a patch: LF endings, no trailing whitespace, no `index` lines."""
+        lines = []
+        for line in (patch or "").replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            if line.startswith("index "):
+                continue
+            lines.append(line.rstrip())
+        return "\n".join(lines).strip("\n")
+
+    @classmethod
+    def make_key(cls, tree: str, patch: str, command: Sequence[str]) -> str:
+        payload = json.dumps([tree, cls.normalize_patch(patch), list(command)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached test result JSON for `key`, or None on a miss."""
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, result: str) -> None:
+        if self._conn is None:
+            return
+        size = len(result.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, result, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        entries, total_bytes = 0, 0
+        if self._conn is not None:
+            with self._lock:
+                entries, total_bytes = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'bytes': total_bytes
+        }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _evict(self) -> None:
+        """Drop least-recently-accessed rows until under max_bytes."""
+        if self.max_bytes is None:
+            return
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        if total <= self.max_bytes:
+            return
+        victims: List[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", [(k,) for k in victims])
+
+
+def tree_hash(
+    repo_root: Path,
+    include_worktree: bool = False,
+    exclude: Sequence[str] = (".dspy_cache", ".gemini")
+) -> Optional[str]:
+    """
+    Identify the code a test run sees.
+
+    HEAD^{tree} for a clean checkout; with `include_worktree`, also folds in
+    uncommitted changes and untracked (non-ignored) files outside `exclude`
+    (optimizer state that changes every rollout). Returns None outside a
+    git repository or before the first commit.
+    """
+    def git(*args: str, stdin: Optional[bytes] = None) -> bytes:
+        return subprocess.run(
+            ['git', *args], cwd=repo_root, input=stdin, capture_output=True, check=True, timeout=60
+        ).stdout
+
+    try:
+        head = git('rev-parse', 'HEAD^{tree}').strip()
+        if not include_worktree:
+            return head.decode('ascii')
+        pathspec = ['--', '.', *(f':(exclude){path}' for path in exclude)]
+        digest = hashlib.sha256(head)
+        digest.update(git('diff', 'HEAD', '--binary', *pathspec))
+        untracked = git('ls-files', '--others', '--exclude-standard', '-z', *pathspec)
+        if untracked:
+            paths = untracked.rstrip(b"\0").split(b"\0")
+            digest.update(untracked)
+            digest.update(git('hash-object', '--stdin-paths', stdin=b"\n".join(paths) + b"\n"))
+        return digest.hexdigest()
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return None
@@ -67,7 +67,10 @@ def metric(tmp_repo):
 def adapter(tmp_repo):
     """Create GeminiSkillAdapter instance."""
     from optimizer.gemini_adapter import GeminiSkillAdapter
-    return GeminiSkillAdapter(repo_root=tmp_repo)
+    adapter = GeminiSkillAdapter(repo_root=tmp_repo)
+    yield adapter
+    adapter.executor.close()
+    adapter.trace_store.close()
 
 
 # ============================================================================
@@ -171,6 +174,53 @@ class TestBMadImplementationMetric:
         
         assert result.score == 1.0
         assert "passed" in result.feedback.lower()
+    
+    def test_precheck_rejects_doomed_patches_without_sandbox(self, metric, tmp_repo):
+        """Verify empty and non-applying patches fail fast with structured feedback."""
+        import subprocess
+        subprocess.run(['git', 'add', '-A'], cwd=tmp_repo, check=True, capture_output=True)
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'c'],
+                       cwd=tmp_repo, check=True, capture_output=True)
+        
+        stale = ("--- a/package.json\n+++ b/package.json\n@@ -1 +1 @@\n"
+                 "-{\"scripts\": {}}\n+{}\n")
+        added = "--- /dev/null\n+++ b/new.js\n@@ -0,0 +1 @@\n+module.exports = 1;\n"
+        
+        assert "Empty patch" in metric.precheck_patch("  \n")
+        assert "does not apply" in metric.precheck_patch(stale)
+        assert "does not apply" in metric.precheck_patch("Sure! I implemented the feature.")
+        assert metric.precheck_patch(added) is None
+        
+        success, log = metric.execute_in_sandbox(stale, "doomed")
+        worktrees = subprocess.run(['git', 'worktree', 'list'], cwd=tmp_repo,
+                                   capture_output=True, text=True).stdout
+        assert success is False
+        assert log.startswith("[PATCH]")
+        assert len(worktrees.splitlines()) == 1
+        assert metric.rejected_patches == 3
+    
+    def test_sandbox_mode_scores_the_patch_in_a_worktree(self, tmp_repo):
+        """Verify sandbox mode ignores the rollout's test results and tests the patch itself."""
+        import subprocess
+        from optimizer.metric import BMadImplementationMetric
+        subprocess.run(['git', 'add', '-A'], cwd=tmp_repo, check=True, capture_output=True)
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'c'],
+                       cwd=tmp_repo, check=True, capture_output=True)
+        metric = BMadImplementationMetric(repo_root=tmp_repo, sandbox_mode=True)
+        example = dspy.Example(story_context="Test story")
+        prediction = Mock()
+        prediction.test_results = json.dumps({'success': False, 'stderr': 'stale', 'stdout': ''})
+        prediction.execution_trace = {'rollout_id': 'r1'}
+        
+        prediction.code_patch = "--- /dev/null\n+++ b/new.js\n@@ -0,0 +1 @@\n+module.exports = 1;\n"
+        assert metric(example, prediction).score == 1.0
+        assert len(metric.resource_usage) == 1
+        
+        prediction.code_patch = "Sure! I implemented the feature."
+        result = metric(example, prediction)
+        assert result.score == 0.0
+        assert result.feedback.startswith("[PATCH] Patch does not apply")
+        assert metric.rejected_patches == 1
 
 
 # ============================================================================
@@ -273,6 +323,1610 @@ class TestGeminiSkillAdapter:
         assert "GEMINI.md" in prompt
 
 
+# ============================================================================
+# RolloutExecutor Tests
+# ============================================================================
+
+class TestRolloutExecutor:
+    """Test suite for bounded-concurrency rollout execution."""
+    
+    def test_gather_respects_concurrency_limit(self):
+        """Verify no more than `concurrency` rollouts run at once."""
+        import asyncio
+        from optimizer.rollout_executor import RolloutExecutor
+        
+        executor = RolloutExecutor(concurrency=2)
+        state = {'active': 0, 'peak': 0}
+        
+        async def rollout(i):
+            async with executor.slot():
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+                await asyncio.sleep(0.02)
+                state['active'] -= 1
+                return i
+        
+        results = executor.gather([rollout(i) for i in range(6)])
+        executor.close()
+        
+        assert results == list(range(6))
+        assert state['peak'] == 2
+    
+    def test_run_process_timeout_raises_timeout_expired(self):
+        """Verify async subprocess timeouts surface as subprocess.TimeoutExpired."""
+        import subprocess
+        from optimizer.rollout_executor import RolloutExecutor
+        
+        executor = RolloutExecutor(concurrency=1)
+        with pytest.raises(subprocess.TimeoutExpired):
+            executor.run(executor.run_process(['sleep', '5'], timeout=0.1))
+        
+        result = executor.run(executor.run_process(['echo', 'hello'], timeout=5))
+        executor.close()
+        
+        assert result.returncode == 0
+        assert result.stdout.strip() == "hello"
+    
+    def test_deepcopy_shares_executor(self):
+        """Verify optimizer program copies share one concurrency bound."""
+        import copy
+        from optimizer.rollout_executor import RolloutExecutor
+        
+        executor = RolloutExecutor(concurrency=3)
+        assert copy.deepcopy(executor) is executor
+        executor.close()
+
+
+# ============================================================================
+# ContextStore Tests
+# ============================================================================
+
+class TestContextStore:
+    """Test suite for content-addressed rollout context directories."""
+    
+    def test_identical_content_materialized_once(self, tmp_path):
+        """Verify the same instruction maps to one immutable directory."""
+        from optimizer.context_store import ContextStore
+        
+        store = ContextStore(tmp_path / "contexts")
+        first = store.acquire("# Candidate A")
+        mtime = (first / "GEMINI.md").stat().st_mtime_ns
+        second = store.acquire("# Candidate A")
+        
+        assert first == second
+        assert (first / "GEMINI.md").read_text() == "# Candidate A"
+        assert (second / "GEMINI.md").stat().st_mtime_ns == mtime
+    
+    def test_distinct_candidates_are_isolated(self, tmp_path):
+        """Verify concurrent candidates never share a context file."""
+        from optimizer.context_store import ContextStore
+        
+        store = ContextStore(tmp_path / "contexts")
+        with store.lease("# Candidate A") as dir_a, store.lease("# Candidate B") as dir_b:
+            assert dir_a != dir_b
+            assert (dir_a / "GEMINI.md").read_text() == "# Candidate A"
+            assert (dir_b / "GEMINI.md").read_text() == "# Candidate B"
+    
+    def test_evicts_only_unreferenced_entries(self, tmp_path):
+        """Verify LRU eviction skips directories still leased by a rollout."""
+        from optimizer.context_store import ContextStore
+        
+        store = ContextStore(tmp_path / "contexts", max_entries=1)
+        held = store.acquire("# Held")
+        with store.lease("# Transient") as transient:
+            pass
+        
+        assert held.exists()
+        assert not transient.exists()
+        assert store.stats() == {'entries': 1, 'leased': 1}
+
+
+# ============================================================================
+# ResponseCache Tests
+# ============================================================================
+
+class TestResponseCache:
+    """Test suite for the persistent Gemini response cache."""
+    
+    @staticmethod
+    def _result(stdout, returncode=0):
+        import subprocess
+        return subprocess.CompletedProcess(['gemini'], returncode, stdout, '')
+    
+    def test_round_trip_across_instances(self, tmp_path):
+        """Verify responses persist on disk and are keyed by all inputs."""
+        from optimizer.response_cache import ResponseCache
+        
+        db = tmp_path / "responses.sqlite"
+        key = ResponseCache.make_key("instr", "prompt", "gemini-pro", "json")
+        writer = ResponseCache(db, mode="readwrite")
+        writer.put(key, self._result('{"code_patch": "x"}'))
+        writer.close()
+        
+        reader = ResponseCache(db, mode="read")
+        hit = reader.get(key)
+        
+        assert hit.stdout == '{"code_patch": "x"}'
+        assert hit.returncode == 0
+        assert reader.get(ResponseCache.make_key("instr", "prompt", "gemini-flash", "json")) is None
+        assert reader.stats()['hits'] == 1
+    
+    def test_modes_control_reads_and_writes(self, tmp_path):
+        """Verify read mode never writes and replay mode raises on misses."""
+        from optimizer.response_cache import ResponseCache, CacheMissError
+        
+        db = tmp_path / "responses.sqlite"
+        ResponseCache(db, mode="read").put("k", self._result("out"))
+        ResponseCache(db, mode="readwrite").put("failed", self._result("err", returncode=1))
+        
+        with pytest.raises(CacheMissError):
+            ResponseCache(db, mode="replay").get("k")
+        with pytest.raises(CacheMissError):
+            ResponseCache(db, mode="replay").get("failed")
+        assert ResponseCache(db, mode="off").get("k") is None
+    
+    def test_ttl_and_size_eviction(self, tmp_path):
+        """Verify expired entries are dropped and size stays under budget."""
+        from optimizer.response_cache import ResponseCache
+        
+        expiring = ResponseCache(tmp_path / "ttl.sqlite", ttl_seconds=0.01)
+        expiring.put("k", self._result("out"))
+        time.sleep(0.05)
+        assert expiring.get("k") is None
+        
+        bounded = ResponseCache(tmp_path / "size.sqlite", max_bytes=250)
+        for i in range(5):
+            bounded.put(f"k{i}", self._result("x" * 100))
+        
+        assert bounded.stats()['bytes'] <= 250
+        assert bounded.get("k4") is not None
+        assert bounded.get("k0") is None
+    
+    def test_replay_miss_propagates_from_adapter(self, tmp_repo):
+        """Verify a replay miss aborts the rollout instead of scoring it as empty."""
+        from optimizer.gemini_adapter import GeminiSkillAdapter
+        from optimizer.response_cache import CacheMissError
+        
+        adapter = GeminiSkillAdapter(repo_root=tmp_repo, cache_mode="replay")
+        try:
+            with pytest.raises(CacheMissError):
+                adapter.forward("story", "Node 18")
+        finally:
+            adapter.executor.close()
+
+
+# ============================================================================
+# WorkerPool Tests
+# ============================================================================
+
+class TestWorkerPool:
+    """Test suite for pre-warmed CLI worker processes."""
+    
+    @staticmethod
+    def _fake_cli(tmp_path, name, body):
+        import sys
+        script = tmp_path / name
+        script.write_text(f"#!{sys.executable}\nimport sys\n{body}\n")
+        script.chmod(0o755)
+        return str(script)
+    
+    def test_reuses_prewarmed_process_for_stdin_binaries(self, tmp_path):
+        """Verify requests are answered by warm workers once the pool is primed."""
+        from optimizer.worker_pool import WorkerPool
+        
+        cli = self._fake_cli(tmp_path, "stdin_cli", "print('echo:' + sys.stdin.read())")
+        pool = WorkerPool(size=1)
+        
+        first = pool.run([cli, "--output-format", "json"], "hello", timeout=10)
+        second = pool.run([cli, "--output-format", "json"], "again", timeout=10)
+        stats = pool.stats()
+        pool.close()
+        
+        assert first.stdout.strip() == "echo:hello"
+        assert second.stdout.strip() == "echo:again"
+        assert pool.supported is True
+        assert stats['warm_hits'] == 1
+    
+    def test_falls_back_to_spawn_per_call(self, tmp_path):
+        """Verify binaries that need -p transparently fall back."""
+        from optimizer.worker_pool import WorkerPool
+        
+        cli = self._fake_cli(
+            tmp_path, "flag_cli",
+            "if '-p' not in sys.argv: sys.exit(1)\nprint('flag:' + sys.argv[sys.argv.index('-p') + 1])"
+        )
+        pool = WorkerPool(size=2)
+        
+        first = pool.run([cli], "hello", timeout=10)
+        second = pool.run([cli], "again", timeout=10)
+        
+        assert first.stdout.strip() == "flag:hello"
+        assert second.stdout.strip() == "flag:again"
+        assert pool.supported is False
+        assert pool.stats()['idle'] == 0
+    
+    def test_quota_error_on_probe_is_not_resent(self, tmp_path):
+        """Verify a 429 on the first stdin request does not trigger a paid -p retry."""
+        from optimizer.worker_pool import WorkerPool
+        
+        calls = tmp_path / "calls.log"
+        cli = self._fake_cli(
+            tmp_path, "limited_cli",
+            f"open({str(calls)!r}, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"
+            "sys.stdin.read()\nsys.stderr.write('429 RESOURCE_EXHAUSTED')\nsys.exit(1)"
+        )
+        pool = WorkerPool(size=1)
+        
+        result = pool.run([cli], "hello", timeout=10)
+        stats = pool.stats()
+        pool.close()
+        
+        assert result.returncode == 1
+        assert "-p" not in calls.read_text()
+        assert pool.supported is True
+        assert stats['requests'] == 1 and stats['hit_rate'] == 0.0
+
+
+# ============================================================================
+# SharedRateLimiter Tests
+# ============================================================================
+
+class TestSharedRateLimiter:
+    """Test suite for the cross-process token-bucket limiter."""
+    
+    def test_bucket_state_is_shared_between_instances(self, tmp_path):
+        """Verify two limiters on the same file draw from one quota."""
+        from optimizer.rate_limiter import SharedRateLimiter
+        
+        state = tmp_path / "rate_limit.json"
+        first = SharedRateLimiter(state, requests_per_minute=60, burst_seconds=2)
+        second = SharedRateLimiter(state, requests_per_minute=60, burst_seconds=2)
+        
+        assert first._try_take(1) == 0.0
+        assert second._try_take(1) == 0.0
+        assert first._try_take(1) > 0.5
+    
+    def test_token_bucket_limits_large_prompts(self, tmp_path):
+        """Verify the TPM bucket delays requests that exceed remaining tokens."""
+        from optimizer.rate_limiter import SharedRateLimiter, estimate_tokens
+        
+        limiter = SharedRateLimiter(
+            tmp_path / "rate_limit.json",
+            requests_per_minute=600,
+            tokens_per_minute=6000,
+            burst_seconds=1
+        )
+        
+        assert estimate_tokens("x" * 400) == 100
+        assert limiter._try_take(100) == 0.0
+        assert limiter._try_take(100) > 0.9
+    
+    def test_penalize_starts_shared_cooldown(self, tmp_path):
+        """Verify a 429 seen by one process makes every process wait."""
+        from optimizer.rate_limiter import SharedRateLimiter
+        
+        state = tmp_path / "rate_limit.json"
+        SharedRateLimiter(state, requests_per_minute=60, penalty_seconds=5).penalize()
+        other = SharedRateLimiter(state, requests_per_minute=60)
+        
+        assert other._try_take(1) > 5
+        assert other.snapshot()['penalties'] == 1
+    
+    def test_token_only_quota(self, tmp_path):
+        """Verify a TPM-only limiter works without a request bucket."""
+        from optimizer.rate_limiter import SharedRateLimiter
+        
+        limiter = SharedRateLimiter(
+            tmp_path / "rate_limit.json",
+            requests_per_minute=None,
+            tokens_per_minute=6000,
+            burst_seconds=1
+        )
+        
+        assert limiter._try_take(100) == 0.0
+        assert limiter._try_take(100) > 0.9
+        with pytest.raises(ValueError):
+            SharedRateLimiter(tmp_path / "none.json", requests_per_minute=None)
+    
+    def test_adapter_penalizes_final_transient_attempt(self, tmp_repo, tmp_path):
+        """Verify a 429 on the last retry still starts the shared cool-down."""
+        import sys
+        from optimizer.gemini_adapter import GeminiSkillAdapter
+        from optimizer.rate_limiter import SharedRateLimiter
+        
+        cli = tmp_path / "limited_cli"
+        cli.write_text(f"#!{sys.executable}\nprint('429 RESOURCE_EXHAUSTED')\n")
+        cli.chmod(0o755)
+        limiter = SharedRateLimiter(tmp_path / "rate_limit.json", requests_per_minute=600)
+        adapter = GeminiSkillAdapter(gemini_binary=str(cli), repo_root=tmp_repo, max_retries=0, rate_limiter=limiter)
+        try:
+            adapter.forward("story", "Node 18")
+        finally:
+            adapter.executor.close()
+        
+        assert limiter.snapshot()['penalties'] == 1
+
+
+# ============================================================================
+# AIMDController Tests
+# ============================================================================
+
+class TestAIMDController:
+    """Test suite for adaptive rollout concurrency."""
+    
+    def test_additive_increase_multiplicative_decrease(self):
+        """Verify the window grows ~1 per window of successes and halves on 429."""
+        from optimizer.concurrency_controller import AIMDController
+        
+        controller = AIMDController(min_window=1, max_window=8)
+        for _ in range(10):
+            controller.on_success(latency=1.0)
+        grown = controller.window
+        controller.on_congestion("rate_limit")
+        
+        assert 4 <= grown <= 5
+        assert controller.window == pytest.approx(grown / 2)
+        assert controller.metrics()['congestion_events'] == 1
+        assert controller.history()[-1]['event'] == "rate_limit"
+    
+    def test_window_is_bounded_and_respects_latency_target(self):
+        """Verify min/max bounds and that slow calls stop growth."""
+        from optimizer.concurrency_controller import AIMDController
+        
+        controller = AIMDController(min_window=2, max_window=3, latency_target=5.0)
+        for _ in range(50):
+            controller.on_success(latency=1.0)
+        assert controller.limit == 3
+        
+        for _ in range(5):
+            controller.on_congestion("timeout")
+        assert controller.limit == 2
+        
+        controller.on_success(latency=30.0)
+        assert controller.window == 2.0
+    
+    def test_one_cut_per_window_of_completions(self):
+        """Verify a burst of 429s from one congestion episode cuts the window once."""
+        from optimizer.concurrency_controller import AIMDController
+        
+        controller = AIMDController(min_window=1, max_window=8, initial_window=8)
+        for _ in range(4):
+            controller.on_congestion("rate_limit")
+        assert controller.window == 4.0
+        
+        for _ in range(4):
+            controller.on_success(latency=1.0)
+        grown = controller.window
+        controller.on_congestion("rate_limit")
+        
+        assert controller.window == pytest.approx(grown / 2)
+        assert controller.metrics()['suppressed_congestion_events'] == 3
+    
+    def test_executor_follows_controller_window(self):
+        """Verify the executor admits as many rollouts as the current window."""
+        import asyncio
+        from optimizer.concurrency_controller import AIMDController
+        from optimizer.rollout_executor import RolloutExecutor
+        
+        controller = AIMDController(min_window=1, max_window=4, initial_window=3)
+        executor = RolloutExecutor(concurrency=4, controller=controller)
+        state = {'active': 0, 'peak': 0}
+        
+        async def rollout():
+            async with executor.slot():
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+                await asyncio.sleep(0.02)
+                state['active'] -= 1
+        
+        executor.gather([rollout() for _ in range(8)])
+        executor.close()
+        
+        assert state['peak'] == 3
+
+
+# ============================================================================
+# Streaming Output Tests
+# ============================================================================
+
+class TestStreamingOutput:
+    """Test suite for incremental stdout consumption."""
+    
+    def test_monitor_reassembles_stream_json_and_detects_patch(self):
+        """Verify stream-json deltas are joined and completion is detected."""
+        from optimizer.stream_reader import StreamMonitor
+        
+        events = [
+            {"type": "init", "session_id": "abc"},
+            {"type": "message", "role": "user", "content": "ignored prompt"},
+            {"type": "message", "role": "assistant", "content": '{"reasoning": "plan", ', "delta": True},
+            {"type": "message", "role": "assistant", "content": '"code_patch": "diff --git"}', "delta": True},
+        ]
+        monitor = StreamMonitor(output_format="stream-json")
+        payload = "".join(json.dumps(e) + "\n" for e in events).encode()
+        
+        monitor.feed(payload[:40])
+        assert not monitor.complete
+        monitor.feed(payload[40:])
+        
+        assert monitor.complete
+        assert json.loads(monitor.output()) == {"reasoning": "plan", "code_patch": "diff --git"}
+    
+    def test_monitor_detects_patch_inside_cli_envelope(self):
+        """Verify the {"response": ...} envelope counts once fully received."""
+        from optimizer.stream_reader import StreamMonitor
+        
+        envelope = json.dumps({"response": json.dumps({"code_patch": "x"}), "stats": {}}).encode()
+        monitor = StreamMonitor(output_format="json")
+        monitor.feed(envelope[:-5])
+        assert not monitor.complete
+        monitor.feed(envelope[-5:])
+        assert monitor.complete
+    
+    def test_monitor_ignores_key_mentioned_in_prose(self):
+        """Verify a key named in prose before the JSON does not hide the real object."""
+        from optimizer.stream_reader import StreamMonitor
+        
+        text = 'I will put the code_patch {in braces} below.\n```json\n{"code_patch": "a}b"}\n```'
+        monitor = StreamMonitor(output_format="json")
+        for i in range(0, len(text), 7):
+            monitor.feed(text[i:i + 7].encode())
+        
+        assert monitor.complete
+        assert monitor.output() == text
+    
+    def test_monitor_scans_large_output_in_linear_time(self):
+        """Verify many small chunks of brace-heavy output are not rescanned."""
+        from optimizer.stream_reader import StreamMonitor
+        
+        body = "function f() { return {a: 1}; }\n" * 60_000
+        payload = json.dumps({"reasoning": body, "code_patch": body}).encode()
+        monitor = StreamMonitor(output_format="json")
+        
+        start = time.perf_counter()
+        for i in range(0, len(payload), 4096):
+            monitor.feed(payload[i:i + 4096])
+        
+        assert monitor.complete
+        assert time.perf_counter() - start < 5
+    
+    def test_stream_json_error_events_reach_stderr(self):
+        """Verify a 429 reported as a stream-json event is seen as transient."""
+        import sys
+        from optimizer.rate_limiter import is_transient_error
+        from optimizer.rollout_executor import RolloutExecutor
+        from optimizer.stream_reader import StreamMonitor
+        
+        event = json.dumps({"type": "error", "error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}})
+        executor = RolloutExecutor()
+        result = executor.run(executor.run_process(
+            [sys.executable, "-c", f"print({event!r})"], timeout=20,
+            monitor=StreamMonitor(output_format="stream-json")
+        ))
+        executor.close()
+        
+        assert result.stdout == ""
+        assert is_transient_error(result.stderr, result.stdout)
+        assert result.stream['errors'] == 1
+    
+    def test_executor_stops_early_and_enforces_byte_cap(self):
+        """Verify early termination on a complete patch and the cap on runaway output."""
+        import sys
+        from optimizer.rollout_executor import RolloutExecutor
+        from optimizer.stream_reader import StreamMonitor
+        
+        # Both children exit on their own, so nothing depends on when the kill lands
+        executor = RolloutExecutor()
+        early = "import json, sys\nprint(json.dumps({'code_patch': 'p'}), flush=True)\nsys.exit(3)"
+        result = executor.run(executor.run_process(
+            [sys.executable, "-c", early], timeout=60, monitor=StreamMonitor()
+        ))
+        assert result.returncode == 0
+        assert result.stream['termination'] == "complete"
+        
+        runaway = "import sys\nsys.stdout.write('x' * 300_000)\nsys.exit(1)"
+        capped = executor.run(executor.run_process(
+            [sys.executable, "-c", runaway], timeout=60, monitor=StreamMonitor(max_bytes=100_000)
+        ))
+        executor.close()
+        
+        assert capped.stream['termination'] == "output_cap"
+        assert len(capped.stdout) == 100_000
+        assert capped.returncode != 0
+
+
+# ============================================================================
+# OutputParser Tests
+# ============================================================================
+
+class TestOutputParser:
+    """Test suite for single-pass CLI response decoding."""
+    
+    def test_finds_fenced_json_after_prose(self):
+        """Verify fences anywhere in the text are decoded, not only at the start."""
+        from optimizer.output_parser import parse_cli_output
+        
+        stdout = 'I will fix this.\n```json\n{"reasoning": "plan", "code_patch": "diff --git a/x b/x"}\n```\nDone.'
+        parsed = parse_cli_output(stdout)
+        
+        assert parsed.reasoning == "plan"
+        assert parsed.code_patch == "diff --git a/x b/x"
+    
+    def test_unwraps_cli_envelope(self):
+        """Verify the {"response": ..., "stats": ...} envelope is removed."""
+        from optimizer.output_parser import parse_cli_output
+        
+        inner = '```json\n' + json.dumps({"reasoning": "r", "code_patch": "p"}) + '\n```'
+        parsed = parse_cli_output(json.dumps({"response": inner, "stats": {"tokens": 12}}))
+        
+        assert parsed.code_patch == "p"
+        assert parsed.stats == {"tokens": 12}
+    
+    def test_never_returns_raw_stdout_as_patch(self):
+        """Verify unstructured output yields no patch, while bare diffs are kept."""
+        from optimizer.gemini_adapter import GeminiSkillAdapter
+        adapter = GeminiSkillAdapter.__new__(GeminiSkillAdapter)
+        
+        assert adapter._extract_code_changes("Sorry, I cannot help with that.") == ""
+        diff = "diff --git a/a.js b/a.js\n+1\n"
+        assert adapter._extract_code_changes(f"Here you go:\n```diff\n{diff}```") == diff
+    
+    def test_bare_diff_stops_at_trailing_prose(self):
+        """Verify a bare diff is cut at the first line that is not part of it."""
+        from optimizer.output_parser import parse_cli_output
+        
+        diff = "diff --git a/a.js b/a.js\n--- a/a.js\n+++ b/a.js\n@@ -1 +1 @@\n-old\n+new\n"
+        parsed = parse_cli_output(f"Patch:\n{diff}Let me know if this helps.\n")
+        
+        assert parsed.code_patch == diff
+    
+    def test_handles_multi_megabyte_output(self):
+        """Verify large responses with brace-heavy prose decode correctly."""
+        from optimizer.output_parser import parse_cli_output
+        
+        prose = "function f() { return {a: 1}; }\n" * 100_000
+        patch = "+line\n" * 200_000
+        stdout = prose + json.dumps({"reasoning": "big", "code_patch": patch})
+        
+        start = time.perf_counter()
+        parsed = parse_cli_output(stdout)
+        
+        assert parsed.code_patch == patch
+        assert time.perf_counter() - start < 5
+
+
+# ============================================================================
+# DemoPacker Tests
+# ============================================================================
+
+class TestDemoPacker:
+    """Test suite for token-budgeted demonstration packing."""
+    
+    def test_fills_budget_in_relevance_order(self):
+        """Verify demos are kept in order, skipped when they no longer fit, and long solutions elided."""
+        from optimizer.demo_packer import DemoPacker
+        from optimizer.rate_limiter import estimate_tokens
+        
+        demos = [
+            dspy.Example(story_context="Most relevant", code_patch="\n".join(f"line {i}" for i in range(2000))),
+            dspy.Example(story_context="Too big " * 400, code_patch="x"),
+            dspy.Example(story_context="Small", code_patch="return 1;"),
+        ]
+        section = DemoPacker(token_budget=600, max_solution_tokens=400).pack(demos)
+        
+        assert section.index("Most relevant") < section.index("Small")
+        assert "Too big" not in section
+        assert "lines /" in section and "line 1999" in section
+        assert estimate_tokens(section) <= 600
+    
+    def test_rendered_section_is_cached_per_demo_set(self, adapter):
+        """Verify the same demo set is rendered once and reused by _prepare_prompt."""
+        demos = [dspy.Example(story_context="Add login", code_patch="router.post('/login')")]
+        
+        first = adapter._prepare_prompt("story", "Node 18", demos)
+        second = adapter._prepare_prompt("other story", "Node 18", demos)
+        
+        assert "### Example 1" in first and "router.post" in second
+        assert adapter.demo_packer.stats()['cache_hits'] == 1
+
+
+# ============================================================================
+# TraceStore Tests
+# ============================================================================
+
+class TestTraceStore:
+    """Test suite for the append-only JSONL trace store."""
+    
+    def test_rotates_compresses_and_reads_back(self, tmp_path):
+        """Verify traces survive rotation into gzip segments and are found via the index."""
+        from optimizer.trace_store import TraceStore
+        
+        store = TraceStore(tmp_path / "traces", segment_max_bytes=300)
+        for i in range(10):
+            store.append({'rollout_id': f"r{i}", 'code_patch': "x" * 50})
+        store.close()
+        
+        reader = TraceStore(tmp_path / "traces")
+        assert list((tmp_path / "traces").glob("*.jsonl.gz"))
+        assert reader.get("r7")['code_patch'] == "x" * 50
+        assert reader.get("missing") is None
+        assert [t['rollout_id'] for t in reader.iter_traces()] == [f"r{i}" for i in range(10)]
+    
+    def test_migration_feeds_retrospective(self, tmp_path):
+        """Verify legacy trace files are imported once and read back by retrospective."""
+        from optimizer.retrospective import run_retrospective
+        from optimizer.trace_store import TraceStore, migrate_json_dir
+        
+        legacy = tmp_path / "trace_logs"
+        legacy.mkdir()
+        (legacy / "good.json").write_text(json.dumps({
+            'success': True,
+            'story_context': "Add login",
+            'code_patch': "router.post('/login', handler)",
+            'test_results': json.dumps({'success': True})
+        }))
+        (legacy / "broken.json").write_text("{not json")
+        
+        store = TraceStore(tmp_path / "traces")
+        assert migrate_json_dir(legacy, store, remove_source=True) == 1
+        store.close()
+        
+        assert not (legacy / "good.json").exists()
+        assert (legacy / "broken.json").exists()
+        generated = run_retrospective(tmp_path / "traces", "backend", tmp_path / "examples", min_score=0.5)
+        assert [Path(p).name for p in generated] == ["good_golden.example.md"]
+
+
+# ============================================================================
+# SuiteCache Tests
+# ============================================================================
+
+class TestSuiteCache:
+    """Test suite for the (tree, patch, command) test result cache."""
+    
+    def test_key_normalization_and_eviction(self, tmp_path):
+        """Verify cosmetic patch differences share a key and size stays bounded."""
+        from optimizer.suite_cache import SuiteCache
+        
+        command = ['npm', 'test']
+        patch_lf = "diff --git a/x b/x\nindex 123..456 100644\n+a\n"
+        patch_crlf = "diff --git a/x b/x\r\nindex abc..def 100644\r\n+a  \r\n"
+        assert SuiteCache.make_key("t", patch_lf, command) == SuiteCache.make_key("t", patch_crlf, command)
+        assert SuiteCache.make_key("t", patch_lf, command) != SuiteCache.make_key("u", patch_lf, command)
+        
+        cache = SuiteCache(tmp_path / "tests.sqlite", max_bytes=250)
+        try:
+            for i in range(5):
+                cache.put(f"k{i}", "x" * 100)
+            assert cache.get("k4") == "x" * 100
+            assert cache.get("k0") is None
+            stats = cache.stats()
+            assert stats['bytes'] <= 250
+            assert (stats['hits'], stats['misses']) == (1, 1)
+        finally:
+            cache.close()
+    
+    def test_adapter_reuses_result_until_tree_changes(self, tmp_repo):
+        """Verify a repeated patch skips npm test and an edit to the tree does not."""
+        import subprocess
+        from optimizer.gemini_adapter import GeminiSkillAdapter
+        from optimizer.suite_cache import SuiteCache
+        
+        subprocess.run(['git', 'add', '-A'], cwd=tmp_repo, check=True, capture_output=True)
+        subprocess.run(
+            ['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-m', 'init'],
+            cwd=tmp_repo, check=True, capture_output=True
+        )
+        cache = SuiteCache(tmp_repo / ".dspy_cache" / "test_results.sqlite")
+        adapter = GeminiSkillAdapter(repo_root=tmp_repo, test_cache=cache)
+        try:
+            first = adapter._run_tests("+a")
+            assert adapter._run_tests("+a") == first
+            assert cache.stats()['hits'] == 1
+            
+            (tmp_repo / "index.js").write_text("module.exports = 1;\n")
+            adapter._run_tests("+a")
+            assert cache.stats()['hits'] == 1
+        finally:
+            adapter.executor.close()
+            adapter.trace_store.close()
+            cache.close()
+
+
+# ============================================================================
+# SandboxPool Tests
+# ============================================================================
+
+class TestSandboxPool:
+    """Test suite for reusable worktree sandboxes."""
+    
+    @staticmethod
+    def _commit(repo):
+        import subprocess
+        subprocess.run(['git', 'add', '-A'], cwd=repo, check=True, capture_output=True)
+        subprocess.run(
+            ['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'c'],
+            cwd=repo, check=True, capture_output=True
+        )
+    
+    def test_lease_resets_between_uses(self, tmp_repo, tmp_path):
+        """Verify sandboxes are reused, cleaned, keep node_modules and follow HEAD."""
+        from optimizer.sandbox_pool import SandboxPool
+        
+        self._commit(tmp_repo)
+        pool = SandboxPool(tmp_repo, size=1, root=tmp_path / "sandboxes", ram_root=None)
+        try:
+            with pool.lease() as sandbox:
+                (sandbox / "package.json").write_text("{}")
+                (sandbox / "scratch.js").write_text("x")
+                (sandbox / "node_modules").mkdir()
+            
+            (tmp_repo / "new.js").write_text("y")
+            self._commit(tmp_repo)
+            with pool.lease() as again:
+                assert again == sandbox
+                assert "echo PASS" in (again / "package.json").read_text()
+                assert not (again / "scratch.js").exists()
+                assert (again / "node_modules").is_dir()
+                assert (again / "new.js").exists()
+            assert pool.stats()['created'] == 1
+        finally:
+            pool.close()
+        assert not sandbox.exists()
+    
+    def test_recovers_stale_worktrees(self, tmp_repo, tmp_path):
+        """Verify worktrees left by a dead pool or an old evaluation are pruned, live ones are not."""
+        import os
+        import subprocess
+        import tempfile
+        import uuid
+        from optimizer.sandbox_pool import SandboxPool
+        
+        self._commit(tmp_repo)
+        root = tmp_path / "sandboxes"
+        live = SandboxPool(tmp_repo, size=1, root=root, ram_root=None)
+        with live.lease():
+            pass
+        stale = root.resolve() / "ouroboros_7"
+        # Per-evaluation worktrees of a process running without a pool
+        temp = Path(tempfile.gettempdir()).resolve()
+        running, abandoned = (temp / f"ouroboros_{kind}_{uuid.uuid4().hex}" for kind in ("running", "abandoned"))
+        for path in (stale, running, abandoned):
+            subprocess.run(['git', 'worktree', 'add', '--detach', str(path)], cwd=tmp_repo,
+                           check=True, capture_output=True)
+        old = time.time() - SandboxPool.LEGACY_MAX_AGE - 60
+        os.utime(abandoned, (old, old))
+        
+        recovering = SandboxPool(tmp_repo, size=1, root=root, ram_root=None)
+        try:
+            assert recovering.recovered == 2
+            assert not stale.exists() and not abandoned.exists()
+            assert running.exists()
+            assert (root / "ouroboros_0").exists()
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', str(running)], cwd=tmp_repo,
+                           capture_output=True)
+            recovering.close()
+            live.close()
+    
+    def test_prefers_ram_root_and_falls_back_to_disk(self, tmp_repo, tmp_path):
+        """Verify placement follows free memory and timings are reported per placement."""
+        from optimizer.sandbox_pool import SandboxPool
+        
+        self._commit(tmp_repo)
+        pool = SandboxPool(tmp_repo, size=1, root=tmp_path / "disk", ram_root=tmp_path / "ram",
+                           ram_reserve_bytes=0)
+        try:
+            with pool.lease() as first:
+                assert pool.placement(first) == "ram"
+                # Shared dependencies are not counted towards the sandbox size
+                (first / "node_modules").mkdir()
+                (first / "node_modules" / "big.js").write_bytes(b"x" * (1 << 20))
+            assert 0 < pool.stats()['sandbox_bytes'] < (1 << 20)
+            
+            # Simulated memory pressure: the RAM sandbox is retired after its lease
+            pool.ram_reserve_bytes = 1 << 62
+            with pool.lease() as same:
+                assert same == first
+            with pool.lease() as moved:
+                assert pool.placement(moved) == "disk"
+            
+            placements = pool.stats()['placements']
+            assert placements['ram']['leases'] == 2
+            assert placements['disk']['leases'] == 1
+            assert set(placements['disk']) == {'leases', 'checkout_seconds', 'test_seconds'}
+            assert pool.stats()['sandbox_bytes'] > 0
+        finally:
+            pool.close()
+    
+    def test_metric_uses_pool(self, tmp_repo, tmp_path):
+        """Verify execute_in_sandbox applies the patch in a leased sandbox."""
+        from optimizer.metric import BMadImplementationMetric
+        from optimizer.sandbox_pool import SandboxPool
+        
+        self._commit(tmp_repo)
+        pool = SandboxPool(tmp_repo, size=1, root=tmp_path / "sandboxes", ram_root=None)
+        metric = BMadImplementationMetric(repo_root=tmp_repo, sandbox_pool=pool)
+        patch = "--- /dev/null\n+++ b/added.js\n@@ -0,0 +1 @@\n+module.exports = 1;\n"
+        try:
+            assert metric.execute_in_sandbox(patch, "r1")[0] is True
+            assert metric.execute_in_sandbox(patch, "r2")[0] is True
+            assert pool.stats()['created'] == 1
+        finally:
+            pool.close()
+
+
+# ============================================================================
+# DependencyCache Tests
+# ============================================================================
+
+class TestDependencyCache:
+    """Test suite for shared node_modules across sandboxes."""
+    
+    # Stands in for `npm ci`: records each install in the cache directory
+    INSTALL_SCRIPT = (
+        "import os; os.makedirs('node_modules/dep', exist_ok=True); "
+        "open('node_modules/dep/index.js', 'w').write('module.exports = 1')"
+    )
+    
+    def test_installs_once_per_manifest(self, tmp_path):
+        """Verify sandboxes share one install and a new manifest builds another."""
+        import sys
+        from optimizer.dependency_cache import DependencyCache
+        
+        deps = DependencyCache(tmp_path / "deps", install_command=[sys.executable, "-c", self.INSTALL_SCRIPT])
+        sandboxes = []
+        for name in ("a", "b"):
+            sandbox = tmp_path / name
+            sandbox.mkdir()
+            (sandbox / "package.json").write_text('{"dependencies": {"dep": "1"}}')
+            assert deps.prepare(sandbox) == "linked"
+            sandboxes.append(sandbox)
+        
+        assert (sandboxes[1] / "node_modules" / "dep" / "index.js").exists()
+        assert (sandboxes[0] / "node_modules").resolve() == (sandboxes[1] / "node_modules").resolve()
+        assert deps.stats()['builds'] == 1
+        
+        (sandboxes[0] / "package.json").write_text('{"dependencies": {"dep": "2"}}')
+        deps.prepare(sandboxes[0])
+        assert deps.stats()['builds'] == 2
+        assert (sandboxes[0] / "node_modules").resolve() != (sandboxes[1] / "node_modules").resolve()
+    
+    def test_manifest_patch_installs_in_sandbox(self, tmp_path):
+        """Verify a patch editing package.json gets a private install."""
+        import sys
+        from optimizer.dependency_cache import DependencyCache, patch_touches_manifest
+        
+        patch = "--- a/package.json\n+++ b/package.json\n@@ -1 +1 @@\n-{}\n+{\"x\": 1}\n"
+        assert patch_touches_manifest(patch)
+        assert not patch_touches_manifest("--- a/src/package.json.md\n+++ b/src/package.json.md\n")
+        
+        deps = DependencyCache(tmp_path / "deps", mode="hardlink",
+                               install_command=[sys.executable, "-c", self.INSTALL_SCRIPT])
+        sandbox = tmp_path / "s"
+        sandbox.mkdir()
+        (sandbox / "package.json").write_text("{}")
+        assert deps.prepare(sandbox) == "linked"
+        assert not (sandbox / "node_modules").is_symlink()
+        assert deps.prepare(sandbox, patch) == "installed"
+        assert not (sandbox / "node_modules" / DependencyCache.MARKER).exists()
+        assert deps.stats() == {'builds': 1, 'reuses': 0, 'sandbox_installs': 1}
+
+
+# ============================================================================
+# StaticChecker Tests
+# ============================================================================
+
+class TestStaticChecker:
+    """Test suite for the syntax/type pre-check stage."""
+    
+    @staticmethod
+    def _added(path, line):
+        return f"--- /dev/null\n+++ b/{path}\n@@ -0,0 +1 @@\n+{line}\n"
+    
+    def test_default_checks_reject_touched_syntax_errors(self, tmp_path):
+        """Verify cheap checks run on touched files only and fail fast."""
+        from optimizer.static_check import StaticChecker
+        
+        (tmp_path / "bad.js").write_text("function (")
+        (tmp_path / "ok.js").write_text("module.exports = 1;")
+        (tmp_path / "bad.json").write_text("{")
+        checker = StaticChecker()
+        
+        assert checker.run(tmp_path, self._added("ok.js", "x")) is None
+        js = checker.run(tmp_path, self._added("bad.js", "x"))
+        assert js.startswith("[STATIC] node --check failed")
+        assert "SyntaxError" in js
+        
+        both = checker.run(tmp_path, self._added("bad.js", "x") + self._added("bad.json", "{"))
+        assert both.startswith("[STATIC] json failed")
+        assert checker.stats()['failures'] == 2
+    
+    def test_valid_project_dialects_are_not_rejected(self, tmp_path):
+        """Verify JSX under Babel, JSONC configs and missing tools never reject a candidate."""
+        from optimizer.static_check import StaticCheck, StaticChecker
+        
+        (tmp_path / "view.js").write_text("const a = () => <div/>;")
+        (tmp_path / "tsconfig.json").write_text('{\n  // strict mode\n  "compilerOptions": {"strict": true,},\n}')
+        checker = StaticChecker()
+        assert checker.run(tmp_path, self._added("view.js", "x")).startswith("[STATIC] node --check")
+        
+        (tmp_path / "babel.config.js").write_text("module.exports = {};")
+        assert checker.run(tmp_path, self._added("view.js", "x")) is None
+        assert checker.run(tmp_path, self._added("tsconfig.json", "x")) is None
+        
+        eslint = StaticCheck("eslint", extensions=[".js"], command=["npx", "--no-install", "eslint", "{files}"])
+        (tmp_path / "bad.js").write_text("function (")
+        missing = StaticChecker([eslint])
+        assert missing.run(tmp_path, self._added("bad.js", "x")) is None
+        assert missing.stats()['unavailable'] == ["eslint"]
+    
+    def test_project_config_and_file_filtering(self, tmp_path):
+        """Verify .static_checks.json replaces the defaults and filters project-wide output."""
+        import sys
+        from optimizer.static_check import StaticChecker
+        
+        tsc = "import sys; print('other.ts(1,1): error TS1: old'); print(sys.argv[1] + '(2,3): error TS2: new'); sys.exit(2)"
+        (tmp_path / ".static_checks.json").write_text(json.dumps({"checks": [{
+            "name": "fake-tsc", "extensions": [".ts"], "filter_to_files": True,
+            "command": [sys.executable, "-c", tsc, "{files}"]
+        }]}))
+        (tmp_path / "a.ts").write_text("let a = 1;")
+        checker = StaticChecker.for_project(tmp_path)
+        
+        feedback = checker.run(tmp_path, self._added("a.ts", "x"))
+        assert "a.ts(2,3): error TS2: new" in feedback
+        assert "other.ts" not in feedback
+        assert checker.run(tmp_path, self._added("a.js", "x")) is None
+        
+        (tmp_path / ".static_checks.json").write_text('{"checks": []}')
+        assert StaticChecker.for_project(tmp_path).run(tmp_path, self._added("a.ts", "x")) is None
+    
+    def test_metric_stops_before_npm_test(self, tmp_repo):
+        """Verify the metric reports diagnostics and records the rejection per rollout."""
+        import subprocess
+        from optimizer.metric import BMadImplementationMetric
+        from optimizer.static_check import StaticChecker
+        
+        subprocess.run(['git', 'add', '-A'], cwd=tmp_repo, check=True, capture_output=True)
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'c'],
+                       cwd=tmp_repo, check=True, capture_output=True)
+        metric = BMadImplementationMetric(repo_root=tmp_repo, static_checker=StaticChecker())
+        
+        assert metric.execute_in_sandbox(self._added("ok.js", "module.exports = 1;"), "r1")[0] is True
+        success, log = metric.execute_in_sandbox(self._added("broken.js", "const = ;"), "r2")
+        
+        assert success is False
+        assert log.startswith("[STATIC] node --check")
+        assert metric.static_rejections['rejections'] == 1
+        assert metric.static_rejections['saved_seconds'] > 0
+
+
+# ============================================================================
+# AffectedTestSelector Tests
+# ============================================================================
+
+class TestAffectedTestSelector:
+    """Test suite for import-graph test selection."""
+    
+    @staticmethod
+    def _project(repo):
+        import subprocess
+        files = {
+            "src/a.js": "module.exports = 1;",
+            "src/b.js": "const a = require('./a');",
+            "src/util.ts": "export const u = 1;",
+            "src/index.js": "export * from './b';",
+            "test/b.test.js": "const b = require('../src/b');",
+            "test/index.spec.js": "import '../src';",
+            "test/util.test.ts": "import { u } from '../src/util.js';",
+            "test/other.test.js": "require('assert');",
+        }
+        for path, content in files.items():
+            (repo / path).parent.mkdir(parents=True, exist_ok=True)
+            (repo / path).write_text(content)
+        subprocess.run(['git', 'add', '-A'], cwd=repo, check=True, capture_output=True)
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'c'],
+                       cwd=repo, check=True, capture_output=True)
+    
+    def test_selects_transitive_importers(self, tmp_repo):
+        """Verify changed sources map to the tests that reach them, else the full suite."""
+        from optimizer.affected_tests import AffectedTestSelector
+        
+        self._project(tmp_repo)
+        cache_dir = tmp_repo / ".dspy_cache" / "import_graph"
+        selector = AffectedTestSelector(cache_dir=cache_dir)
+        
+        assert selector.select(tmp_repo, ["src/a.js"]) == ["test/b.test.js", "test/index.spec.js"]
+        assert selector.select(tmp_repo, ["src/util.ts"]) == ["test/util.test.ts"]
+        assert selector.select(tmp_repo, ["package.json"]) is None
+        assert list(cache_dir.glob("*.json"))
+        
+        # A patch adding a new importer is seen through the overlay
+        (tmp_repo / "test/new.test.js").write_text("require('../src/a.js');")
+        assert "test/new.test.js" in AffectedTestSelector(cache_dir=cache_dir).select(
+            tmp_repo, ["src/a.js", "test/new.test.js"]
+        )
+    
+    def test_graph_ignores_an_earlier_candidates_edits(self, tmp_repo):
+        """Verify the cached graph is HEAD's, not whatever patch was on disk when it was built."""
+        import subprocess
+        from optimizer.affected_tests import AffectedTestSelector
+        
+        self._project(tmp_repo)
+        selector = AffectedTestSelector(cache_dir=tmp_repo / ".dspy_cache" / "import_graph")
+        
+        # First candidate drops b.js's import of a.js while the graph is built
+        (tmp_repo / "src/b.js").write_text("const a = 1;")
+        assert selector.select(tmp_repo, ["src/b.js"]) == ["test/b.test.js", "test/index.spec.js"]
+        subprocess.run(['git', 'checkout', '--', 'src/b.js'], cwd=tmp_repo, check=True, capture_output=True)
+        
+        # A later candidate touching a.js still reaches the tests through b.js
+        expected = ["test/b.test.js", "test/index.spec.js"]
+        assert selector.select(tmp_repo, ["src/a.js"]) == expected
+        assert AffectedTestSelector(cache_dir=tmp_repo / ".dspy_cache" / "import_graph").select(
+            tmp_repo, ["src/a.js"]
+        ) == expected
+    
+    def test_full_suite_rescore_bypasses_selection_and_memo(self, tmp_repo):
+        """Verify the final check tests the given patch on everything, outside the memo."""
+        from optimizer.affected_tests import AffectedTestSelector
+        from optimizer.metric import BMadImplementationMetric
+        from optimizer.metric_memo import MetricMemo
+        
+        self._project(tmp_repo)
+        selector = AffectedTestSelector()
+        memo = MetricMemo()
+        metric = BMadImplementationMetric(repo_root=tmp_repo, test_selector=selector, memo=memo)
+        patch = "--- /dev/null\n+++ b/test/c.test.js\n@@ -0,0 +1 @@\n+require('../src/a');\n"
+        
+        assert metric.evaluate_full_suite(dspy.Prediction(code_patch=patch)).score == 1.0
+        assert (selector.stats()['selected_runs'], selector.stats()['full_runs']) == (0, 0)
+        assert memo.stats()['hits'] + memo.stats()['misses'] == 0
+        
+        assert metric.execute_in_sandbox(patch, "subset")[0] is True
+        assert selector.stats()['selected_runs'] == 1
+    
+    def test_runner_args_and_adapter_command(self, tmp_repo):
+        """Verify the adapter passes selected tests to npm and falls back when disabled."""
+        from optimizer.affected_tests import AffectedTestSelector
+        from optimizer.gemini_adapter import GeminiSkillAdapter
+        
+        self._project(tmp_repo)
+        patch = "--- a/src/util.ts\n+++ b/src/util.ts\n@@ -1 +1 @@\n-x\n+y\n"
+        jest = AffectedTestSelector(mode="jest")
+        assert jest.runner_args(tmp_repo, patch) == ['--findRelatedTests', 'src/util.ts']
+        
+        selector = AffectedTestSelector()
+        adapter = GeminiSkillAdapter(repo_root=tmp_repo, test_selector=selector)
+        try:
+            assert "test/util.test.ts" in json.loads(adapter._run_tests(patch))['stdout']
+            selector.enabled = False
+            assert "test/" not in json.loads(adapter._run_tests(patch))['stdout']
+        finally:
+            adapter.executor.close()
+            adapter.trace_store.close()
+        assert selector.stats()['selected_runs'] == 1
+        assert selector.stats()['full_runs'] == 1
+
+
+# ============================================================================
+# ShardedTestRunner Tests
+# ============================================================================
+
+class TestShardedTestRunner:
+    """Test suite for sharded test execution under a shared CPU budget."""
+    
+    # Fake runner: a Jest-style --json report for the files it was given
+    REPORTER = (
+        "import json, sys, time; files = [a for a in sys.argv[1:] if not a.startswith('-')]; time.sleep(0.2); "
+        "failed = sum('fail' in f for f in files); "
+        "print('> pkg@1.0.0 test'); "
+        "print(json.dumps({'success': not failed, 'numTotalTests': len(files), 'numFailedTests': failed, "
+        "'testResults': [{'name': f} for f in files]})); sys.exit(1 if failed else 0)"
+    )
+    
+    def test_split_balances_by_size(self, tmp_path):
+        """Verify the largest files are spread across shards first."""
+        from optimizer.shard_runner import split_shards
+        
+        for name, size in {"a": 900, "b": 500, "c": 400, "d": 100}.items():
+            (tmp_path / f"{name}.test.js").write_text("x" * size)
+        shards = split_shards(tmp_path, [f"{n}.test.js" for n in "abcd"], 2)
+        
+        assert sorted(map(sorted, shards)) == [["a.test.js", "d.test.js"], ["b.test.js", "c.test.js"]]
+        assert split_shards(tmp_path, ["a.test.js"], 4) == [["a.test.js"]]
+    
+    def test_concurrent_runs_share_budget_and_merge_reports(self, tmp_path):
+        """Verify shards never exceed the budget and reports merge into one payload."""
+        import sys
+        from optimizer.shard_runner import CpuBudget, ShardedTestRunner
+        
+        files = [f"t{i}.test.js" for i in range(4)]
+        runner = ShardedTestRunner(CpuBudget(2), max_shards=4, worker_args=["--maxWorkers=1"])
+        command = [sys.executable, "-c", self.REPORTER]
+        
+        payloads = []
+        threads = [
+            threading.Thread(target=lambda: payloads.append(runner.run(tmp_path, command, files)))
+            for _ in range(2)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert runner.budget.peak <= 2
+        assert runner.budget.in_use == 0
+        for payload in payloads:
+            report = json.loads(payload['stdout'])
+            assert payload['success'] is True
+            assert report['numTotalTests'] == 4
+            assert sorted(r['name'] for r in report['testResults']) == files
+        
+        failing = runner.run(tmp_path, command, ["ok.test.js", "fail.test.js"])
+        assert failing['success'] is False
+        assert json.loads(failing['stdout'])['numFailedTests'] == 1
+
+    def test_shard_files_are_passed_as_exact_paths(self, tmp_path):
+        """Verify each shard's files follow --runTestsByPath, so Jest cannot match them as patterns."""
+        import sys
+        from optimizer.shard_runner import CpuBudget, ShardedTestRunner
+
+        echo = [sys.executable, "-c", "import sys; print(' '.join(sys.argv[1:]))"]
+        runner = ShardedTestRunner(CpuBudget(2), max_shards=2, worker_args=["--maxWorkers=1"])
+        payload = runner.run(tmp_path, echo, ["a.test.js", "data.test.js"])
+
+        assert sorted(filter(None, payload['stdout'].splitlines())) == [
+            "--maxWorkers=1 --runTestsByPath a.test.js",
+            "--maxWorkers=1 --runTestsByPath data.test.js"
+        ]
+        plain = ShardedTestRunner(CpuBudget(1), path_args=[])
+        assert plain.run(tmp_path, echo, ["a.test.js"])['stdout'].strip() == "a.test.js"
+
+
+# ============================================================================
+# RunnerDaemon Tests
+# ============================================================================
+
+class TestRunnerDaemon:
+    """Test suite for the warm per-sandbox test runner."""
+    
+    # Fake daemon speaking the jest_daemon.js protocol; RSS grows 100 bytes per run
+    SERVER = (
+        "import json, os, socket, sys\n"
+        "server = socket.socket(socket.AF_UNIX); server.bind(sys.argv[1]); server.listen()\n"
+        "runs = 0\n"
+        "while True:\n"
+        "    conn, _ = server.accept(); request = json.loads(conn.makefile().readline())\n"
+        "    files = request.get('argv', {}).get('_', [])\n"
+        "    if 'crash.test.js' in files: os._exit(1)\n"
+        "    runs += request['command'] == 'run'\n"
+        "    failed = sum('fail' in f for f in files)\n"
+        "    report = {'success': not failed, 'numTotalTests': len(files), 'pid': os.getpid(),\n"
+        "              'testResults': [{'name': f, 'message': 'boom' if 'fail' in f else ''} for f in files]}\n"
+        "    conn.sendall((json.dumps({'ok': True, 'results': report, 'rss': runs * 100}) + '\\n').encode())\n"
+        "    conn.close()\n"
+    )
+    
+    def _daemon(self, tmp_path, **kwargs):
+        import sys
+        from optimizer.runner_daemon import RunnerDaemon
+        
+        server = tmp_path / "fake_daemon.py"
+        server.write_text(self.SERVER)
+        return RunnerDaemon(tmp_path, command=[sys.executable, str(server)], **kwargs)
+    
+    def test_runs_stay_on_one_process_until_limits(self, tmp_path):
+        """Verify runs reuse the daemon and it is recycled on memory growth."""
+        daemon = self._daemon(tmp_path, max_rss_bytes=250)
+        try:
+            first = daemon.run(["a.test.js"])
+            second = daemon.run(["a.test.js", "b.fail.test.js"])
+            third = daemon.run(["--findRelatedTests", "src/a.js"])
+            
+            assert first['success'] is True and first['exit_code'] == 0
+            assert second['success'] is False and second['stderr'] == "boom"
+            assert json.loads(first['stdout'])['pid'] == json.loads(second['stdout'])['pid']
+            # Third run reported 300 bytes > 250: recycled before the next run
+            assert json.loads(third['stdout'])['numTotalTests'] == 1
+            assert daemon.starts == 1 and daemon.restarts == 1
+            daemon.run(["a.test.js"])
+            assert daemon.starts == 2
+        finally:
+            daemon.close()
+    
+    def test_restarts_after_crash_and_pool_falls_back(self, tmp_path):
+        """Verify a crashed daemon is restarted and an unusable one is reported."""
+        import sys
+        from optimizer.runner_daemon import RunnerDaemonError, RunnerDaemonPool, RunnerDaemonUnavailable
+        
+        daemon = self._daemon(tmp_path)
+        try:
+            with pytest.raises(RunnerDaemonError):
+                daemon.run(["crash.test.js"])
+            assert daemon.restarts == 2
+            assert daemon.run(["a.test.js"])['success'] is True
+        finally:
+            daemon.close()
+        
+        pool = RunnerDaemonPool(command=[sys.executable, "-c", "import sys; sys.exit(3)"])
+        for _ in range(2):
+            with pytest.raises(RunnerDaemonUnavailable):
+                pool.run(tmp_path, ["a.test.js"])
+        assert pool.stats()['starts'] == 1
+        pool.close()
+
+
+# ============================================================================
+# RunnerReport Tests
+# ============================================================================
+
+class TestRunnerReport:
+    """Test suite for per-test outcomes and fractional scoring."""
+    
+    JEST = {
+        'success': False, 'numTotalTests': 4,
+        'testResults': [
+            {'name': 'test/a.test.js', 'status': 'failed', 'assertionResults': [
+                {'fullName': 'a adds', 'status': 'passed', 'failureMessages': []},
+                {'fullName': 'a subtracts', 'status': 'failed',
+                 'failureMessages': ['Error: expect(received).toBe(expected)\nExpected: 1']},
+                {'fullName': 'a later', 'status': 'todo', 'failureMessages': []},
+            ]},
+            {'name': 'test/b.test.js', 'status': 'passed', 'assertionResults': [
+                {'fullName': 'b works', 'status': 'passed', 'failureMessages': []},
+                {'fullName': 'b also works', 'status': 'passed', 'failureMessages': []},
+            ]},
+            {'name': 'test/c.test.js', 'status': 'failed', 'assertionResults': [],
+             'message': "Cannot find module './c' from 'test/c.test.js'"},
+        ]
+    }
+    
+    def test_parses_jest_and_mocha_reports(self):
+        """Verify per-test outcomes, including files that failed to run."""
+        from optimizer.runner_report import parse_runner_report
+        
+        report = parse_runner_report("> pkg@1.0.0 test\n" + json.dumps(self.JEST))
+        assert (report.runner, report.passed, report.failed, report.skipped) == ("jest", 3, 2, 1)
+        assert report.pass_ratio() == pytest.approx(0.6)
+        assert report.pass_ratio(failure_weight=2.0) == pytest.approx(3 / 7)
+        assert report.failures()['a subtracts'].startswith("Error: expect")
+        assert "Cannot find module" in report.failures()['test/c.test.js']
+        
+        mocha = {
+            'stats': {'tests': 3, 'passes': 1, 'failures': 2},
+            'tests': [{'fullTitle': 'm one', 'file': 't.js'}, {'fullTitle': 'm two', 'file': 't.js'},
+                      {'fullTitle': 'm three', 'file': 't.js', 'pending': True}],
+            'failures': [{'fullTitle': 'm two', 'err': {'message': 'boom'}},
+                         {'fullTitle': '"before all" hook', 'err': {'message': 'setup'}}],
+            'pending': [{'fullTitle': 'm three'}]
+        }
+        report = parse_runner_report(json.dumps(mocha))
+        assert (report.runner, report.passed, report.failed, report.skipped) == ("mocha", 1, 2, 1)
+        assert report.failures() == {'m two': 'boom', '"before all" hook': 'setup'}
+        assert parse_runner_report("plain text output") is None
+    
+    def test_metric_scores_pass_ratio_or_binary(self, tmp_repo):
+        """Verify near-miss candidates outscore broken ones unless binary scoring is set."""
+        from optimizer.metric import BMadImplementationMetric
+        
+        prediction = Mock()
+        prediction.code_patch = ''
+        prediction.test_results = json.dumps({
+            'success': False, 'stderr': '', 'stdout': json.dumps(self.JEST)
+        })
+        example = dspy.Example(story_context="Test story")
+        
+        result = BMadImplementationMetric(repo_root=tmp_repo, scoring="ratio")(example, prediction)
+        assert result.score == pytest.approx(0.6)
+        assert set(result.failures) == {'a subtracts', 'test/c.test.js'}
+        assert result.feedback.startswith("[TESTS] 3/5 passed (jest); failing:")
+        
+        binary = BMadImplementationMetric(repo_root=tmp_repo)(example, prediction)
+        assert binary.score == 0.0
+        assert set(binary.failures) == {'a subtracts', 'test/c.test.js'}
+        
+        # Failing run whose report shows no failing test (e.g. coverage threshold)
+        prediction.test_results = json.dumps({
+            'success': False, 'stderr': 'coverage threshold not met',
+            'stdout': json.dumps({'success': True, 'numTotalTests': 0, 'testResults': []})
+        })
+        assert BMadImplementationMetric(repo_root=tmp_repo, scoring="ratio")(example, prediction).score == 0.0
+
+
+# ============================================================================
+# LogScanner Tests
+# ============================================================================
+
+class TestLogScanner:
+    """Test suite for single-pass error extraction from test logs."""
+    
+    def test_line_local_matches_and_limits(self):
+        """Verify categories, per-category limits and webpack's multi-line form."""
+        from optimizer.log_scanner import LogScanner
+        
+        log = "\n".join([
+            "TypeError: a is undefined",
+            "ReferenceError: foo is not defined; ReferenceError: bar is not defined",
+            "TypeError: b is undefined",
+            "Module build failed (from babel-loader):",
+            "  at parse (x.js:1:1)",
+            "SyntaxError: Unexpected token (3:4)",
+            "  12:5  error  Missing semicolon  semi",
+            "TypeError: c is undefined",
+        ])
+        found = LogScanner({'type_error': 2, 'undefined_variable': None}).scan(log)
+        
+        assert found['type_error'] == ["a is undefined", "b is undefined"]
+        assert found['undefined_variable'] == ["foo", "bar"]
+        assert found['webpack_error'] == ["Unexpected token (3:4)"]
+        assert found['eslint_error'] == [("12:5", "Missing semicolon", "semi")]
+        assert 'import_fail' not in found
+        assert LogScanner().scan("Module build failed\nno error line") == {}
+    
+    def test_large_pathological_log_is_fast(self, metric):
+        """Verify a log full of unmatched markers is scanned without quadratic blowup."""
+        noise = "Module build failed (from babel-loader):\n    Expected value to equal:\n"
+        log = noise * 100000 + "TypeError: late failure\n"
+        
+        start = time.monotonic()
+        feedback = metric._extract_rich_feedback(log, "", "")
+        
+        assert time.monotonic() - start < 5
+        assert "late failure" in feedback
+
+
+# ============================================================================
+# FeedbackSummarizer Tests
+# ============================================================================
+
+class TestFeedbackSummarizer:
+    """Test suite for grouped, budgeted metric feedback."""
+    
+    def test_groups_by_normalized_signature_and_fits_budget(self):
+        """Verify paths and numbers do not split groups and the budget is hard."""
+        from optimizer.feedback_summarizer import FeedbackSummarizer, error_signature
+        
+        assert error_signature("x is undefined at /app/src/a.js:12:5") == \
+            error_signature("x is undefined at src/b.js:40:1")
+        assert error_signature("expected 3 but got 4") == "expected <n> but got <n>"
+        
+        summarizer = FeedbackSummarizer(max_chars=100)
+        messages = ["Cannot read 'id' of undefined (src/a.js:1:2)"] * 3 + ["x is not a function"] \
+            + ["Cannot read 'id' of undefined (src/a.js:9:9)"]
+        assert summarizer.summarize(messages, limit=1) == [
+            "Cannot read 'id' of undefined (src/a.js:1:2) (x4)", "... and 1 more distinct"
+        ]
+        assert summarizer.condense_log("a\nretry 1\nb\nretry 2") == "a\nretry 1  [x2]\nb"
+        
+        fitted = summarizer.fit("x" * 500)
+        assert len(fitted) == 100 and fitted.endswith("[feedback truncated]")
+        assert FeedbackSummarizer(max_chars=1000, max_tokens=10).fit("y" * 100).endswith("truncated]")
+        assert summarizer.fit("short") == "short"
+    
+    def test_metric_feedback_is_deduplicated(self, tmp_repo):
+        """Verify repeated failures are reported once with counts, within budget."""
+        from optimizer.metric import BMadImplementationMetric
+        
+        stderr = "\n".join(
+            [f"TypeError: Cannot read properties of undefined (reading 'id') at src/u.js:{i}:3" for i in range(50)]
+            + [f"ReferenceError: helper is not defined" for _ in range(20)]
+        )
+        failing = [{'fullName': f'user {i}', 'status': 'failed',
+                    'failureMessages': [f'Error: expect(received).toBe(expected) at test/u.test.js:{i}:1']}
+                   for i in range(30)]
+        report = {'success': False, 'numTotalTests': 31, 'testResults': [{
+            'name': 'test/u.test.js', 'status': 'failed',
+            'assertionResults': failing + [{'fullName': 'ok', 'status': 'passed', 'failureMessages': []}]
+        }]}
+        prediction = Mock()
+        prediction.code_patch = ''
+        prediction.test_results = json.dumps({'success': False, 'stderr': stderr, 'stdout': json.dumps(report)})
+        
+        metric = BMadImplementationMetric(repo_root=tmp_repo, feedback_max_chars=1200)
+        feedback = metric(dspy.Example(story_context="s"), prediction).feedback
+        
+        assert "  - user 0 (+29 more tests): Error: expect(received)" in feedback
+        assert "Undefined variables: helper (x20)" in feedback
+        assert feedback.count("Cannot read properties") == 1
+        assert "(reading 'id') at src/u.js:0:3 (x50)" in feedback
+        assert len(feedback) <= 1200
+
+
+# ============================================================================
+# ClusteringProposer Tests
+# ============================================================================
+
+class TestClusteringProposer:
+    """Test suite for cross-rollout feedback clustering before reflection."""
+    
+    SHARED = ("Test execution failed with the following issues:\n"
+              "[ERROR] Missing modules: ../db/client (at src/{story}/repo.js:{line}:3)\n"
+              "→ GEMINI.md should enforce: 'Cross-reference package.json before importing.'")
+    
+    def test_clusters_ignore_paths_numbers_and_code(self):
+        """Verify the same failure in different stories lands in one cluster."""
+        from optimizer.reflection_clusters import cluster_feedback
+        
+        feedbacks = [
+            self.SHARED.format(story="users", line=12) + "\n\nCode generated:\n```\nconst a = 1;\n```",
+            "Test failed. Full log:\nSegmentation fault in native addon",
+            self.SHARED.format(story="orders", line=40) + "\n\nCode generated:\n```\nlet z = orders();\n```",
+        ]
+        
+        assert cluster_feedback(feedbacks) == [[0, 2], [1]]
+        assert cluster_feedback(feedbacks, threshold=1.01) == [[0], [1], [2]]
+    
+    def test_proposer_consolidates_records_and_logs_ratio(self, capsys):
+        """Verify the inner proposer sees one record per cluster with example references."""
+        from optimizer.reflection_clusters import ClusteringProposer
+        
+        seen = {}
+        
+        def inner(candidate, reflective_dataset, components_to_update):
+            seen.update(reflective_dataset)
+            return {c: candidate[c] + " v2" for c in components_to_update}
+        
+        records = [
+            {"Inputs": {"story_context": f"Story {name}: persist {name}", "tech_stack": "node"},
+             "Generated Outputs": {"code_patch": "x" * 400},
+             "Feedback": self.SHARED.format(story=name, line=i)}
+            for i, name in enumerate(["users", "orders", "carts"])
+        ] + [{"Inputs": {"story_context": "Story: export"}, "Generated Outputs": {},
+              "Feedback": "Test failed. Full log:\nheap out of memory"}]
+        proposer = ClusteringProposer(inner=inner)
+        
+        result = proposer({"predictor": "Base"}, {"predictor": records}, ["predictor"])
+        
+        assert result == {"predictor": "Base v2"}
+        consolidated = seen["predictor"]
+        assert len(consolidated) == 2
+        assert consolidated[0]["Feedback"].startswith(
+            "Shared by 3 of 4 examples: #1 (Story users: persist users), #2 (Story orders"
+        )
+        assert consolidated[1] == records[3]
+        stats = proposer.stats()
+        assert (stats['records_in'], stats['records_out']) == (4, 2)
+        assert stats['compression'] > 2
+        assert "Reflection clustering #1: 4 -> 2 records" in capsys.readouterr().out
+
+
+# ============================================================================
+# MetricMemo Tests
+# ============================================================================
+
+class TestMetricMemo:
+    """Test suite for memoized metric results."""
+    
+    def _prediction(self, patch, stderr):
+        prediction = Mock()
+        prediction.code_patch = patch
+        prediction.test_results = json.dumps({'success': False, 'stderr': stderr, 'stdout': ''})
+        return prediction
+    
+    def test_metric_reuses_results_and_reports_hit_rate(self, tmp_repo):
+        """Verify identical pairs skip evaluation and settings separate entries."""
+        from optimizer.metric import BMadImplementationMetric
+        from optimizer.metric_memo import MetricMemo
+        
+        memo = MetricMemo(max_entries=2)
+        metric = BMadImplementationMetric(repo_root=tmp_repo, memo=memo)
+        example = dspy.Example(story_context="s", story_path="stories/1.md")
+        prediction = self._prediction("patch", "ReferenceError: x is not defined")
+        
+        first = metric(example, prediction)
+        with patch.object(metric, '_evaluate', side_effect=AssertionError("recomputed")):
+            second = metric(example, prediction)
+        assert (second.score, second.feedback) == (first.score, first.feedback)
+        
+        metric(dspy.Example(story_context="s", story_path="stories/2.md"), prediction)
+        BMadImplementationMetric(repo_root=tmp_repo, memo=memo, scoring="ratio")(example, prediction)
+        metric(example, self._prediction("patch", "TypeError: y"))
+        assert memo.stats() == {'hits': 1, 'disk_hits': 0, 'misses': 4, 'hit_rate': 0.2, 'entries': 2, 'pruned': 0}
+    
+    def test_persists_across_instances(self, tmp_path):
+        """Verify a fresh memo finds entries written by an earlier run."""
+        from optimizer.metric_memo import MetricMemo
+        
+        db = tmp_path / "memo.sqlite"
+        example = dspy.Example(story_context="story text")
+        key = MetricMemo.make_key(example, self._prediction("p", "e"), "ratio")
+        
+        first = MetricMemo(db_path=db)
+        first.put(key, (0.5, "half", {"t1": "boom"}))
+        first.close()
+        
+        second = MetricMemo(db_path=db)
+        assert second.get(key) == (0.5, "half", {"t1": "boom"})
+        assert second.get(key) == (0.5, "half", {"t1": "boom"})
+        assert second.stats()['disk_hits'] == 1 and second.stats()['hits'] == 2
+        assert second.get(MetricMemo.make_key(example, self._prediction("p2", "e"), "ratio")) is None
+        second.close()
+
+    def test_persisted_table_is_bounded_and_versioned(self, tmp_path, tmp_repo):
+        """Verify the table keeps only max_entries rows and older metric versions miss."""
+        import sqlite3
+        from optimizer import metric as metric_module
+        from optimizer.metric import BMadImplementationMetric
+        from optimizer.metric_memo import MetricMemo
+
+        db = tmp_path / "memo.sqlite"
+        memo = MetricMemo(max_entries=2, db_path=db)
+        for i in range(5):
+            memo.put(f"k{i}", (1.0, "", {}))
+        assert sqlite3.connect(str(db)).execute("SELECT COUNT(*) FROM memo").fetchone()[0] == 2
+        assert memo.stats()['pruned'] == 3
+        memo.close()
+
+        memo = MetricMemo(db_path=db)
+        example = dspy.Example(story_context="s", story_path="stories/1.md")
+        prediction = self._prediction("patch", "ReferenceError: x is not defined")
+        BMadImplementationMetric(repo_root=tmp_repo, memo=memo)(example, prediction)
+        with patch.object(metric_module, 'METRIC_VERSION', 'next'):
+            BMadImplementationMetric(repo_root=tmp_repo, memo=memo)(example, prediction)
+        assert (memo.stats()['hits'], memo.stats()['misses']) == (0, 2)
+        memo.close()
+
+
+# ============================================================================
+# ResourceGovernor Tests
+# ============================================================================
+
+class TestResourceGovernor:
+    """Test suite for per-run resource accounting and ceilings."""
+    
+    def test_accounts_usage_and_kills_runaway_runs(self, tmp_path):
+        """Verify usage is reported per run and ceilings/timeouts kill the process group."""
+        import subprocess
+        import sys
+        from optimizer.resource_governor import ResourceGovernor
+        
+        governor = ResourceGovernor(memory_bytes=200 * 1024 * 1024, poll_interval=0.05)
+        spin = "import time\nend = time.process_time() + 0.3\nwhile time.process_time() < end: pass\nprint('ok')"
+        result = governor.run([sys.executable, "-c", spin], cwd=tmp_path, timeout=30)
+        assert (result.returncode, result.stdout) == (0, "ok\n")
+        assert result.usage['user_cpu_seconds'] + result.usage['system_cpu_seconds'] >= 0.25
+        assert result.usage['max_rss_bytes'] > 0 and result.usage['killed'] is None
+        
+        hog = "import time\nblocks = [bytearray(50 * 1024 * 1024) for _ in range(8)]\ntime.sleep(30)"
+        result = governor.run([sys.executable, "-c", hog], cwd=tmp_path, timeout=30)
+        assert result.returncode == -9 and result.usage['killed'] == "memory"
+        assert "exceeded the 200 MB RSS ceiling" in result.stderr
+        
+        with pytest.raises(subprocess.TimeoutExpired) as expired:
+            governor.run([sys.executable, "-c", "import time; time.sleep(30)"], cwd=tmp_path, timeout=0.3)
+        assert expired.value.usage['killed'] == "timeout"
+        assert governor.stats()['runs'] == 3
+        assert governor.stats()['kills'] == {'cpu': 0, 'memory': 1, 'timeout': 1}
+    
+    def test_metric_records_usage_per_rollout(self, tmp_repo):
+        """Verify sandbox evaluations keep checkout time and test usage by rollout id."""
+        import subprocess
+        from optimizer.metric import BMadImplementationMetric
+        from optimizer.resource_governor import ResourceGovernor
+        
+        subprocess.run(['git', 'add', '-A'], cwd=tmp_repo, check=True, capture_output=True)
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-qm', 'c'],
+                       cwd=tmp_repo, check=True, capture_output=True)
+        governor = ResourceGovernor()
+        metric = BMadImplementationMetric(repo_root=tmp_repo, resource_governor=governor)
+        patch_text = "diff --git a/a.txt b/a.txt\nnew file mode 100644\n--- /dev/null\n+++ b/a.txt\n@@ -0,0 +1 @@\n+a\n"
+        
+        assert metric.execute_in_sandbox(patch_text, "r1")[0] is True
+        
+        usage = metric.resource_usage["r1"]
+        assert usage['checkout_seconds'] >= 0
+        assert set(usage['test']) == {'wall_seconds', 'user_cpu_seconds', 'system_cpu_seconds',
+                                      'max_rss_bytes', 'bytes_written', 'killed'}
+        assert governor.stats()['runs'] == 1
+
+        with patch('optimizer.metric.MAX_RESOURCE_USAGE', 2):
+            for rollout_id in ("r2", "r3"):
+                metric.execute_in_sandbox(patch_text, rollout_id)
+        assert list(metric.resource_usage) == ["r2", "r3"]
+
+
 # ============================================================================
 # TwoTurnParser Tests (if applicable)
 # ============================================================================
@@ -306,6 +1960,7 @@ class TestTwoTurnParser:
         
         assert "No reasoning" in reasoning
 
+
 # ============================================================================
 # Integration Tests
 # ============================================================================
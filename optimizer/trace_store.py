@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+TraceStore: Append-Only JSONL Storage for Rollout Traces
+
+Replaces one pretty-printed `trace_logs/<rollout_id>.json` per rollout.
+Traces are queued by the rollout and appended by a background writer
+thread to numbered JSONL segments under .dspy_cache/traces/:
+
+    segment-000000.jsonl.gz   sealed segments, gzip-compressed on rotation
+    segment-000001.jsonl      active segment
+    index.jsonl               sidecar index: rollout_id -> segment, offset
+
+Appends from several optimizer processes sharing the directory are
+serialized with an exclusive fcntl lock. Offsets are positions in the
+uncompressed segment, so a record can be read back from either form.
+
+Migrate existing per-file traces once with:
+    python trace_store.py migrate --from .dspy_cache/trace_logs --to .dspy_cache/traces
+"""
+
+import fcntl
+import gzip
+import json
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class TraceStore:
+    """
+    Rotated, compressed JSONL trace store with a sidecar index.
+
+    Usage:
+        store = TraceStore(Path(".dspy_cache/traces"))
+        store.append(trace)          # non-blocking, written by a background thread
+        store.flush()
+        store.get("rollout_20250101_120000_000000")
+        for trace in store.iter_traces(): ...
+        store.close()
+    """
+
+    INDEX_NAME = "index.jsonl"
+    SEGMENT_PREFIX = "segment-"
+
+    def __init__(self, root: Path, segment_max_bytes: int = 64 * 1024 * 1024, compress: bool = True):
+        self.root = Path(root)
+        self.segment_max_bytes = segment_max_bytes
+        self.compress = compress
+        self.index_path = self.root / self.INDEX_NAME
+        self.lock_path = self.root / ".lock"
+        self.records_written = 0
+
+        # rollout_id -> (segment, offset); loaded incrementally from the sidecar
+        self._index: Dict[str, Tuple[str, int]] = {}
+        self._index_read_pos = 0
+        self._index_lock = threading.Lock()
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # One writer thread per store, shared by every candidate copy.
+        return self
+
+    @classmethod
+    def is_store(cls, path: Path) -> bool:
+        path = Path(path)
+        return (path / cls.INDEX_NAME).exists() or any(path.glob(f"{cls.SEGMENT_PREFIX}*.jsonl*"))
+
+
+    def append(self, trace: Dict[str, Any]) -> None:
+        """Queue a trace for the background writer. Returns immediately."""
+        self._ensure_writer()
+        self._queue.put(trace)
+
+    def flush(self) -> None:
+        """Block until every queued trace is on disk."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending traces and stop the writer thread."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+
+    def _ensure_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self.root.mkdir(parents=True, exist_ok=True)
+                self._writer = threading.Thread(target=self._write_loop, name="trace-store-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Drain whatever else is waiting so one lock round-trip covers many traces
+            while item is not None and len(batch) < 256:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            stop = batch[-1] is None
+            records = [t for t in batch if t is not None]
+            try:
+                if records:
+                    self._write_batch(records)
+            except Exception as e:
+                print(f"[WARN] TraceStore failed to write {len(records)} traces: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, records: List[Dict[str, Any]]) -> None:
+        with self._locked():
+            segment = self._active_segment()
+            path = self._segment_path(segment)
+            index_lines = []
+            with open(path, 'ab') as f:
+                for record in records:
+                    offset = f.tell()
+                    f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n")
+                    index_lines.append(json.dumps({
+                        'id': record.get('rollout_id'),
+                        'segment': segment,
+                        'offset': offset
+                    }) + "\n")
+                size = f.tell()
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.writelines(index_lines)
+            self.records_written += len(records)
+            if size >= self.segment_max_bytes:
+                self._seal(segment)
+
+    def _active_segment(self) -> str:
+        """Highest-numbered unsealed segment, or a new one after the last sealed segment."""
+        numbers = self._segment_numbers()
+        if numbers:
+            segment = self._segment_name(numbers[-1])
+            path = self._segment_path(segment)
+            if path.exists() and (self.root / f"{segment}.jsonl.gz").exists():
+                # A previous writer finished compressing but died before unlinking
+                path.unlink()
+            if path.exists():
+                self._repair_tail(path)
+                return segment
+        return self._segment_name(numbers[-1] + 1 if numbers else 0)
+
+    def _seal(self, segment: str) -> None:
+        path = self._segment_path(segment)
+        if not self.compress:
+            # Leave it in place but start a fresh segment next time
+            path.rename(self.root / f"{segment}.sealed.jsonl")
+            return
+        temp_path = self.root / f"{segment}.jsonl.gz.tmp"
+        with open(path, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        temp_path.replace(self.root / f"{segment}.jsonl.gz")
+        path.unlink()
+
+    @staticmethod
+    def _repair_tail(path: Path) -> None:
+        """Drop a partial last line left by a crashed writer."""
+        if not path.exists() or path.stat().st_size == 0:
+            return
+        with open(path, 'rb+') as f:
+            f.seek(-1, 2)
+            if f.read(1) == b"\n":
+                return
+            f.seek(0)
+            data = f.read()
+            f.truncate(data.rfind(b"\n") + 1)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, 'a+') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    def get(self, rollout_id: str) -> Optional[Dict[str, Any]]:
+        """Look up one trace through the sidecar index."""
+        location = self._lookup(rollout_id)
+        if location is None:
+            return None
+        segment, offset = location
+        line = self._read_line(segment, offset)
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def ids(self) -> List[str]:
+        self._refresh_index()
+        with self._index_lock:
+            return list(self._index)
+
+    def iter_traces(self) -> Iterator[Dict[str, Any]]:
+        """Yield every stored trace, oldest segment first."""
+        for number in self._segment_numbers():
+            files = self._segment_files(self._segment_name(number))
+            if not files:
+                continue
+            opener = gzip.open if files[0].suffix == '.gz' else open
+            with opener(files[0], 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def stats(self) -> Dict[str, Any]:
+        segments = sorted(self.root.glob(f"{self.SEGMENT_PREFIX}*.jsonl*"))
+        return {
+            'segments': len(segments),
+            'bytes': sum(p.stat().st_size for p in segments),
+            'traces': len(self.ids()),
+            'written': self.records_written
+        }
+
+    def _lookup(self, rollout_id: str) -> Optional[Tuple[str, int]]:
+        with self._index_lock:
+            location = self._index.get(rollout_id)
+        if location is None:
+            self._refresh_index()
+            with self._index_lock:
+                location = self._index.get(rollout_id)
+        return location
+
+    def _refresh_index(self) -> None:
+        """Read sidecar entries appended since the last refresh."""
+        if not self.index_path.exists():
+            return
+        with self._index_lock, open(self.index_path, 'r', encoding='utf-8') as f:
+            f.seek(self._index_read_pos)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    break
+                self._index_read_pos = f.tell()
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get('id') is not None:
+                    self._index[entry['id']] = (entry['segment'], entry['offset'])
+
+    def _read_line(self, segment: str, offset: int) -> Optional[str]:
+        for path in self._segment_files(segment):
+            opener = gzip.open if path.suffix == '.gz' else open
+            try:
+                with opener(path, 'rb') as f:
+                    f.seek(offset)
+                    return f.readline().decode('utf-8')
+            except FileNotFoundError:
+                # Sealed by another process between listing and opening
+                continue
+        return None
+
+
+    def _segment_name(self, number: int) -> str:
+        return f"{self.SEGMENT_PREFIX}{number:06d}"
+
+    def _segment_path(self, segment: str) -> Path:
+        return self.root / f"{segment}.jsonl"
+
+    def _segment_files(self, segment: str) -> List[Path]:
+        candidates = [
+            self.root / f"{segment}.jsonl",
+            self.root / f"{segment}.sealed.jsonl",
+            self.root / f"{segment}.jsonl.gz"
+        ]
+        return [p for p in candidates if p.exists()]
+
+    def _segment_numbers(self) -> List[int]:
+        numbers = set()
+        for path in self.root.glob(f"{self.SEGMENT_PREFIX}*"):
+            digits = path.name[len(self.SEGMENT_PREFIX):].split('.', 1)[0]
+            if digits.isdigit() and not path.name.endswith('.tmp'):
+                numbers.add(int(digits))
+        return sorted(numbers)
+
+
+def migrate_json_dir(source_dir: Path, store: TraceStore, remove_source: bool = False) -> int:
+    """
+    One-shot import of legacy `<rollout_id>.json` trace files into `store`.
+
+    Files are imported oldest first; unreadable files are skipped and kept.
+    Returns the number of traces imported.
+    """
+    source_dir = Path(source_dir)
+    files = sorted(source_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    imported = []
+    for path in files:
+        try:
+            trace = json.loads(path.read_text(encoding='utf-8'))
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"[WARN] Skipping {path}: {e}")
+            continue
+        if not isinstance(trace, dict):
+            continue
+        trace.setdefault('rollout_id', path.stem)
+        store.append(trace)
+        imported.append(path)
+    store.flush()
+    if remove_source:
+        for path in imported:
+            path.unlink()
+    return len(imported)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rollout trace store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="Import legacy trace_logs/*.json files")
+    migrate.add_argument("--from", dest="source", type=Path, default=Path(".dspy_cache/trace_logs"))
+    migrate.add_argument("--to", dest="target", type=Path, default=Path(".dspy_cache/traces"))
+    migrate.add_argument("--delete", action="store_true", help="Remove the JSON files once imported")
+
+    show = sub.add_parser("show", help="Print one trace by rollout id")
+    show.add_argument("rollout_id")
+    show.add_argument("--store", type=Path, default=Path(".dspy_cache/traces"))
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        store = TraceStore(args.target)
+        count = migrate_json_dir(args.source, store, remove_source=args.delete)
+        store.close()
+        print(f"[INFO] Migrated {count} traces from {args.source} into {args.target}: {store.stats()}")
+    elif args.command == "show":
+        trace = TraceStore(args.store).get(args.rollout_id)
+        if trace is None:
+            raise SystemExit(f"[ERROR] No trace for {args.rollout_id} in {args.store}")
+        print(json.dumps(trace, indent=2))
+
+
+if __name__ == "__main__":
+    main()
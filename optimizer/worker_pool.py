@@ -0,0 +1,228 @@
+"""
+WorkerPool: Pre-Warmed Gemini CLI Processes
+
+Every `gemini -p ...` call pays a full Node.js cold start. The pool hides
+that cost by spawning CLI processes ahead of time in stdin-driven mode
+(no -p flag): the child boots, loads its modules and then blocks reading
+the prompt from stdin. A request writes the prompt, closes stdin and
+collects the output, and a replacement worker is spawned immediately so
+the next request finds a warm process.
+
+Workers are keyed by (base args, cwd, env), since those are fixed once a
+process has started. Only truly per-call variables (GEMINI_ROLLOUT_ID) are
+volatile; GEMINI_CONTEXT_PATH is read by the CLI at startup, so it stays
+in the key and warm workers are reused across the rollouts of one
+candidate (a GEPA minibatch), not across candidates. stats() reports the
+resulting hit rate. Binaries that do not accept a prompt on stdin are
+detected on first use and the pool falls back to spawn-per-call.
+"""
+
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .rate_limiter import is_transient_error
+except ImportError:
+    from rate_limiter import is_transient_error
+
+
+class WorkerPool:
+    """
+    Keeps up to `size` idle CLI processes warm, per launch configuration.
+
+    Usage:
+        pool = WorkerPool(size=2)
+        result = pool.run(["gemini", "--output-format", "json"], prompt, timeout=120)
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_idle_seconds: float = 300.0,
+        volatile_env: Sequence[str] = ("GEMINI_ROLLOUT_ID",)
+    ):
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        # Per-call env vars that cannot be known when a worker is pre-spawned;
+        # they are left out of warm workers' environment and of the pool key.
+        self.volatile_env = tuple(volatile_env)
+        # None = not probed yet, True = stdin mode works, False = spawn-per-call
+        self.supported: Optional[bool] = None if size > 0 else False
+        self.requests = 0
+        self.warm_hits = 0
+        self.cold_spawns = 0
+
+        self._lock = threading.Lock()
+        self._idle: "OrderedDict[Tuple, Deque[Tuple[subprocess.Popen, float]]]" = OrderedDict()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def run(
+        self,
+        base_args: List[str],
+        prompt: str,
+        timeout: float,
+        cwd: Optional[Path] = None,
+        env: Optional[Dict[str, str]] = None
+    ) -> subprocess.CompletedProcess:
+        """
+        Execute one CLI request, preferring a warm worker.
+
+        `base_args` must not contain the prompt; for spawn-per-call it is
+        passed as `-p <prompt>` right after the binary.
+        """
+        self.requests += 1
+        if self.supported is False:
+            return self._spawn_per_call(base_args, prompt, timeout, cwd, env)
+
+        key = self._key(base_args, cwd, env)
+        process = self._checkout(key) or self._spawn_warm(base_args, cwd, env)
+        self._refill(key, base_args, cwd, env)
+
+        result = self._communicate(process, base_args, prompt, timeout)
+        if self.supported is None:
+            if is_transient_error(result.stderr, result.stdout):
+                # A quota error means the prompt reached the API: stdin works,
+                # and re-sending it with -p would only spend more quota.
+                self.supported = True
+            elif result.returncode != 0 and not result.stdout.strip():
+                # Either the binary ignores stdin or the call genuinely failed;
+                # only a successful -p run proves stdin mode is unsupported.
+                fallback = self._spawn_per_call(base_args, prompt, timeout, cwd, env)
+                if fallback.returncode == 0:
+                    print(f"[WARN] {base_args[0]} does not accept prompts on stdin; using spawn-per-call")
+                    self.supported = False
+                    self.close()
+                return fallback
+            self.supported = True
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = sum(len(q) for q in self._idle.values())
+            configurations = len(self._idle)
+        return {
+            'requests': self.requests,
+            'warm_hits': self.warm_hits,
+            'cold_spawns': self.cold_spawns,
+            'idle': idle,
+            'configurations': configurations,
+            'hit_rate': round(self.warm_hits / self.requests, 3) if self.requests else 0.0
+        }
+
+    def close(self) -> None:
+        """Terminate every idle worker."""
+        with self._lock:
+            workers = [p for q in self._idle.values() for p, _ in q]
+            self._idle.clear()
+        for process in workers:
+            self._kill(process)
+
+    def _key(self, base_args: List[str], cwd: Optional[Path], env: Optional[Dict[str, str]]) -> Tuple:
+        stable_env = tuple(sorted(self._stable_env(env).items())) if env is not None else None
+        return (tuple(base_args), str(cwd) if cwd else None, stable_env)
+
+    def _stable_env(self, env: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        if env is None:
+            return None
+        return {k: v for k, v in env.items() if k not in self.volatile_env}
+
+    def _checkout(self, key: Tuple) -> Optional[subprocess.Popen]:
+        now = time.monotonic()
+        stale = []
+        found = None
+        with self._lock:
+            queue = self._idle.get(key)
+            while queue:
+                process, spawned_at = queue.popleft()
+                if process.poll() is not None or now - spawned_at > self.max_idle_seconds:
+                    stale.append(process)
+                    continue
+                found = process
+                break
+        for process in stale:
+            self._kill(process)
+        if found is not None:
+            self.warm_hits += 1
+        return found
+
+    def _refill(self, key: Tuple, base_args: List[str], cwd: Optional[Path], env: Optional[Dict[str, str]]) -> None:
+        """Spawn a replacement for the worker just taken, evicting the oldest idle one if full."""
+        if self.supported is False or self.size <= 0:
+            return
+        evicted = []
+        with self._lock:
+            queue = self._idle.setdefault(key, deque())
+            self._idle.move_to_end(key)
+            if len(queue) >= self.size:
+                return
+            while sum(len(q) for q in self._idle.values()) >= self.size:
+                oldest_key = next(k for k, q in self._idle.items() if q)
+                evicted.append(self._idle[oldest_key].popleft()[0])
+            for empty_key in [k for k, q in self._idle.items() if not q and k != key]:
+                del self._idle[empty_key]
+            queue.append((self._spawn_warm(base_args, cwd, env), time.monotonic()))
+        for process in evicted:
+            self._kill(process)
+
+    def _spawn_warm(self, base_args: List[str], cwd: Optional[Path], env: Optional[Dict[str, str]]) -> subprocess.Popen:
+        self.cold_spawns += 1
+        return subprocess.Popen(
+            base_args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=cwd,
+            env=self._stable_env(env)
+        )
+
+    def _spawn_per_call(
+        self,
+        base_args: List[str],
+        prompt: str,
+        timeout: float,
+        cwd: Optional[Path],
+        env: Optional[Dict[str, str]]
+    ) -> subprocess.CompletedProcess:
+        self.cold_spawns += 1
+        args = [base_args[0], "-p", prompt, *base_args[1:]]
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=cwd,
+            env=env
+        )
+        return self._communicate(process, args, None, timeout)
+
+    @staticmethod
+    def _communicate(
+        process: subprocess.Popen,
+        args: List[str],
+        prompt: Optional[str],
+        timeout: float
+    ) -> subprocess.CompletedProcess:
+        try:
+            stdout, stderr = process.communicate(input=prompt, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.communicate(timeout=5)
+        except (subprocess.TimeoutExpired, ValueError, OSError):
+            pass
@@ -59,8 +59,7 @@ class TestOptimizationLoop:
             start_time=datetime.utcnow()
         )
         
-        trace_file = test_repo / ".dspy_cache" / "trace_logs" / f"{rollout_id}.json"
-        assert trace_file.exists()
-        import json
-        saved_trace = json.loads(trace_file.read_text())
+        adapter.trace_store.flush()
+        saved_trace = adapter.trace_store.get(rollout_id)
+        assert saved_trace is not None
         assert saved_trace['rollout_id'] == rollout_id